@@ -0,0 +1,271 @@
+# =========================
+# Clasificación por lotes de archivos grandes (trabajos asíncronos)
+# =========================
+# La subida se guarda en disco partida en shards (cada uno con la cabecera)
+# mientras llega, sin tenerla nunca entera en memoria. Cada shard se
+# clasifica en un pool de procesos con los mismos modelos que sirve el
+# worker (los kernels se cargan con memoria mapeada, así que los procesos
+# comparten las páginas) y deja sus resultados en columnas .npy. Al terminar
+# se juntan en un único result.npz (un .npy por columna).
+#
+# Archivos de un trabajo: jobs/<id>.json (estado, ver app/jobs.py) y
+# jobs/<id>/{shards,results,result.npz}.
+
+import asyncio
+import multiprocessing
+import os
+import shutil
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from app import jobs
+from app.metrics import counter, observe_span
+from app.serialization import prediction_stats
+
+SHARD_BYTES = int(os.getenv("CLASSIFY_SHARD_BYTES", str(32 * 1024 * 1024)))
+CLASSIFY_WORKERS = int(os.getenv("CLASSIFY_WORKERS", str(os.cpu_count() or 1)))
+
+# Columnas del resultado (mismos nombres que result_columns) y su dtype
+RESULT_COLUMNS = {
+    "mission": "<U6",
+    "prediction": np.int64,
+    "probability_exoplanet": np.float64,
+    "probability_false_positive": np.float64
+}
+
+_executor = None
+_tasks = {}
+
+def get_executor():
+    """Pool de procesos para los shards (aparte del de entrenamiento)"""
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=CLASSIFY_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _executor
+
+def shutdown():
+    """Cancela los trabajos en curso y cierra el pool"""
+    global _executor
+    for task in list(_tasks.values()):
+        task.cancel()
+    if _executor is not None:
+        executor, _executor = _executor, None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def job_dir(job_id):
+    return os.path.join(jobs.JOBS_DIR, job_id)
+
+class ShardWriter:
+    """
+    Escribe registros CSV completos en shards de ~shard_bytes, cada uno
+    empezando por la cabecera
+    """
+    def __init__(self, directory, header, shard_bytes=SHARD_BYTES):
+        self.directory = directory
+        self.header = header
+        self.shard_bytes = shard_bytes
+        self.paths = []
+        self.bytes = 0
+        self._file = None
+        self._size = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def write(self, records):
+        for record in records:
+            if self._file is None:
+                path = os.path.join(self.directory, f"{len(self.paths):05d}.csv")
+                self.paths.append(path)
+                self._file = open(path, "wb")
+                self._file.write(self.header)
+                self._size = 0
+            self._file.write(record)
+            self._size += len(record)
+            self.bytes += len(record)
+            if self._size >= self.shard_bytes:
+                self._file.close()
+                self._file = None
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        return self.paths
+
+# =========================
+# Proceso hijo
+# =========================
+
+_router = None
+_router_key = None
+
+def _load_router(default_path, model_paths):
+    """Modelos del worker que lanzó el trabajo (se cargan una vez por proceso)"""
+    global _router, _router_key
+    from app.missions import ModelRouter
+    from app.ml import ExoplanetModel
+
+    key = (default_path, tuple(sorted(model_paths.items())))
+    if key != _router_key:
+        loaded = {}
+
+        def load(path):
+            if path not in loaded:
+                model = ExoplanetModel()
+                model.load_model(path, serving=True)
+                loaded[path] = model
+            return loaded[path]
+
+        models = {mission: load(path) for mission, path in model_paths.items()}
+        _router = ModelRouter(models, load(default_path))
+        _router_key = key
+    return _router
+
+def classify_shard(shard_path, out_prefix, default_path, model_paths, read_options, mission):
+    """
+    Se ejecuta en el proceso hijo: clasifica un shard y guarda sus columnas
+    en <out_prefix>.<columna>.npy. Devuelve los totales del shard.
+    """
+    from app.missions import MISSION_COL
+
+    start = time.perf_counter()
+    router = _load_router(default_path, model_paths)
+    X = router.route(pd.read_csv(shard_path, **read_options), mission)
+    predictions, probabilities = router.predict(X)
+
+    missions = X[MISSION_COL].to_numpy().astype(RESULT_COLUMNS["mission"])
+    columns = {
+        "mission": missions,
+        "prediction": np.asarray(predictions).astype(np.int64),
+        "probability_exoplanet": probabilities[:, 1],
+        "probability_false_positive": probabilities[:, 0]
+    }
+    for name, values in columns.items():
+        np.save(f"{out_prefix}.{name}.npy", np.ascontiguousarray(values, dtype=RESULT_COLUMNS[name]))
+
+    values, counts = np.unique(missions, return_counts=True)
+    return {
+        "rows": len(predictions),
+        "exoplanets": int(columns["prediction"].sum()),
+        "confidence_sum": float(probabilities.max(axis=1).sum()) if len(probabilities) else 0.0,
+        "missions": {str(v): int(c) for v, c in zip(values, counts)},
+        "seconds": time.perf_counter() - start
+    }
+
+# =========================
+# Proceso del servidor
+# =========================
+
+def result_prefixes(job_id, shards):
+    return [os.path.join(job_dir(job_id), "results", f"{i:05d}") for i in range(shards)]
+
+def write_npz(path, prefixes):
+    """
+    Junta las columnas de los shards en un .npz sin cargarlas todas: cada
+    .npy del zip se escribe con su cabecera y luego shard a shard
+    """
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with zipfile.ZipFile(tmp_path, "w", allowZip64=True) as zf:
+        for name, dtype in RESULT_COLUMNS.items():
+            parts = [np.load(f"{prefix}.{name}.npy", mmap_mode="r") for prefix in prefixes]
+            header = {
+                "descr": np.lib.format.dtype_to_descr(np.dtype(dtype)),
+                "fortran_order": False,
+                "shape": (sum(len(p) for p in parts),)
+            }
+            with zf.open(f"{name}.npy", "w", force_zip64=True) as f:
+                np.lib.format.write_array_header_1_0(f, header)
+                for part in parts:
+                    f.write(part.tobytes())
+    os.replace(tmp_path, path)
+
+def iter_results(job_id, shards):
+    """(offset, {columna: array}) de cada shard en orden"""
+    offset = 0
+    for prefix in result_prefixes(job_id, shards):
+        columns = {name: np.load(f"{prefix}.{name}.npy") for name in RESULT_COLUMNS}
+        yield offset, columns
+        offset += len(columns["prediction"])
+
+async def run_job(job_id, shard_paths, default_path, model_paths, read_options, mission):
+    """Clasifica los shards en el pool, va guardando el progreso y junta el resultado"""
+    loop = asyncio.get_running_loop()
+    executor = get_executor()
+    prefixes = result_prefixes(job_id, len(shard_paths))
+    os.makedirs(os.path.join(job_dir(job_id), "results"), exist_ok=True)
+    start = time.perf_counter()
+
+    futures = [
+        asyncio.wrap_future(executor.submit(
+            classify_shard, shard, prefix, default_path, model_paths, read_options, mission
+        ), loop=loop)
+        for shard, prefix in zip(shard_paths, prefixes)
+    ]
+    jobs.update_job(job_id, status="running", started_at=time.time())
+
+    done = rows = exoplanets = 0
+    confidence_sum = 0.0
+    missions = {}
+    try:
+        for future in asyncio.as_completed(futures):
+            shard = await future
+            done += 1
+            rows += shard["rows"]
+            exoplanets += shard["exoplanets"]
+            confidence_sum += shard["confidence_sum"]
+            for name, n in shard["missions"].items():
+                missions[name] = missions.get(name, 0) + n
+            observe_span("classify_job.shard", shard["seconds"])
+            jobs.update_job(job_id, progress={"shards": len(futures), "shards_done": done, "rows_done": rows})
+
+        await asyncio.to_thread(write_npz, os.path.join(job_dir(job_id), "result.npz"), prefixes)
+        # Los shards de entrada ya no hacen falta
+        shutil.rmtree(os.path.join(job_dir(job_id), "shards"), ignore_errors=True)
+
+        seconds = time.perf_counter() - start
+        observe_span("classify_job.total", seconds)
+        counter("classified_rows", "Filas clasificadas", mission="batch").inc(rows)
+        counter("classify_jobs", "Trabajos de clasificación terminados", status="done").inc()
+        jobs.update_job(job_id, status="done", finished_at=time.time(), result={
+            **prediction_stats(rows, exoplanets, confidence_sum),
+            "missions": missions,
+            "seconds": round(seconds, 3),
+            "rows_per_second": round(rows / seconds) if seconds else None
+        })
+        print(f"✅ Trabajo {job_id}: {rows} filas en {seconds:.2f}s")
+    except asyncio.CancelledError:
+        for future in futures:
+            future.cancel()
+        raise
+    except Exception as e:
+        for future in futures:
+            future.cancel()
+        print(f"❌ Error en el trabajo {job_id}: {e}")
+        counter("classify_jobs", "Trabajos de clasificación terminados", status="failed").inc()
+        jobs.update_job(job_id, status="failed", finished_at=time.time(), error=str(e))
+    finally:
+        _tasks.pop(job_id, None)
+
+def start_job(job_id, shard_paths, default_path, model_paths, read_options, mission):
+    """Lanza run_job en el event loop (el trabajo sigue aunque la petición termine)"""
+    _tasks[job_id] = asyncio.create_task(
+        run_job(job_id, shard_paths, default_path, model_paths, read_options, mission)
+    )
+    return _tasks[job_id]
+
+def delete_job(job_id):
+    """Cancela el trabajo si sigue en este worker y borra sus archivos"""
+    task = _tasks.pop(job_id, None)
+    if task is not None:
+        task.cancel()
+    shutil.rmtree(job_dir(job_id), ignore_errors=True)
+    try:
+        os.remove(os.path.join(jobs.JOBS_DIR, f"{job_id}.json"))
+    except FileNotFoundError:
+        pass
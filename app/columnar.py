@@ -0,0 +1,297 @@
+# =========================
+# Cache columnar de catálogos (Kepler, K2, TESS)
+# =========================
+# Cada CSV se convierte una sola vez en un directorio con un .npy por columna
+# y un schema.json con los tipos. Las columnas numéricas se cargan con
+# memoria mapeada (sin copiar ni parsear) y el cache se invalida cuando
+# cambia el hash del contenido del CSV.
+
+import hashlib
+import json
+import os
+import shutil
+import sys
+
+import numpy as np
+import pandas as pd
+
+CACHE_DIR = os.getenv("CATALOG_CACHE_DIR", "cache/catalogs")
+CHUNK_ROWS = 100_000
+HASH_BLOCK_BYTES = 1024 * 1024
+SCHEMA_VERSION = 1
+
+def file_hash(csv_path):
+    """
+    Hash SHA-256 (16 caracteres) del contenido del archivo
+    """
+    h = hashlib.sha256()
+    with open(csv_path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_BYTES), b""):
+            h.update(block)
+    return h.hexdigest()[:16]
+
+def read_csv_chunks(csv_path, chunksize=CHUNK_ROWS, **kwargs):
+    """
+    Lee un CSV de la NASA por bloques (se saltan las cabeceras con '#')
+    """
+    return pd.read_csv(csv_path, comment="#", low_memory=False, chunksize=chunksize, **kwargs)
+
+def _merge_kind(current, new):
+    """
+    Combina el tipo de una columna entre bloques para que el esquema sea estable:
+    int + float -> float, cualquier cosa con texto -> texto.
+    Un bloque completamente vacío ('empty') no cambia el tipo.
+    """
+    if current is None or current == "empty":
+        return new
+    if new == "empty" or new == current:
+        return current
+    if {current, new} == {"int", "float"}:
+        return "float"
+    return "str"
+
+def _chunk_kind(series):
+    if series.isna().all():
+        return "empty"
+    if pd.api.types.is_bool_dtype(series):
+        return "bool"
+    if pd.api.types.is_integer_dtype(series):
+        return "int"
+    if pd.api.types.is_float_dtype(series):
+        return "float"
+    return "str"
+
+def infer_schema(csv_path, chunksize=CHUNK_ROWS):
+    """
+    Primera pasada por el CSV: tipo estable de cada columna, longitud máxima
+    de las columnas de texto y número de filas
+    """
+    columns = None
+    kinds = {}
+    max_len = {}
+    nullable = {}
+    rows = 0
+
+    for chunk in read_csv_chunks(csv_path, chunksize):
+        if columns is None:
+            columns = chunk.columns.tolist()
+        rows += len(chunk)
+        for col in columns:
+            series = chunk[col]
+            kinds[col] = _merge_kind(kinds.get(col), _chunk_kind(series))
+            nullable[col] = nullable.get(col, False) or bool(series.isna().any())
+            if kinds[col] == "str":
+                lengths = series.dropna().astype(str).str.len()
+                max_len[col] = max(max_len.get(col, 1), int(lengths.max()) if len(lengths) else 1)
+
+    schema = []
+    for col in columns or []:
+        kind = kinds[col]
+        if kind == "empty":
+            kind = "float"
+        # Un entero con nulos no cabe en int64
+        if kind == "int" and nullable[col]:
+            kind = "float"
+        if kind == "str":
+            dtype = f"<U{max_len.get(col, 1)}"
+        else:
+            dtype = {"int": "int64", "float": "float64", "bool": "bool"}[kind]
+        schema.append({"name": col, "dtype": dtype, "nullable": nullable[col]})
+    return schema, rows
+
+def _cache_path(csv_path, content_hash):
+    stem = os.path.splitext(os.path.basename(csv_path))[0]
+    return os.path.join(CACHE_DIR, f"{stem}-{content_hash}")
+
+def _read_meta(cache_path):
+    try:
+        with open(os.path.join(cache_path, "schema.json")) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _find_cache(csv_path):
+    """
+    Busca un cache válido para el CSV. Si el tamaño y la fecha del archivo
+    no cambiaron se evita recalcular el hash. Devuelve (ruta, metadatos) o
+    (None, hash_calculado) si hay que construirlo.
+    """
+    stat = os.stat(csv_path)
+    stem = os.path.splitext(os.path.basename(csv_path))[0]
+    if os.path.isdir(CACHE_DIR):
+        for name in os.listdir(CACHE_DIR):
+            # Los .tmp / .old son de otros procesos y están a punto de moverse
+            if name.rsplit("-", 1)[0] != stem or name.endswith((".tmp", ".old")):
+                continue
+            meta = _read_meta(os.path.join(CACHE_DIR, name))
+            if (meta and meta.get("version") == SCHEMA_VERSION
+                    and meta.get("source") == os.path.abspath(csv_path)
+                    and meta.get("size") == stat.st_size
+                    and meta.get("mtime") == stat.st_mtime):
+                return os.path.join(CACHE_DIR, name), meta
+
+    content_hash = file_hash(csv_path)
+    cache_path = _cache_path(csv_path, content_hash)
+    meta = _read_meta(cache_path)
+    if meta and meta.get("version") == SCHEMA_VERSION:
+        # Mismo contenido con otra fecha o ruta: se actualiza para la próxima vez
+        meta.update(source=os.path.abspath(csv_path), size=stat.st_size, mtime=stat.st_mtime)
+        _write_meta(cache_path, meta)
+        return cache_path, meta
+    return None, content_hash
+
+def _write_meta(cache_path, meta):
+    tmp_file = os.path.join(cache_path, f"schema.json.{os.getpid()}")
+    with open(tmp_file, "w") as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp_file, os.path.join(cache_path, "schema.json"))
+
+def build_cache(csv_path, chunksize=CHUNK_ROWS, content_hash=None):
+    """
+    Convierte el CSV en columnas .npy tipadas (dos pasadas por bloques:
+    esquema y escritura). Devuelve (ruta_cache, metadatos).
+    """
+    content_hash = content_hash or file_hash(csv_path)
+    cache_path = _cache_path(csv_path, content_hash)
+    schema, rows = infer_schema(csv_path, chunksize)
+
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    arrays = []
+    masks = []
+    for i, col in enumerate(schema):
+        arrays.append(np.lib.format.open_memmap(
+            os.path.join(tmp_path, f"{i}.npy"), mode="w+", dtype=col["dtype"], shape=(rows,)
+        ))
+        masks.append(np.lib.format.open_memmap(
+            os.path.join(tmp_path, f"{i}.mask.npy"), mode="w+", dtype=bool, shape=(rows,)
+        ) if col["dtype"].startswith("<U") and col["nullable"] else None)
+
+    offset = 0
+    for chunk in read_csv_chunks(csv_path, chunksize):
+        end = offset + len(chunk)
+        for i, col in enumerate(schema):
+            series = chunk[col["name"]]
+            if col["dtype"].startswith("<U"):
+                if masks[i] is not None:
+                    masks[i][offset:end] = series.isna().to_numpy()
+                arrays[i][offset:end] = series.fillna("").astype(str).to_numpy(dtype=col["dtype"])
+            else:
+                arrays[i][offset:end] = series.to_numpy(dtype=col["dtype"])
+        offset = end
+
+    for array in arrays + [m for m in masks if m is not None]:
+        array.flush()
+    del arrays, masks
+
+    stat = os.stat(csv_path)
+    meta = {
+        "version": SCHEMA_VERSION,
+        "source": os.path.abspath(csv_path),
+        "hash": content_hash,
+        "size": stat.st_size,
+        "mtime": stat.st_mtime,
+        "rows": rows,
+        "columns": schema
+    }
+    _write_meta(tmp_path, meta)
+
+    cache_path, meta = _publish(tmp_path, cache_path, meta)
+    _remove_stale(cache_path, meta["source"])
+    return cache_path, meta
+
+def _publish(tmp_path, cache_path, meta):
+    """
+    Mueve el cache construido a su ruta definitiva sin dejar un momento en
+    que no exista. La ruta depende del hash del contenido, así que si otro
+    proceso ya publicó el mismo CSV se usa el suyo y se descarta el nuestro.
+    Solo se sustituye un directorio con otra versión del esquema (los
+    lectores ya lo ignoran).
+    """
+    existing = _read_meta(cache_path)
+    if existing is not None and existing.get("version") != SCHEMA_VERSION:
+        old_path = f"{cache_path}.{os.getpid()}.old"
+        os.replace(cache_path, old_path)
+        shutil.rmtree(old_path, ignore_errors=True)
+    try:
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        # Otro proceso lo publicó mientras construíamos (directorio no vacío)
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        existing = _read_meta(cache_path)
+        if existing is None:
+            raise
+        return cache_path, existing
+    return cache_path, meta
+
+def _remove_stale(cache_path, source):
+    """
+    Borra los caches anteriores del mismo CSV (mismo 'source' en schema.json).
+    Los directorios a medio construir (.tmp / .old) son de otros procesos y
+    no se tocan; otro CSV con el mismo nombre en otra carpeta tampoco.
+    """
+    keep = os.path.basename(cache_path)
+    for name in os.listdir(CACHE_DIR):
+        if name == keep or name.endswith((".tmp", ".old")):
+            continue
+        path = os.path.join(CACHE_DIR, name)
+        meta = _read_meta(path)
+        if meta is not None and meta.get("source") == source:
+            shutil.rmtree(path, ignore_errors=True)
+
+def open_cache(csv_path):
+    """
+    Devuelve (ruta_cache, metadatos); construye el cache si no existe o si el CSV cambió
+    """
+    cache_path, found = _find_cache(csv_path)
+    if cache_path is None:
+        return build_cache(csv_path, content_hash=found)
+    return cache_path, found
+
+def load_columns(csv_path, columns=None):
+    """
+    Columnas del catálogo como arrays de NumPy con memoria mapeada (sin copias).
+    Devuelve (metadatos, {columna: array}, {columna: máscara_de_nulos}).
+    """
+    cache_path, meta = open_cache(csv_path)
+    arrays = {}
+    masks = {}
+    for i, col in enumerate(meta["columns"]):
+        name = col["name"]
+        if columns is not None and name not in columns:
+            continue
+        arrays[name] = np.load(os.path.join(cache_path, f"{i}.npy"), mmap_mode="r")
+        mask_path = os.path.join(cache_path, f"{i}.mask.npy")
+        if os.path.exists(mask_path):
+            masks[name] = np.load(mask_path, mmap_mode="r")
+    return meta, arrays, masks
+
+def load_frame(csv_path, columns=None):
+    """
+    Carga el catálogo como DataFrame desde el cache columnar.
+    Las columnas numéricas comparten memoria con los .npy; las de texto se
+    convierten a objetos de Python (NaN donde el CSV estaba vacío).
+    """
+    meta, arrays, masks = load_columns(csv_path, columns)
+    data = {}
+    for col in meta["columns"]:
+        name = col["name"]
+        if name not in arrays:
+            continue
+        array = arrays[name]
+        if col["dtype"].startswith("<U"):
+            values = array.astype(object)
+            if name in masks:
+                values[masks[name]] = np.nan
+            data[name] = values
+        else:
+            data[name] = array
+    return pd.DataFrame(data, copy=False)
+
+if __name__ == "__main__":
+    # Uso: python -m app.columnar k2p.csv tessp.csv test_kepler.csv data/*.csv
+    for path in sys.argv[1:]:
+        cache_path, meta = open_cache(path)
+        print(f"✅ {path}: {meta['rows']} filas, {len(meta['columns'])} columnas -> {cache_path}")
@@ -0,0 +1,267 @@
+# =========================
+# Cross-match entre misiones (Kepler, K2, TESS)
+# =========================
+# La misma estrella y el mismo candidato aparecen a menudo en el KOI de
+# Kepler, en K2 y en los TOI de TESS. Aquí se enlazan los objetos de misiones
+# distintas que están a menos de MATCH_RADIUS_ARCSEC en el cielo y cuyos
+# periodos coinciden dentro de PERIOD_TOLERANCE (relativa).
+#
+# RA/Dec se pasan a vectores unitarios y se indexan en un KD-tree (scipy
+# cKDTree): la distancia angular θ corresponde a la cuerda 2·sin(θ/2), así
+# que los pares cercanos salen de query_pairs en O(n log n) sin comparar
+# todos contra todos. Los grupos son las componentes conexas de los pares
+# válidos; el objeto principal de cada grupo es el de la misión con mejor
+# caracterización (Kepler, luego K2, luego TESS) y su id da nombre al grupo.
+#
+# Los grupos se guardan en la tabla MATCH_TABLE (solo los objetos con
+# pareja) y se reconstruyen al ingerir cualquiera de las tres tablas;
+# /api/planets y /api/classify los usan para unir o quitar repetidos.
+#
+# Uso:
+#   python -m app.crossmatch
+
+import asyncio
+import os
+import time
+
+import numpy as np
+
+from app import db
+from app.metrics import observe_span
+from app.planets import (DATASET_MISSIONS, KEY_COLS, MATCH_TABLE, MISSION_DATASETS, PERIOD_COLS,
+                         get_column_types, numeric_expr)
+
+MATCH_RADIUS_ARCSEC = float(os.getenv("CROSSMATCH_RADIUS_ARCSEC", "3"))
+PERIOD_TOLERANCE = float(os.getenv("CROSSMATCH_PERIOD_TOLERANCE", "0.01"))
+
+# Coordenadas (grados) con el mismo nombre en los tres catálogos de la NASA
+RA_COL = "ra"
+DEC_COL = "dec"
+# Preferencia para el objeto principal de un grupo
+MISSION_RANK = {"Kepler": 0, "K2": 1, "TESS": 2}
+
+ARCSEC = np.pi / (180 * 3600)
+
+def unit_vectors(ra, dec):
+    """(n, 3) vectores unitarios de RA/Dec en grados"""
+    ra = np.radians(ra)
+    dec = np.radians(dec)
+    cos_dec = np.cos(dec)
+    return np.column_stack([cos_dec * np.cos(ra), cos_dec * np.sin(ra), np.sin(dec)])
+
+def chord(arcsec):
+    """Distancia euclídea entre vectores unitarios separados 'arcsec'"""
+    return 2 * np.sin(arcsec * ARCSEC / 2)
+
+def separation_arcsec(a, b):
+    """Separación angular entre filas de vectores unitarios (estable para ángulos pequeños)"""
+    return 2 * np.arcsin(np.clip(np.linalg.norm(a - b, axis=1) / 2, 0, 1)) / ARCSEC
+
+def periods_compatible(p1, p2, tolerance=PERIOD_TOLERANCE):
+    """True si los periodos difieren menos de 'tolerance' (relativa); False si falta alguno"""
+    with np.errstate(invalid="ignore"):
+        return np.abs(p1 - p2) <= tolerance * np.maximum(p1, p2)
+
+def match_pairs(vectors, catalog, period, radius_arcsec=MATCH_RADIUS_ARCSEC, tolerance=PERIOD_TOLERANCE):
+    """
+    Pares (i, j) de objetos de catálogos distintos a menos de radius_arcsec
+    y con periodos compatibles. vectors no debe tener filas con NaN.
+    """
+    from scipy.spatial import cKDTree
+
+    tree = cKDTree(vectors)
+    pairs = tree.query_pairs(chord(radius_arcsec), output_type="ndarray")
+    i, j = pairs[:, 0], pairs[:, 1]
+    keep = (catalog[i] != catalog[j]) & periods_compatible(period[i], period[j], tolerance)
+    return pairs[keep]
+
+def match_groups(catalogs, radius_arcsec=MATCH_RADIUS_ARCSEC, tolerance=PERIOD_TOLERANCE):
+    """
+    Grupos de objetos repetidos entre misiones.
+    catalogs: {dataset: (ids, ra, dec, period)} con arrays alineados.
+    Devuelve un dict de arrays (una fila por objeto con pareja): dataset,
+    object_id, group_id, is_primary, group_size, group_missions y
+    separation_arcsec (respecto al principal).
+    """
+    from scipy.sparse import coo_matrix
+    from scipy.sparse.csgraph import connected_components
+
+    datasets = list(catalogs)
+    ids = np.concatenate([np.asarray(catalogs[d][0], dtype=object) for d in datasets])
+    ra = np.concatenate([np.asarray(catalogs[d][1], dtype=np.float64) for d in datasets])
+    dec = np.concatenate([np.asarray(catalogs[d][2], dtype=np.float64) for d in datasets])
+    period = np.concatenate([np.asarray(catalogs[d][3], dtype=np.float64) for d in datasets])
+    catalog = np.concatenate([np.full(len(catalogs[d][0]), i) for i, d in enumerate(datasets)])
+
+    # Sin coordenadas no hay con quién comparar
+    valid = np.flatnonzero(np.isfinite(ra) & np.isfinite(dec))
+    vectors = unit_vectors(ra[valid], dec[valid])
+    pairs = match_pairs(vectors, catalog[valid], period[valid], radius_arcsec, tolerance)
+
+    n = len(valid)
+    graph = coo_matrix((np.ones(len(pairs), dtype=np.int8), (pairs[:, 0], pairs[:, 1])), shape=(n, n))
+    _, labels = connected_components(graph, directed=False)
+
+    # Solo los componentes con más de un objeto
+    sizes = np.bincount(labels, minlength=n)
+    members = np.flatnonzero(sizes[labels] > 1)
+    labels = labels[members]
+
+    # Principal: menor rango de misión y, a igualdad, el primero
+    rank = np.array([MISSION_RANK[DATASET_MISSIONS[d]] for d in datasets])[catalog[valid[members]]]
+    order = np.lexsort((members, rank, labels))
+    members, labels = members[order], labels[order]
+    starts = np.flatnonzero(np.diff(labels, prepend=-1))
+    lengths = np.diff(np.r_[starts, len(members)])
+    primary = np.repeat(members[starts], lengths)
+
+    rows = valid[members]
+    primary_rows = valid[primary]
+    missions = np.array([DATASET_MISSIONS[d] for d in datasets], dtype=object)
+    group_id = missions[catalog[primary_rows]] + ":" + ids[primary_rows].astype(str).astype(object)
+
+    # Misiones de cada grupo ('Kepler+TESS'): máscara de bits por grupo -> nombre
+    masks = np.bitwise_or.reduceat(1 << catalog[rows], starts) if len(starts) else np.zeros(0, dtype=int)
+    by_rank = sorted(range(len(datasets)), key=lambda c: MISSION_RANK[missions[c]])
+    mask_names = np.array([
+        "+".join(missions[c] for c in by_rank if mask >> c & 1) for mask in range(1 << len(datasets))
+    ], dtype=object)
+
+    return {
+        "dataset": np.array(datasets, dtype=object)[catalog[rows]],
+        "object_id": ids[rows].astype(str).astype(object),
+        "group_id": group_id,
+        "is_primary": rows == primary_rows,
+        "group_size": sizes[labels].astype(np.int64),
+        "group_missions": np.repeat(mask_names[masks], lengths),
+        "separation_arcsec": separation_arcsec(vectors[members], vectors[primary])
+    }
+
+async def load_catalogs():
+    """
+    {dataset: (ids, ra, dec, period)} de las tablas *_raw que existen y
+    tienen coordenadas (los valores no numéricos llegan como NaN)
+    """
+    catalogs = {}
+    for dataset in MISSION_DATASETS.values():
+        column_types = await get_column_types(dataset)
+        if not {RA_COL, DEC_COL} <= set(column_types):
+            continue
+        period_col = PERIOD_COLS[dataset]
+        period = (numeric_expr(period_col, column_types[period_col])
+                  if period_col in column_types else "NULL::double precision")
+        rows = await db.fetch(
+            f"SELECT {KEY_COLS[dataset]}::text, {numeric_expr(RA_COL, column_types[RA_COL])}, "
+            f"{numeric_expr(DEC_COL, column_types[DEC_COL])}, {period} "
+            f"FROM {dataset}_raw WHERE {KEY_COLS[dataset]} IS NOT NULL"
+        )
+        columns = list(zip(*rows)) if rows else [(), (), (), ()]
+        catalogs[dataset] = (
+            np.array(columns[0], dtype=object),
+            *(np.array(c, dtype=np.float64) for c in columns[1:])
+        )
+    return catalogs
+
+async def rebuild():
+    """
+    Recalcula los grupos con las tablas actuales y reemplaza MATCH_TABLE en
+    una transacción (las consultas ven los grupos anteriores hasta el commit)
+    """
+    start = time.perf_counter()
+    catalogs = await load_catalogs()
+    load_seconds = time.perf_counter() - start
+    if len(catalogs) < 2:
+        print("⚠️ Cross-match: hacen falta al menos dos catálogos con ra/dec")
+        return {"catalogs": sorted(catalogs), "objects": 0, "groups": 0}
+
+    groups = await asyncio.to_thread(match_groups, catalogs)
+    match_seconds = time.perf_counter() - start - load_seconds
+
+    columns = list(groups)
+    records = zip(*(groups[c].tolist() for c in columns))
+    pool = await db.get_pool()
+    async with pool.acquire() as conn:
+        async with conn.transaction():
+            await conn.execute(f"""
+                CREATE TABLE IF NOT EXISTS {MATCH_TABLE} (
+                    dataset text NOT NULL,
+                    object_id text NOT NULL,
+                    group_id text NOT NULL,
+                    is_primary boolean NOT NULL,
+                    group_size integer NOT NULL,
+                    group_missions text NOT NULL,
+                    separation_arcsec double precision NOT NULL,
+                    PRIMARY KEY (dataset, object_id)
+                )""")
+            await conn.execute(f"CREATE INDEX IF NOT EXISTS {MATCH_TABLE}_group_idx ON {MATCH_TABLE} (group_id)")
+            await conn.execute(f"TRUNCATE {MATCH_TABLE}")
+            await conn.copy_records_to_table(MATCH_TABLE, records=records, columns=columns)
+        await conn.execute(f"ANALYZE {MATCH_TABLE}")
+
+    seconds = time.perf_counter() - start
+    observe_span("crossmatch.rebuild", seconds)
+    result = {
+        "catalogs": {d: len(c[0]) for d, c in catalogs.items()},
+        "objects": len(groups["object_id"]),
+        "groups": int(groups["is_primary"].sum()),
+        "load_seconds": round(load_seconds, 3),
+        "match_seconds": round(match_seconds, 3),
+        "seconds": round(seconds, 3)
+    }
+    print(f"🔭 Cross-match: {result['groups']} grupos ({result['objects']} objetos) "
+          f"de {sum(result['catalogs'].values())} en {seconds:.2f}s")
+    return result
+
+async def table_ready():
+    """True si MATCH_TABLE existe (se construyó al menos una vez)"""
+    rows = await db.fetch(f"SELECT to_regclass('{MATCH_TABLE}') IS NOT NULL")
+    return rows[0][0]
+
+async def lookup(datasets, object_ids):
+    """
+    Grupo de cada objeto (arrays alineados con la entrada): group_id,
+    group_missions (None si no tiene pareja) e is_primary (True si no tiene)
+    """
+    n = len(object_ids)
+    group_id = np.full(n, None, dtype=object)
+    group_missions = np.full(n, None, dtype=object)
+    is_primary = np.ones(n, dtype=bool)
+    if n == 0:
+        return {"group_id": group_id, "group_missions": group_missions, "is_primary": is_primary}
+
+    rows = await db.fetch(
+        f"SELECT q.i, x.group_id, x.group_missions, x.is_primary "
+        f"FROM unnest($1::text[], $2::text[]) WITH ORDINALITY AS q(dataset, object_id, i) "
+        f"JOIN {MATCH_TABLE} x USING (dataset, object_id)",
+        [str(d) for d in datasets], [str(i) for i in object_ids]
+    )
+    if rows:
+        index, groups, missions, primary = zip(*rows)
+        index = np.array(index) - 1
+        group_id[index] = groups
+        group_missions[index] = missions
+        is_primary[index] = primary
+    return {"group_id": group_id, "group_missions": group_missions, "is_primary": is_primary}
+
+def dedupe_mask(group_id, is_primary):
+    """
+    Máscara con una fila por grupo (el principal si está; si no, la primera)
+    y todas las filas sin grupo
+    """
+    keep = np.ones(len(group_id), dtype=bool)
+    grouped = np.flatnonzero(np.not_equal(group_id, None))
+    if len(grouped):
+        order = grouped[np.lexsort((grouped, ~is_primary[grouped]))]
+        _, first = np.unique(group_id[order].astype(str), return_index=True)
+        keep[grouped] = False
+        keep[order[first]] = True
+    return keep
+
+if __name__ == "__main__":
+    async def main():
+        try:
+            await rebuild()
+        finally:
+            await db.close_pool()
+
+    asyncio.run(main())
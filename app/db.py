@@ -1,10 +1,109 @@
+import os
+import asyncpg
 import psycopg2
+
+# Configuración de PostgreSQL (se puede cambiar con variables de entorno)
+DB_CONFIG = {
+    "dbname": os.getenv("DB_NAME", "exoplanets00"),
+    "user": os.getenv("DB_USER", "kamimimi"),
+    "password": os.getenv("DB_PASSWORD", ""),
+    "host": os.getenv("DB_HOST", "localhost"),
+    "port": os.getenv("DB_PORT", "5432")
+}
+
+# Pool asíncrono para los endpoints
+POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "2"))
+POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+STATEMENT_CACHE_SIZE = 256          # sentencias preparadas por conexión
+MAX_INACTIVE_LIFETIME = 300.0       # segundos antes de cerrar una conexión ociosa
+COMMAND_TIMEOUT = 30.0
+HEALTH_CHECK_TIMEOUT = 2.0
+
+_pool = None
+
 #Conexión de postgreSQL
 def get_connection():
-    return psycopg2.connect(
-        dbname="exoplanets00",
-        user="kamimimi",
-        password="",
-        host="localhost",
-        port="5432"
-    )
+    return psycopg2.connect(**DB_CONFIG)
+
+async def init_pool():
+    """
+    Crea el pool de asyncpg (se llama al arrancar la app)
+    """
+    global _pool
+    if _pool is None:
+        _pool = await asyncpg.create_pool(
+            database=DB_CONFIG["dbname"],
+            user=DB_CONFIG["user"],
+            password=DB_CONFIG["password"] or None,
+            host=DB_CONFIG["host"],
+            port=int(DB_CONFIG["port"]),
+            min_size=POOL_MIN_SIZE,
+            max_size=POOL_MAX_SIZE,
+            statement_cache_size=STATEMENT_CACHE_SIZE,
+            max_inactive_connection_lifetime=MAX_INACTIVE_LIFETIME,
+            command_timeout=COMMAND_TIMEOUT
+        )
+    return _pool
+
+async def close_pool():
+    """
+    Cierra el pool (se llama al apagar la app)
+    """
+    global _pool
+    if _pool is not None:
+        pool, _pool = _pool, None
+        await pool.close()
+
+async def get_pool():
+    """
+    Devuelve el pool; si no se pudo crear al arrancar lo intenta de nuevo
+    """
+    if _pool is None:
+        await init_pool()
+    return _pool
+
+async def fetch(query, *args):
+    """
+    Ejecuta una consulta con una conexión del pool.
+    Si la conexión estaba rota (p. ej. PostgreSQL se reinició) se reintenta una vez.
+    """
+    pool = await get_pool()
+    try:
+        async with pool.acquire() as conn:
+            return await conn.fetch(query, *args)
+    except (asyncpg.exceptions.ConnectionDoesNotExistError,
+            asyncpg.exceptions.InterfaceError):
+        async with pool.acquire() as conn:
+            return await conn.fetch(query, *args)
+
+async def execute(query, *args):
+    """
+    Igual que fetch() pero para sentencias sin resultado (INSERT, CREATE...)
+    """
+    pool = await get_pool()
+    try:
+        async with pool.acquire() as conn:
+            return await conn.execute(query, *args)
+    except (asyncpg.exceptions.ConnectionDoesNotExistError,
+            asyncpg.exceptions.InterfaceError):
+        async with pool.acquire() as conn:
+            return await conn.execute(query, *args)
+
+async def check_pool():
+    """
+    Health check del pool: hace un SELECT 1 y devuelve el estado
+    """
+    if _pool is None:
+        return {"status": "down", "detail": "Pool no inicializado"}
+    try:
+        async with _pool.acquire(timeout=HEALTH_CHECK_TIMEOUT) as conn:
+            await conn.fetchval("SELECT 1")
+    except Exception as e:
+        return {"status": "error", "detail": str(e)}
+    return {
+        "status": "ok",
+        "size": _pool.get_size(),
+        "idle": _pool.get_idle_size(),
+        "min_size": _pool.get_min_size(),
+        "max_size": _pool.get_max_size()
+    }
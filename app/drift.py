@@ -0,0 +1,267 @@
+# =========================
+# Deriva de los datos y de las puntuaciones (monitorización en streaming)
+# =========================
+# Al entrenar se guarda, junto al modelo (<modelo>.drift.json), una
+# referencia de cada característica numérica: los límites de DRIFT_BINS
+# bins de igual masa (cuantiles del entrenamiento), la proporción de filas
+# en cada bin y la de vacíos. También el histograma de las probabilidades
+# que da el modelo en la partición de prueba (PROBABILITY_BINS bins fijos).
+#
+# Al clasificar, cada lote suma sus filas a los mismos bins (un conteo por
+# límite y columna), así que la memoria es fija por característica y no hace
+# falta guardar las subidas. Los conteos decaen con vida media
+# DRIFT_HALF_LIFE_ROWS filas para que reflejen el tráfico reciente (0 = se
+# acumula todo). PSI y KS se calculan sobre los bins: coste constante.
+#
+# Cada worker de uvicorn monitoriza sus propias peticiones.
+
+import json
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+DRIFT_BINS = int(os.getenv("DRIFT_BINS", "20"))
+PROBABILITY_BINS = 20
+HALF_LIFE_ROWS = float(os.getenv("DRIFT_HALF_LIFE_ROWS", "50000"))
+# Filas de referencia como mucho para calcular los cuantiles
+REFERENCE_SAMPLE_ROWS = 200_000
+
+# Umbrales habituales del PSI: < 0.1 estable, < 0.25 moderado, resto deriva
+PSI_WARNING = 0.1
+PSI_DRIFT = 0.25
+# Proporción mínima por bin al calcular el PSI (evita log(0))
+PSI_EPSILON = 1e-4
+
+def drift_path_for(filepath):
+    """Ruta de la referencia de deriva que acompaña a un modelo .pkl"""
+    return os.path.splitext(filepath)[0] + ".drift.json"
+
+def quantile_edges(values, bins=DRIFT_BINS):
+    """Límites interiores de 'bins' bins de igual masa (sin repetidos)"""
+    values = values[np.isfinite(values)]
+    if len(values) == 0:
+        return np.empty(0)
+    return np.unique(np.quantile(values, np.linspace(0, 1, bins + 1)[1:-1]))
+
+def bin_counts(values, edges):
+    """
+    (conteo por bin, vacíos); el bin i es edges[i-1] <= x < edges[i].
+    Con ~20 límites, contar los valores >= cada límite es ~8 veces más
+    rápido que searchsorted + bincount (y los NaN no cuentan en ninguno)
+    """
+    missing = int(np.count_nonzero(np.isnan(values)))
+    at_or_above = np.array([len(values) - missing] + [np.count_nonzero(values >= e) for e in edges] + [0])
+    return -np.diff(at_or_above), missing
+
+def probability_counts(probabilities):
+    """Conteo por bin de PROBABILITY_BINS bins iguales de [0, 1]"""
+    bins = np.minimum((np.asarray(probabilities) * PROBABILITY_BINS).astype(np.int64), PROBABILITY_BINS - 1)
+    return np.bincount(bins, minlength=PROBABILITY_BINS)
+
+def psi(expected, actual, epsilon=PSI_EPSILON):
+    """Population Stability Index entre dos vectores de proporciones por bin"""
+    expected = np.maximum(expected, epsilon)
+    actual = np.maximum(actual, epsilon)
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+def ks(expected, actual):
+    """Kolmogorov-Smirnov sobre los bins: máxima diferencia entre las CDF"""
+    return float(np.max(np.abs(np.cumsum(expected) - np.cumsum(actual)))) if len(expected) else 0.0
+
+def status(value):
+    if value >= PSI_DRIFT:
+        return "drift"
+    return "warning" if value >= PSI_WARNING else "ok"
+
+def _proportions(counts):
+    total = counts.sum()
+    return counts / total if total else np.zeros(len(counts))
+
+class Reference:
+    """Distribución de entrenamiento de un modelo (características numéricas y probabilidades)"""
+    def __init__(self, features, probability, rows):
+        # {característica: {"edges": [...], "proportions": [...], "missing": fracción}}
+        self.features = features
+        # Proporción de probabilidades de EXOPLANET en cada bin de [0, 1]
+        self.probability = np.asarray(probability, dtype=np.float64)
+        self.rows = rows
+        self.edges = {name: np.asarray(f["edges"], dtype=np.float64) for name, f in features.items()}
+        self.proportions = {name: np.asarray(f["proportions"], dtype=np.float64) for name, f in features.items()}
+
+    @classmethod
+    def from_samples(cls, columns, probabilities, missing=None, rows=None, bins=DRIFT_BINS):
+        """
+        columns: {característica: valores (NaN = vacío)}. Con 'missing'
+        ({característica: fracción}) los valores son una muestra sin vacíos
+        (p. ej. el reservorio del entrenamiento por bloques)
+        """
+        features = {}
+        for name, values in columns.items():
+            values = np.asarray(values, dtype=np.float64)
+            if len(values) > REFERENCE_SAMPLE_ROWS:
+                values = np.random.default_rng(0).choice(values, REFERENCE_SAMPLE_ROWS, replace=False)
+            edges = quantile_edges(values, bins)
+            counts, n_missing = bin_counts(values, edges)
+            features[name] = {
+                "edges": edges.tolist(),
+                "proportions": _proportions(counts).tolist(),
+                "missing": (float(missing[name]) if missing is not None
+                            else n_missing / len(values) if len(values) else 1.0)
+            }
+        probability = probability_counts(probabilities)
+        return cls(features, _proportions(probability), rows if rows is not None else
+                   max((len(v) for v in columns.values()), default=0))
+
+    @classmethod
+    def from_frame(cls, X, probabilities, bins=DRIFT_BINS):
+        """Referencia de las columnas numéricas de un DataFrame de entrenamiento"""
+        numeric = X.select_dtypes(include="number")
+        columns = {c: numeric[c].to_numpy(dtype=np.float64, na_value=np.nan) for c in numeric.columns}
+        return cls.from_samples(columns, probabilities, rows=len(X), bins=bins)
+
+    def to_dict(self):
+        return {"features": self.features, "probability": self.probability.tolist(), "rows": self.rows}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["features"], data["probability"], data["rows"])
+
+    def save(self, path):
+        # Escritura atómica: otro worker puede estar leyéndola
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.to_dict(), f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """Referencia guardada o None (modelos entrenados antes de existir el monitor)"""
+        try:
+            with open(path) as f:
+                return cls.from_dict(json.load(f))
+        except (OSError, ValueError, KeyError):
+            return None
+
+class Sketch:
+    """
+    Conteos en servicio de un modelo con los bins de su referencia. Memoria
+    fija: un vector de DRIFT_BINS por característica más el de probabilidades.
+    """
+    def __init__(self, reference, half_life=HALF_LIFE_ROWS):
+        self.reference = reference
+        self.half_life = half_life
+        self.counts = {name: np.zeros(len(edges) + 1) for name, edges in reference.edges.items()}
+        self.missing = {name: 0.0 for name in reference.edges}
+        self.probability = np.zeros(PROBABILITY_BINS)
+        self.rows = 0.0
+        self.seen = 0
+
+    def update(self, X, probabilities):
+        """Suma un lote (X con las columnas del modelo, probabilidades de EXOPLANET)"""
+        n = len(X)
+        if n == 0:
+            return
+        batch = {}
+        for name, edges in self.reference.edges.items():
+            if name in X.columns:
+                batch[name] = bin_counts(X[name].to_numpy(dtype=np.float64, na_value=np.nan), edges)
+        probability = probability_counts(probabilities)
+
+        decay = 0.5 ** (n / self.half_life) if self.half_life > 0 else 1.0
+        for name, (counts, missing) in batch.items():
+            self.counts[name] *= decay
+            self.counts[name] += counts
+            self.missing[name] = self.missing[name] * decay + missing
+        self.probability *= decay
+        self.probability += probability
+        self.rows = self.rows * decay + n
+        self.seen += n
+
+    def report(self):
+        """PSI, KS y vacíos de cada característica y de las probabilidades"""
+        features = {}
+        for name, counts in self.counts.items():
+            reference = self.reference.proportions[name]
+            current = _proportions(counts)
+            value = psi(reference, current) if counts.sum() else None
+            features[name] = {
+                "psi": value,
+                "ks": ks(reference, current) if counts.sum() else None,
+                "missing": self.missing[name] / self.rows if self.rows else None,
+                "reference_missing": self.reference.features[name]["missing"],
+                "status": status(value) if value is not None else "no_data"
+            }
+        current = _proportions(self.probability)
+        probability = {
+            "psi": psi(self.reference.probability, current) if self.rows else None,
+            "ks": ks(self.reference.probability, current) if self.rows else None,
+            "reference": self.reference.probability.tolist(),
+            "current": current.tolist()
+        }
+        probability["status"] = status(probability["psi"]) if probability["psi"] is not None else "no_data"
+        scored = [(f["psi"], name) for name, f in features.items() if f["psi"] is not None]
+        return {
+            "rows_seen": self.seen,
+            # Filas que pesan en los conteos tras el decaimiento
+            "effective_rows": round(self.rows, 1),
+            "half_life_rows": self.half_life,
+            "reference_rows": self.reference.rows,
+            "max_psi_feature": max(scored)[1] if scored else None,
+            "features": features,
+            "probability": probability
+        }
+
+    def max_psi(self):
+        values = [psi(self.reference.proportions[n], _proportions(c)) for n, c in self.counts.items() if c.sum()]
+        return max(values, default=None)
+
+class DriftMonitor:
+    """Un Sketch por modelo en servicio (misión y versión) de este proceso"""
+    def __init__(self, half_life=HALF_LIFE_ROWS):
+        self.half_life = half_life
+        self.sketches = {}
+        self._lock = threading.Lock()
+
+    def _sketch(self, model):
+        key = (model.mission, model.version)
+        sketch = self.sketches.get(key)
+        if sketch is None:
+            sketch = self.sketches[key] = Sketch(model.reference, self.half_life)
+        return sketch
+
+    def observe(self, router, X, missions, probabilities):
+        """
+        Suma las filas clasificadas al sketch del modelo de cada misión
+        (X como lo recibe ModelRouter.predict; las misiones sin referencia se ignoran)
+        """
+        probabilities = np.asarray(probabilities)[:, 1]
+        with self._lock:
+            unique = pd.unique(missions)
+            for mission in unique:
+                model = router.model_for(mission)
+                if model is None or getattr(model, "reference", None) is None:
+                    continue
+                if len(unique) == 1:
+                    self._sketch(model).update(X, probabilities)
+                else:
+                    rows = np.flatnonzero(missions == mission)
+                    self._sketch(model).update(X.iloc[rows], probabilities[rows])
+
+    def report(self):
+        with self._lock:
+            return {
+                f"{mission}/{version}": sketch.report()
+                for (mission, version), sketch in sorted(self.sketches.items())
+            }
+
+    def max_psi(self):
+        """Mayor PSI de cualquier característica y modelo (None sin datos)"""
+        with self._lock:
+            values = [sketch.max_psi() for sketch in self.sketches.values()]
+        return max((v for v in values if v is not None), default=None)
+
+    def reset(self):
+        with self._lock:
+            self.sketches = {}
@@ -0,0 +1,408 @@
+# =========================
+# Almacén de características unificado (Kepler, K2, TESS)
+# =========================
+# Kepler usa koi_period/koi_prad/koi_steff y K2/TESS pl_orbper/pl_rade/
+# st_teff. Aquí las tres misiones se pasan a un esquema canónico (periodo,
+# radio, temperatura, profundidad del tránsito, estrella...) y al ingerir se
+# calculan una sola vez las características derivadas (log del periodo,
+# insolación, Rp/R*, cociente entre la profundidad medida y la esperada).
+#
+# Cada misión se guarda en columnas .npy ordenadas por el id del objeto
+# (kepoi_name, pl_name, toi), así que buscar un objeto es un searchsorted:
+#   cache/features/<misión>/<versión>/{schema.json,<columna>.npy}
+#   cache/features/<misión>/CURRENT     versión vigente
+# Volver a ingerir un catálogo escribe una versión nueva (upsert por id) y
+# cambia el puntero con os.replace; quien tenga abierta la anterior la sigue
+# leyendo hasta soltarla.
+#
+# Uso:
+#   python -m app.features data/KEPLER.csv data/K2.csv data/TESS.csv
+
+import json
+import os
+import shutil
+import sys
+import time
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from app.columnar import read_csv_chunks
+from app.missions import detect_mission
+from app.ml import NEGATIVE_LABELS, POSITIVE_LABELS
+
+STORE_DIR = os.getenv("FEATURE_STORE_DIR", "cache/features")
+STORE_VERSION = 2
+CURRENT_POINTER = "CURRENT"
+
+# Misión con la que se publica el modelo entrenado sobre el almacén
+UNIFIED_MISSION = "Unified"
+MISSIONS = ("Kepler", "K2", "TESS")
+
+# Columna canónica -> columna de cada catálogo de la NASA
+SOURCE_COLUMNS = {
+    "Kepler": {
+        "object_id": "kepoi_name", "disposition": "koi_disposition",
+        "period": "koi_period", "planet_radius": "koi_prad", "teq": "koi_teq",
+        "insolation": "koi_insol", "depth": "koi_depth", "duration": "koi_duration",
+        "impact": "koi_impact", "star_teff": "koi_steff", "star_logg": "koi_slogg",
+        "star_radius": "koi_srad", "star_mass": "koi_smass"
+    },
+    "K2": {
+        "object_id": "pl_name", "disposition": "disposition",
+        "period": "pl_orbper", "planet_radius": "pl_rade", "teq": "pl_eqt",
+        "insolation": "pl_insol", "depth": "pl_trandep", "duration": "pl_trandur",
+        "impact": "pl_imppar", "star_teff": "st_teff", "star_logg": "st_logg",
+        "star_radius": "st_rad", "star_mass": "st_mass"
+    },
+    "TESS": {
+        "object_id": "toi", "disposition": "tfopwg_disp",
+        "period": "pl_orbper", "planet_radius": "pl_rade", "teq": "pl_eqt",
+        "insolation": "pl_insol", "depth": "pl_trandep", "duration": "pl_trandurh",
+        "star_teff": "st_teff", "star_logg": "st_logg", "star_radius": "st_rad"
+    }
+}
+
+# La profundidad de K2 viene en %, la de Kepler y TESS en ppm
+DEPTH_TO_PPM = {"Kepler": 1.0, "K2": 1e4, "TESS": 1.0}
+
+# Disposiciones de TESS (TFOPWG) además de las de Kepler/K2
+TFOPWG_POSITIVE = {"CP", "KP", "PC", "APC"}
+TFOPWG_NEGATIVE = {"FP", "FA"}
+# Planetas confirmados (no candidatos): los vecinos de app/neighbors.py
+CONFIRMED_LABELS = {"CONFIRMED", "CP", "KP"}
+
+# Columnas medidas (unidades canónicas: días, radios terrestres, K, ppm,
+# horas, radios y masas solares, insolación terrestre)
+BASE_COLUMNS = [
+    "period", "planet_radius", "teq", "insolation", "depth", "duration", "impact",
+    "star_teff", "star_logg", "star_radius", "star_mass"
+]
+DERIVED_COLUMNS = [
+    "log_period", "log_planet_radius", "log_insolation", "log_depth",
+    "radius_ratio", "expected_depth", "log_depth_ratio"
+]
+# Lo que entra al modelo unificado ('mission' es categórica)
+FEATURE_COLUMNS = [
+    "log_period", "log_planet_radius", "teq", "log_insolation", "log_depth",
+    "duration", "impact", "star_teff", "star_logg", "star_radius",
+    "radius_ratio", "log_depth_ratio", "mission"
+]
+
+# label: 1 = Confirmed/Candidate, 0 = False Positive, -1 = sin etiqueta;
+# confirmed: 1 solo para planetas confirmados
+STORED_COLUMNS = ["label", "confirmed"] + BASE_COLUMNS + DERIVED_COLUMNS
+INT_COLUMNS = {"label", "confirmed"}
+
+EARTH_RADII_PER_SUN = 109.076
+SUN_TEFF = 5772.0
+SUN_LOGG = 4.438
+
+# =========================
+# Esquema canónico y derivadas
+# =========================
+
+def _log10(values):
+    """log10 con NaN para valores nulos o no positivos"""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(values > 0, np.log10(values), np.nan)
+
+def label_values(disposition):
+    """
+    (etiqueta binaria, confirmado) de la disposición; la etiqueta es -1 si
+    no es etiquetable
+    """
+    disposition = disposition.astype(str).str.strip().str.upper()
+    positive = disposition.isin(POSITIVE_LABELS | TFOPWG_POSITIVE)
+    negative = disposition.isin(NEGATIVE_LABELS | TFOPWG_NEGATIVE)
+    labels = np.where(positive, 1, np.where(negative, 0, -1)).astype(np.int8)
+    return labels, disposition.isin(CONFIRMED_LABELS).to_numpy().astype(np.int8)
+
+def derive(frame):
+    """
+    Completa la masa estelar y la insolación que falten y añade las
+    columnas derivadas (vectorizado, modifica frame)
+    """
+    # Masa estelar a partir de log g y el radio: M = g R² / G (unidades solares)
+    mass_from_logg = 10 ** (frame["star_logg"] - SUN_LOGG) * frame["star_radius"] ** 2
+    frame["star_mass"] = frame["star_mass"].fillna(mass_from_logg)
+
+    # Insolación S = (R*)² (Teff/Tsol)⁴ / a², con a (UA) de la tercera ley de Kepler
+    with np.errstate(invalid="ignore"):
+        semi_major = (frame["star_mass"] * (frame["period"] / 365.25) ** 2) ** (1 / 3)
+        insolation = frame["star_radius"] ** 2 * (frame["star_teff"] / SUN_TEFF) ** 4 / semi_major ** 2
+    frame["insolation"] = frame["insolation"].fillna(insolation)
+
+    frame["log_period"] = _log10(frame["period"].to_numpy())
+    frame["log_planet_radius"] = _log10(frame["planet_radius"].to_numpy())
+    frame["log_insolation"] = _log10(frame["insolation"].to_numpy())
+    frame["log_depth"] = _log10(frame["depth"].to_numpy())
+
+    # Profundidad esperada de un tránsito central, (Rp/R*)² en ppm; muy por
+    # encima o por debajo de la medida apunta a binaria eclipsante o mezcla
+    frame["radius_ratio"] = frame["planet_radius"] / (frame["star_radius"] * EARTH_RADII_PER_SUN)
+    frame["expected_depth"] = frame["radius_ratio"] ** 2 * 1e6
+    with np.errstate(divide="ignore", invalid="ignore"):
+        frame["log_depth_ratio"] = _log10((frame["depth"] / frame["expected_depth"]).to_numpy())
+    return frame
+
+def canonical_frame(df, mission):
+    """
+    Columnas del catálogo de una misión pasadas al esquema canónico, con las
+    derivadas calculadas. Las columnas que el catálogo no trae quedan a NaN.
+    """
+    sources = SOURCE_COLUMNS[mission]
+    key = sources["object_id"]
+    if key in df.columns:
+        ids = df[key].astype(str).str.strip()
+        keep = df[key].notna().to_numpy()
+    else:
+        # Filas sin id (p. ej. una subida para buscar vecinos): se conservan todas
+        ids = pd.Series("", index=df.index)
+        keep = np.ones(len(df), dtype=bool)
+    frame = pd.DataFrame({"object_id": ids.to_numpy()}, index=df.index)
+    disposition = sources["disposition"]
+    if disposition in df.columns:
+        frame["label"], frame["confirmed"] = label_values(df[disposition])
+    else:
+        frame["label"], frame["confirmed"] = np.int8(-1), np.int8(0)
+    for col in BASE_COLUMNS:
+        source = sources.get(col)
+        frame[col] = (pd.to_numeric(df[source], errors="coerce").astype(np.float64)
+                      if source in df.columns else np.nan)
+    frame["depth"] *= DEPTH_TO_PPM[mission]
+    frame = frame[keep].reset_index(drop=True)
+    return derive(frame)
+
+# =========================
+# Tablas por misión
+# =========================
+
+class FeatureTable:
+    """
+    Una versión del almacén de una misión: ids ordenados y columnas
+    canónicas con memoria mapeada
+    """
+    def __init__(self, mission, version, path, meta):
+        self.mission = mission
+        self.version = version
+        self.meta = meta
+        self.ids = np.load(os.path.join(path, "object_id.npy"), mmap_mode="r")
+        self.columns = {
+            col["name"]: np.load(os.path.join(path, f"{col['name']}.npy"), mmap_mode="r")
+            for col in meta["columns"] if col["name"] != "object_id"
+        }
+
+    def __len__(self):
+        return len(self.ids)
+
+    def positions(self, ids):
+        """Fila de cada id (-1 si no está)"""
+        ids = np.asarray(ids, dtype=str)
+        pos = np.searchsorted(self.ids, ids)
+        found = pos < len(self.ids)
+        found[found] = self.ids[pos[found]] == ids[found]
+        return np.where(found, pos, -1)
+
+    def frame(self, rows=None, columns=None):
+        """DataFrame con las filas pedidas (todas si rows es None)"""
+        names = columns or list(self.columns)
+        take = (lambda a: np.asarray(a)) if rows is None else (lambda a: a[rows])
+        data = {"object_id": take(self.ids).astype(object)}
+        data.update({name: take(self.columns[name]) for name in names if name in self.columns})
+        frame = pd.DataFrame(data)
+        frame["mission"] = self.mission
+        return frame
+
+def _mission_dir(mission):
+    return os.path.join(STORE_DIR, mission)
+
+def current_version(mission):
+    try:
+        with open(os.path.join(_mission_dir(mission), CURRENT_POINTER)) as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+_tables = {}
+
+def open_table(mission):
+    """Versión vigente de la misión (None si nunca se ingirió); se reabre solo si cambió"""
+    version = current_version(mission)
+    if version is None:
+        return None
+    table = _tables.get(mission)
+    if table is None or table.version != version:
+        path = os.path.join(_mission_dir(mission), version)
+        try:
+            with open(os.path.join(path, "schema.json")) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if meta.get("version") != STORE_VERSION:
+            return None
+        table = _tables[mission] = FeatureTable(mission, version, path, meta)
+    return table
+
+def write_table(mission, frame, sources):
+    """
+    Publica frame (ya canónico, ids únicos) como nueva versión de la
+    misión: ordena por id, escribe las columnas y cambia el puntero
+    """
+    frame = frame.sort_values("object_id", kind="stable", ignore_index=True)
+    ids = frame["object_id"].to_numpy(dtype=str)
+
+    mission_dir = _mission_dir(mission)
+    version = f"{int(time.time())}-{uuid.uuid4().hex[:8]}"
+    staging = os.path.join(mission_dir, f".staging-{version}")
+    os.makedirs(staging)
+
+    columns = [{"name": "object_id", "dtype": ids.dtype.str}]
+    np.save(os.path.join(staging, "object_id.npy"), ids)
+    for name in STORED_COLUMNS:
+        values = frame[name].to_numpy(dtype=np.int8 if name in INT_COLUMNS else np.float64)
+        np.save(os.path.join(staging, f"{name}.npy"), values)
+        columns.append({"name": name, "dtype": values.dtype.str})
+
+    meta = {
+        "version": STORE_VERSION,
+        "mission": mission,
+        "rows": len(frame),
+        "labelled": int((frame["label"] >= 0).sum()),
+        "columns": columns,
+        "sources": sources,
+        "updated_at": time.time()
+    }
+    with open(os.path.join(staging, "schema.json"), "w") as f:
+        json.dump(meta, f, indent=2)
+    os.replace(staging, os.path.join(mission_dir, version))
+
+    replaced = current_version(mission)
+    tmp_pointer = os.path.join(mission_dir, f"{CURRENT_POINTER}.{os.getpid()}.tmp")
+    with open(tmp_pointer, "w") as f:
+        f.write(version)
+    os.replace(tmp_pointer, os.path.join(mission_dir, CURRENT_POINTER))
+
+    if replaced is not None:
+        _remove_old_versions(mission_dir, keep=(version, replaced))
+    return meta
+
+def _version_time(name):
+    """Segundo de publicación de una versión ('<segundos>-<hex>'); None si no lo es"""
+    try:
+        return int(name.split("-", 1)[0])
+    except ValueError:
+        return None
+
+def _remove_old_versions(mission_dir, keep):
+    """
+    Borra las versiones completas más antiguas que las de 'keep' (la nueva y
+    la que apuntaba CURRENT hasta ahora: un lector puede haber leído ya el
+    puntero sin abrirla; se borra en la siguiente publicación). Los
+    .staging-* son de otros procesos escribiendo y no se tocan; las abiertas
+    siguen mapeadas aunque se borren.
+    """
+    limit = min(_version_time(name) or 0 for name in keep)
+    for name in os.listdir(mission_dir):
+        if name in keep or name.startswith((".", CURRENT_POINTER)):
+            continue
+        path = os.path.join(mission_dir, name)
+        created = _version_time(name)
+        if created is not None and created < limit and os.path.exists(os.path.join(path, "schema.json")):
+            shutil.rmtree(path, ignore_errors=True)
+
+def update_from_csv(csv_path, mission=None):
+    """
+    Pasa un catálogo al esquema canónico y lo mezcla con lo que ya hay de
+    su misión: los ids del CSV se reemplazan (la última fila de cada id) y
+    los demás se conservan. Solo se leen las columnas del mapeo.
+    """
+    header = pd.read_csv(csv_path, comment="#", nrows=0).columns
+    mission = mission or detect_mission(header)
+    if mission not in SOURCE_COLUMNS:
+        raise ValueError(f"No se puede detectar la misión de {csv_path}")
+    wanted = set(SOURCE_COLUMNS[mission].values())
+    key = SOURCE_COLUMNS[mission]["object_id"]
+    if key not in header:
+        raise ValueError(f"Falta la columna clave '{key}' en {csv_path}")
+
+    start = time.perf_counter()
+    chunks = [
+        canonical_frame(chunk, mission)
+        for chunk in read_csv_chunks(csv_path, usecols=lambda c: c in wanted, dtype={key: str})
+    ]
+    new = pd.concat(chunks, ignore_index=True).drop_duplicates("object_id", keep="last")
+
+    sources = [os.path.abspath(csv_path)]
+    table = open_table(mission)
+    if table is not None and len(table):
+        keep = np.flatnonzero(~np.isin(table.ids, new["object_id"].to_numpy(dtype=str)))
+        old = table.frame(keep).drop(columns="mission")
+        new = pd.concat([old, new], ignore_index=True)
+        sources = sorted(set(table.meta.get("sources", [])) | set(sources))
+
+    meta = write_table(mission, new, sources)
+    print(f"🧮 Características de {mission}: {meta['rows']} objetos "
+          f"({meta['labelled']} etiquetados) en {time.perf_counter() - start:.2f}s")
+    return meta
+
+# =========================
+# Lectura para entrenar y clasificar
+# =========================
+
+def training_matrix(missions=MISSIONS):
+    """
+    (X, y) con las filas etiquetadas de las misiones pedidas; X tiene las
+    columnas de FEATURE_COLUMNS listas para el pipeline
+    """
+    frames = []
+    for mission in missions:
+        table = open_table(mission)
+        if table is None:
+            continue
+        rows = np.flatnonzero(np.asarray(table.columns["label"]) >= 0)
+        frames.append(table.frame(rows, FEATURE_COLUMNS + ["label"]))
+    if not frames:
+        raise FileNotFoundError("El almacén de características está vacío: ingiere algún catálogo primero")
+    df = pd.concat(frames, ignore_index=True)
+    return df[FEATURE_COLUMNS], df["label"].astype(int)
+
+def lookup(ids, missions=MISSIONS):
+    """
+    Características de los objetos pedidos (en el orden de ids) y lista de
+    los ids que no están en ninguna misión
+    """
+    ids = [str(i).strip() for i in ids]
+    frames = []
+    found = np.zeros(len(ids), dtype=bool)
+    order = []
+    for mission in missions:
+        table = open_table(mission)
+        if table is None:
+            continue
+        pos = table.positions(ids)
+        hit = np.flatnonzero((pos >= 0) & ~found)
+        if len(hit):
+            frames.append(table.frame(pos[hit]))
+            order.append(hit)
+            found[hit] = True
+    missing = [i for i, ok in zip(ids, found) if not ok]
+    if not frames:
+        return pd.DataFrame(columns=["object_id", "mission"] + STORED_COLUMNS), missing
+    df = pd.concat(frames, ignore_index=True)
+    return df.iloc[np.argsort(np.concatenate(order), kind="stable")].reset_index(drop=True), missing
+
+def store_info():
+    """Versión, filas y origen del almacén de cada misión"""
+    info = {}
+    for mission in MISSIONS:
+        table = open_table(mission)
+        if table is not None:
+            info[mission] = {key: table.meta[key] for key in ("rows", "labelled", "sources", "updated_at")}
+            info[mission]["version"] = table.version
+    return info
+
+if __name__ == "__main__":
+    for path in sys.argv[1:]:
+        update_from_csv(path)
@@ -0,0 +1,201 @@
+# =========================
+# Planificador de inferencia por lotes
+# =========================
+# Las peticiones pequeñas y concurrentes de /api/classify se juntan durante
+# una ventana corta (max_latency) y se predicen en un solo lote vectorizado,
+# fuera del event loop, en un pool de hilos. Cada petición lleva el modelo
+# que tomó su handler: tras un cambio de versión las peticiones de uno y
+# otro modelo se predicen en lotes distintos.
+
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from app.metrics import Histogram
+
+MAX_LATENCY = float(os.getenv("INFERENCE_MAX_LATENCY_MS", "5")) / 1000
+MAX_BATCH_ROWS = int(os.getenv("INFERENCE_MAX_BATCH_ROWS", "50000"))
+WORKERS = int(os.getenv("INFERENCE_WORKERS", "2"))
+
+LATENCY_BUCKETS = [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]
+BATCH_ROWS_BUCKETS = [1, 10, 100, 1000, 10_000, 100_000, 1_000_000]
+BATCH_REQUESTS_BUCKETS = [1, 2, 4, 8, 16, 32, 64, 128]
+
+def _resolve(future, result=None, error=None):
+    """Entrega el resultado salvo que el cliente ya haya cancelado la petición"""
+    if future.done():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+
+class InferenceScheduler:
+    def __init__(self, model_provider, max_latency=MAX_LATENCY,
+                 max_batch_rows=MAX_BATCH_ROWS, workers=WORKERS):
+        """
+        model_provider: función sin argumentos que devuelve el ExoplanetModel
+        actual; se usa con las peticiones que no pasan su modelo
+        """
+        self.model_provider = model_provider
+        self.max_latency = max_latency
+        self.max_batch_rows = max_batch_rows
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="inference")
+
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.batch_rows = Histogram(BATCH_ROWS_BUCKETS)
+        self.batch_requests = Histogram(BATCH_REQUESTS_BUCKETS)
+
+        self._queue = None
+        self._collector = None
+        self._pending = set()
+
+    async def start(self):
+        """Arranca el recolector de lotes (se llama al arrancar la app)"""
+        if self._collector is None:
+            self._queue = asyncio.Queue()
+            self._collector = asyncio.create_task(self._collect())
+
+    async def stop(self):
+        """
+        Detiene el recolector y espera los lotes en curso. Las peticiones
+        que quedaban en la cola se predicen igual (si no, esperarían siempre).
+        """
+        if self._collector is not None:
+            self._collector.cancel()
+            try:
+                await self._collector
+            except asyncio.CancelledError:
+                pass
+            self._collector = None
+            queued = []
+            while not self._queue.empty():
+                queued.append(self._queue.get_nowait())
+            if queued:
+                self._dispatch(queued)
+        if self._pending:
+            await asyncio.gather(*self._pending, return_exceptions=True)
+
+    async def predict(self, X, model=None):
+        """
+        Igual que model.predict(X) pero sin bloquear el event loop.
+        Devuelve (predicciones, probabilidades) solo de las filas de X.
+        model: el que el handler ya usó para planificar la petición (por
+        defecto, el de model_provider)
+        """
+        start = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        model = model if model is not None else self.model_provider()
+        try:
+            # Lotes grandes o sin recolector: se predicen directamente
+            if self._collector is None or len(X) >= self.max_batch_rows:
+                self.batch_rows.observe(len(X))
+                self.batch_requests.observe(1)
+                return await loop.run_in_executor(self.executor, model.predict, X)
+
+            future = loop.create_future()
+            await self._queue.put((X, model, future))
+            return await future
+        finally:
+            self.latency.observe(time.perf_counter() - start)
+
+    async def explain(self, X, k, model=None):
+        """
+        model.explain en el pool de inferencia: (predicciones, probabilidades,
+        nombres, aportaciones). No se junta con otras peticiones ni pasa por
+        el caché de predicciones.
+        """
+        start = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        model = model if model is not None else self.model_provider()
+        try:
+            self.batch_rows.observe(len(X))
+            self.batch_requests.observe(1)
+            return await loop.run_in_executor(self.executor, model.explain, X, k)
+        finally:
+            self.latency.observe(time.perf_counter() - start)
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            rows = len(batch[0][0])
+            deadline = loop.time() + self.max_latency
+
+            # Esperar más peticiones hasta llenar el lote o agotar la ventana
+            try:
+                while rows < self.max_batch_rows:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                    batch.append(item)
+                    rows += len(item[0])
+            except asyncio.CancelledError:
+                # Al parar, lo ya recogido se predice (stop() espera a _pending)
+                self._dispatch(batch)
+                raise
+            self._dispatch(batch)
+
+    def _dispatch(self, batch):
+        """Un lote por modelo (mismo objeto), cada uno en su propia tarea"""
+        by_model = {}
+        for X, model, future in batch:
+            by_model.setdefault(id(model), (model, []))[1].append((X, future))
+        for model, items in by_model.values():
+            task = asyncio.create_task(self._score(model, items))
+            self._pending.add(task)
+            task.add_done_callback(self._pending.discard)
+
+    async def _score(self, model, batch):
+        loop = asyncio.get_running_loop()
+
+        # Cada petición se proyecta a las columnas del modelo; si le falta
+        # alguna solo falla esa petición, no el lote entero
+        frames = []
+        ready = []
+        for X, future in batch:
+            try:
+                frames.append(model.select(X))
+                ready.append(future)
+            except Exception as e:
+                _resolve(future, error=e)
+        if not frames:
+            return
+
+        self.batch_rows.observe(sum(len(f) for f in frames))
+        self.batch_requests.observe(len(frames))
+
+        try:
+            X_all = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+            predictions, probabilities = await loop.run_in_executor(self.executor, model.predict, X_all)
+        except Exception:
+            # Un valor inválido en una petición no debe tumbar a las demás
+            for frame, future in zip(frames, ready):
+                try:
+                    _resolve(future, await loop.run_in_executor(self.executor, model.predict, frame))
+                except Exception as e:
+                    _resolve(future, error=e)
+            return
+
+        offsets = np.cumsum([0] + [len(f) for f in frames])
+        for i, future in enumerate(ready):
+            a, b = offsets[i], offsets[i + 1]
+            _resolve(future, (predictions[a:b], probabilities[a:b]))
+
+    def stats(self):
+        """Histogramas de latencia por petición y de tamaño de lote"""
+        return {
+            "max_latency_ms": self.max_latency * 1000,
+            "max_batch_rows": self.max_batch_rows,
+            "latency_seconds": self.latency.snapshot(),
+            "batch_rows": self.batch_rows.snapshot(),
+            "batch_requests": self.batch_requests.snapshot()
+        }
@@ -0,0 +1,334 @@
+# =========================
+# Ingesta de los CSV de la NASA en PostgreSQL
+# =========================
+# El CSV se envía tal cual a PostgreSQL con COPY, por lotes de tamaño fijo
+# (memoria acotada) y sin las líneas de comentario '#'. La primera carga va
+# directa a la tabla nueva y los índices se crean al final; las siguientes
+# pasan por una tabla temporal y se hace upsert por la clave de cada tabla
+# (kepoi_name, pl_name, toi), así que volver a ingerir un export solo
+# reescribe las filas que cambiaron. Al terminar se actualiza también el
+# almacén de características de la misión (app/features.py).
+#
+# Uso:
+#   python -m app.ingest data/cumulative.csv [--dataset kepler] [--table kepler_raw]
+
+import argparse
+import asyncio
+import csv
+import re
+import time
+
+import asyncpg
+
+from app import crossmatch, db, features, planets, summaries
+from app.columnar import infer_schema
+from app.missions import detect_mission
+from app.planets import (DATASET_MISSIONS, DISPOSITION_COLS, KEY_COLS, MISSION_DATASETS, PERIOD_COLS,
+                         RADIUS_COLS)
+
+# Tipo de PostgreSQL para cada dtype de columnar.infer_schema
+SQL_TYPES = {"int64": "bigint", "float64": "double precision", "bool": "boolean"}
+
+BATCH_BYTES = 4 * 1024 * 1024   # bytes por mensaje de COPY
+# Con más filas que esto no compensa calcular el delta del resumen: se recalcula entero
+DELTA_MAX_ROWS = 100_000
+
+IDENTIFIER = re.compile(r"^[a-z_][a-z0-9_]*$")
+STAGE_TABLE = "ingest_stage"
+# En los exports de la NASA con varias filas por objeto (una por referencia,
+# p. ej. pl_name en K2) default_flag = 1 marca el conjunto de parámetros por defecto
+DEFAULT_FLAG_COL = "default_flag"
+
+def read_header(csv_path):
+    """Columnas del CSV (primera línea que no es comentario)"""
+    with open(csv_path, newline="") as f:
+        for line in f:
+            if line.strip() and not line.startswith("#"):
+                return next(csv.reader([line]))
+    raise ValueError(f"{csv_path} no tiene cabecera")
+
+def detect_dataset(columns):
+    mission = detect_mission(columns)
+    if mission is None:
+        raise ValueError("El CSV mezcla columnas de varias misiones; indica --dataset")
+    return MISSION_DATASETS[mission]
+
+def column_types(csv_path, key):
+    """
+    {columna: tipo SQL} a partir de columnar.infer_schema. La clave va
+    siempre como texto ('107.10' no debe quedar como 107.1).
+    """
+    schema, _ = infer_schema(csv_path)
+    types = {}
+    for col in schema:
+        types[col["name"]] = SQL_TYPES.get(col["dtype"], "text")
+    types[key] = "text"
+    return types
+
+async def csv_batches(csv_path, batch_bytes=BATCH_BYTES):
+    """
+    Filas de datos del CSV en bloques de ~batch_bytes, sin la cabecera ni
+    el bloque de comentarios (#) que la precede en los exports de la NASA.
+    Después de la cabecera las líneas pasan sin tocar (una que empiece por
+    # o vacía puede ser parte de un campo entre comillas); solo se quitan
+    las líneas vacías del final. PostgreSQL parsea el CSV (comillas incluidas).
+    """
+    with open(csv_path, "rb") as f:
+        for line in f:
+            if line.strip() and not line.startswith(b"#"):
+                break  # cabecera
+        batch = []
+        blank = []
+        size = 0
+        for line in f:
+            if not line.strip():
+                # Se envían solo si después viene otra línea
+                blank.append(line)
+                continue
+            if blank:
+                batch.extend(blank)
+                size += sum(len(b) for b in blank)
+                blank = []
+            batch.append(line)
+            size += len(line)
+            if size >= batch_bytes:
+                yield b"".join(batch)
+                batch = []
+                size = 0
+        if batch:
+            yield b"".join(batch)
+
+async def _table_columns(conn, table):
+    rows = await conn.fetch(
+        "SELECT column_name, data_type FROM information_schema.columns WHERE table_name = $1",
+        table
+    )
+    return {r["column_name"]: r["data_type"] for r in rows}
+
+async def _create_indexes(conn, dataset, table, key, types):
+    """Índices de las consultas de /api/planets (clave única, disposición y rangos)"""
+    await conn.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS {table}_{key}_key ON {table} ({key})")
+    disposition = DISPOSITION_COLS.get(dataset)
+    if disposition in types:
+        await conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_{disposition}_idx ON {table} ({disposition})")
+    for cols in (PERIOD_COLS, RADIUS_COLS):
+        col = cols.get(dataset)
+        # Sobre texto el filtro usa una expresión y el índice no serviría
+        if types.get(col) in planets.SQL_NUMERIC_TYPES:
+            await conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_{col}_idx ON {table} ({col})")
+
+async def _copy(conn, table, header, source, **options):
+    """COPY del CSV; devuelve (filas, segundos)"""
+    start = time.perf_counter()
+    status = await conn.copy_to_table(table, source=source, columns=header, format="csv", **options)
+    return int(status.split()[-1]), time.perf_counter() - start
+
+def _kept_first(header):
+    """
+    ORDER BY que pone primero la fila que se conserva de una clave repetida:
+    la de default_flag = 1 si el archivo trae la columna y, a igualdad, la
+    última del archivo (la tabla se llena en orden)
+    """
+    order = "ctid DESC"
+    if DEFAULT_FLAG_COL in header:
+        order = f"({DEFAULT_FLAG_COL}::text IN ('1', 'true')) IS TRUE DESC, {order}"
+    return order
+
+async def _initial_load(conn, table, header, key, source):
+    """
+    Primera carga: COPY directo a la tabla recién creada (FREEZE, sin
+    índices). Solo si el índice único falla se quitan las claves repetidas.
+    Devuelve (filas leídas, segundos del COPY, insertadas, repetidas quitadas).
+    """
+    rows_read, copy_seconds = await _copy(conn, table, header, source, freeze=True)
+    await conn.execute(f"DELETE FROM {table} WHERE {key} IS NULL")
+    duplicates = 0
+    try:
+        async with conn.transaction():
+            await conn.execute(f"CREATE UNIQUE INDEX {table}_{key}_key ON {table} ({key})")
+    except asyncpg.exceptions.UniqueViolationError:
+        status = await conn.execute(
+            f"DELETE FROM {table} WHERE ctid IN (SELECT ctid FROM ("
+            f"SELECT ctid, row_number() OVER (PARTITION BY {key} ORDER BY {_kept_first(header)}) AS n "
+            f"FROM {table} WHERE {key} IN (SELECT {key} FROM {table} GROUP BY {key} HAVING count(*) > 1)"
+            f") ranked WHERE n > 1)"
+        )
+        duplicates = int(status.split()[-1])
+        await conn.execute(f"CREATE UNIQUE INDEX {table}_{key}_key ON {table} ({key})")
+    inserted = await conn.fetchval(f"SELECT count(*) FROM {table}")
+    return rows_read, copy_seconds, inserted, duplicates
+
+async def _upsert(conn, dataset, table, header, key, source, use_delta):
+    """
+    Recarga: COPY a una tabla temporal y upsert por la clave. Las filas que
+    no cambiaron no se reescriben. Con use_delta se actualiza el resumen del
+    dashboard con la diferencia de las filas afectadas. Devuelve (filas
+    leídas, segundos del COPY, insertadas, actualizadas, use_delta,
+    repetidas descartadas).
+    """
+    # El upsert necesita el índice único de la clave
+    await conn.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS {table}_{key}_key ON {table} ({key})")
+    cols = ", ".join(header)
+    await conn.execute(
+        f"CREATE TEMP TABLE {STAGE_TABLE} ON COMMIT DROP AS SELECT {cols} FROM {table} WITH NO DATA"
+    )
+    rows_read, copy_seconds = await _copy(conn, STAGE_TABLE, header, source)
+
+    use_delta = use_delta and rows_read <= DELTA_MAX_ROWS
+    if use_delta:
+        keys = [r[0] for r in await conn.fetch(
+            f"SELECT DISTINCT {key}::text FROM {STAGE_TABLE} WHERE {key} IS NOT NULL"
+        )]
+        before = await summaries.compute(dataset, conn, keys)
+
+    others = [c for c in header if c != key]
+    if others:
+        action = (
+            f"UPDATE SET {', '.join(f'{c} = EXCLUDED.{c}' for c in others)} "
+            f"WHERE ROW({', '.join(f't.{c}' for c in others)}) "
+            f"IS DISTINCT FROM ROW({', '.join(f'EXCLUDED.{c}' for c in others)})"
+        )
+    else:
+        action = "NOTHING"
+
+    def upsert_sql(select):
+        return (
+            f"WITH up AS (INSERT INTO {table} AS t ({cols}) {select} "
+            f"ON CONFLICT ({key}) DO {action} RETURNING (xmax = 0) AS inserted) "
+            "SELECT count(*) FILTER (WHERE inserted) AS inserted, count(*) AS total FROM up"
+        )
+
+    duplicates = 0
+    try:
+        async with conn.transaction():
+            row = await conn.fetchrow(upsert_sql(f"SELECT {cols} FROM {STAGE_TABLE} WHERE {key} IS NOT NULL"))
+    except asyncpg.exceptions.CardinalityViolationError:
+        # Claves repetidas en el archivo: una fila por clave (ver _kept_first)
+        row = await conn.fetchrow(upsert_sql(
+            f"SELECT DISTINCT ON ({key}) {cols} FROM {STAGE_TABLE} "
+            f"WHERE {key} IS NOT NULL ORDER BY {key}, {_kept_first(header)}"
+        ))
+        duplicates = await conn.fetchval(
+            f"SELECT count(*) - count(DISTINCT {key}) FROM {STAGE_TABLE} WHERE {key} IS NOT NULL"
+        )
+
+    if use_delta:
+        after = await summaries.compute(dataset, conn, keys)
+        await summaries.apply_delta(dataset, conn, before, after)
+    return rows_read, copy_seconds, row["inserted"], row["total"] - row["inserted"], use_delta, duplicates
+
+async def ingest_csv(csv_path, dataset=None, table=None, key=None, batch_bytes=BATCH_BYTES):
+    """
+    Carga (o actualiza) <dataset>_raw con el CSV. Devuelve un resumen con
+    filas insertadas/actualizadas y filas por segundo.
+    """
+    start = time.perf_counter()
+    header = read_header(csv_path)
+    bad = [col for col in header if not IDENTIFIER.match(col)]
+    if bad:
+        raise ValueError(f"Nombres de columna no válidos: {bad[:5]}")
+
+    dataset = dataset or detect_dataset(header)
+    table = table or f"{dataset}_raw"
+    key = key or KEY_COLS[dataset]
+    if key not in header:
+        raise ValueError(f"Falta la columna clave '{key}' en {csv_path}")
+    if not IDENTIFIER.match(table):
+        raise ValueError(f"Nombre de tabla no válido: {table}")
+
+    pool = await db.get_pool()
+    async with pool.acquire() as conn:
+        existing = await _table_columns(conn, table)
+        created = not existing
+        new_cols = [col for col in header if col not in existing]
+        # Solo hace falta inferir tipos (una pasada con pandas) si hay columnas nuevas
+        types = column_types(csv_path, key) if new_cols else {}
+        source = csv_batches(csv_path, batch_bytes)
+        use_delta = (not created and table == f"{dataset}_raw" and dataset in planets.USEFUL_COLS
+                     and key == KEY_COLS[dataset])
+
+        async with conn.transaction():
+            if created:
+                await conn.execute(
+                    f"CREATE TABLE {table} ({', '.join(f'{c} {types[c]}' for c in header)})"
+                )
+                rows_read, copy_seconds, inserted, duplicates = await _initial_load(
+                    conn, table, header, key, source
+                )
+                updated = 0
+                await _create_indexes(conn, dataset, table, key, types)
+            else:
+                for col in new_cols:
+                    await conn.execute(f"ALTER TABLE {table} ADD COLUMN {col} {types[col]}")
+                rows_read, copy_seconds, inserted, updated, use_delta, duplicates = await _upsert(
+                    conn, dataset, table, header, key, source, use_delta
+                )
+
+        await conn.execute(f"ANALYZE {table}")
+
+    # Los tipos de la tabla pueden haber cambiado
+    planets._column_types.pop(dataset, None)
+    if table == f"{dataset}_raw" and dataset in planets.USEFUL_COLS and not use_delta:
+        await summaries.refresh_summary(dataset)
+
+    # Características canónicas y derivadas de los objetos del archivo (upsert por id)
+    mission = DATASET_MISSIONS.get(dataset)
+    feature_rows = None
+    if mission is not None and table == f"{dataset}_raw":
+        try:
+            feature_rows = (await asyncio.to_thread(features.update_from_csv, csv_path, mission))["rows"]
+        except (ValueError, KeyError) as e:
+            print(f"⚠️ No se actualizó el almacén de características: {e}")
+
+    # Grupos de objetos repetidos entre misiones (se recalculan con las tres tablas)
+    match_groups = None
+    if mission is not None and table == f"{dataset}_raw":
+        try:
+            match_groups = (await crossmatch.rebuild())["groups"]
+        except (ImportError, asyncpg.PostgresError) as e:
+            print(f"⚠️ No se actualizó el cross-match: {e}")
+
+    seconds = time.perf_counter() - start
+    result = {
+        "dataset": dataset,
+        "table": table,
+        "created": created,
+        "new_columns": [] if created else new_cols,
+        "rows_read": rows_read,
+        "inserted": inserted,
+        "updated": updated,
+        # Sin cambios, sin clave o repetidas en el archivo
+        "skipped": rows_read - inserted - updated,
+        # Filas descartadas por repetir la clave de otra del archivo
+        "duplicates": duplicates,
+        "copy_seconds": round(copy_seconds, 3),
+        "seconds": round(seconds, 3),
+        "rows_per_second": round(rows_read / seconds) if seconds else None,
+        # Objetos en el almacén de características de la misión (None si no aplica)
+        "feature_rows": feature_rows,
+        # Grupos del cross-match tras la carga (None si no aplica)
+        "match_groups": match_groups
+    }
+    print(f"📥 {csv_path} -> {table}: {rows_read} filas ({inserted} nuevas, {updated} actualizadas) "
+          f"en {seconds:.2f}s, {result['rows_per_second']} filas/s")
+    if duplicates:
+        kept = f"la de {DEFAULT_FLAG_COL} = 1 o la última" if DEFAULT_FLAG_COL in header else "la última"
+        print(f"⚠️ {duplicates} filas con {key} repetida descartadas (se queda {kept} de cada clave)")
+    return result
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Carga CSV de la NASA en las tablas *_raw")
+    parser.add_argument("csv_paths", nargs="+")
+    parser.add_argument("--dataset", choices=sorted(planets.USEFUL_COLS))
+    parser.add_argument("--table", help="Tabla destino (por defecto <dataset>_raw)")
+    parser.add_argument("--key", help="Columna clave (por defecto la de la tabla)")
+    args = parser.parse_args()
+
+    async def main():
+        try:
+            for csv_path in args.csv_paths:
+                await ingest_csv(csv_path, args.dataset, args.table, args.key)
+        finally:
+            await db.close_pool()
+
+    asyncio.run(main())
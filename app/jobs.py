@@ -0,0 +1,135 @@
+# =========================
+# Trabajos en segundo plano (entrenamiento)
+# =========================
+# Los trabajos corren en un pool de procesos aparte para no bloquear el
+# event loop ni competir por el GIL con las peticiones. El estado de cada
+# trabajo es un JSON en jobs/<id>.json, así que cualquier worker de uvicorn
+# puede responder al polling aunque el trabajo lo haya lanzado otro.
+
+import json
+import multiprocessing
+import os
+import re
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+from app.metrics import counter, observe_span
+
+JOBS_DIR = os.getenv("JOBS_DIR", "jobs")
+TRAIN_WORKERS = int(os.getenv("TRAIN_WORKERS", "1"))
+JOB_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+_executor = None
+
+def get_executor():
+    """
+    Pool de procesos (se crea la primera vez). Se usa 'spawn' para que el
+    hijo no herede el event loop ni las conexiones del worker.
+    """
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=TRAIN_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _executor
+
+def shutdown():
+    """Cierra el pool sin esperar a los trabajos en curso"""
+    global _executor
+    if _executor is not None:
+        executor, _executor = _executor, None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def _job_path(job_id):
+    return os.path.join(JOBS_DIR, f"{job_id}.json")
+
+def save_job(job):
+    os.makedirs(JOBS_DIR, exist_ok=True)
+    path = _job_path(job["id"])
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(job, f, indent=2)
+    os.replace(tmp_path, path)
+    return job
+
+def get_job(job_id):
+    """Estado del trabajo o None si no existe"""
+    if not JOB_ID_PATTERN.match(job_id):
+        return None
+    try:
+        with open(_job_path(job_id)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def update_job(job_id, **fields):
+    job = get_job(job_id) or {"id": job_id}
+    job.update(fields)
+    return save_job(job)
+
+def new_job(kind, params):
+    return save_job({
+        "id": uuid.uuid4().hex,
+        "kind": kind,
+        "params": params,
+        "status": "queued",
+        "created_at": time.time()
+    })
+
+def run_training_job(job_id, csv_path, tune=False, n_folds=5, streaming=False, store=False):
+    """
+    Se ejecuta en el proceso hijo: entrena (o hace la búsqueda de
+    hiperparámetros si tune=True, o entrena por bloques si streaming=True), publica en el registro y deja el
+    resultado en el estado del trabajo. Con store=True entrena el modelo
+    unificado con el almacén de características (csv_path no se usa) y se
+    publica sin activarlo: no sirve las subidas CSV de cada misión.
+    Devuelve la duración de cada fase para que el proceso del servidor la
+    sume a sus métricas.
+    """
+    from app.ml import ExoplanetModel
+    from app import registry
+
+    update_job(job_id, status="running", started_at=time.time())
+    try:
+        model = ExoplanetModel()
+        if store:
+            results = model.train_from_store()
+        elif tune:
+            results = model.tune_model(csv_path, n_folds=n_folds)
+        elif streaming:
+            results = model.train_streaming(csv_path)
+        else:
+            results = model.train_model(csv_path)
+        meta = registry.publish(model, results, activate=not store)
+        update_job(job_id, status="done", finished_at=time.time(), result=meta)
+        return results.get("timings", {})
+    except Exception as e:
+        print(f"❌ Error en el trabajo {job_id}: {e}")
+        update_job(job_id, status="failed", finished_at=time.time(), error=str(e))
+        return None
+
+def submit_training(csv_path, dataset_type, tune=False, n_folds=5, streaming=False, store=False):
+    """Encola un entrenamiento y devuelve el trabajo recién creado"""
+    job = new_job("train", {"dataset_type": dataset_type, "csv_path": csv_path,
+                            "tune": tune, "n_folds": n_folds, "streaming": streaming, "store": store})
+    future = get_executor().submit(run_training_job, job["id"], csv_path, tune, n_folds, streaming, store)
+
+    def on_done(f):
+        if f.cancelled():
+            return
+        if f.exception() is not None:
+            # El proceso hijo murió sin poder escribir su estado (p. ej. sin memoria)
+            update_job(job["id"], status="failed", finished_at=time.time(), error=str(f.exception()))
+            timings = None
+        else:
+            timings = f.result()
+        # Las métricas del hijo no llegan a /api/metrics: se suman aquí
+        counter("training_jobs", "Entrenamientos terminados",
+                status="done" if timings is not None else "failed").inc()
+        for name, seconds in (timings or {}).items():
+            observe_span(name, seconds)
+
+    future.add_done_callback(on_done)
+    return job
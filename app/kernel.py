@@ -0,0 +1,230 @@
+# =========================
+# Inferencia compilada en NumPy puro
+# =========================
+# El pipeline entrenado (imputer + StandardScaler + one-hot opcional +
+# regresión logística) se reduce a: rellenar NaN, un producto escalar con
+# los coeficientes ya divididos por la escala y una sigmoide. Este módulo
+# no importa sklearn; solo lee los atributos del pipeline ya ajustado.
+#
+# Como el modelo es lineal, la aportación de cada característica al logit es
+# coeficiente × valor escalado = peso × (valor - media del scaler); para una
+# categórica, el coeficiente de su categoría. explain() calcula esa matriz
+# para todas las filas a la vez y se queda con las k de mayor valor absoluto.
+
+import numpy as np
+import pandas as pd
+
+# Clasificadores lineales cuya probabilidad es una sigmoide de la decisión
+LOGISTIC_ESTIMATORS = {"LogisticRegression", "SGDClassifier"}
+
+# A partir de cuántas características top_k usa argpartition en vez de argsort
+PARTITION_MIN_COLUMNS = 256
+
+class CompiledModel:
+    def __init__(self, num_cols, num_fill, num_weights, bias,
+                 cat_cols, cat_fill, cat_categories, cat_weights, classes, logit_scale=1.0,
+                 num_center=None):
+        # Parte numérica: arrays contiguos alineados con num_cols
+        self.num_cols = list(num_cols)
+        self.num_fill = np.ascontiguousarray(num_fill, dtype=np.float64)
+        self.num_weights = np.ascontiguousarray(num_weights, dtype=np.float64)
+        self.bias = float(bias)
+        # Media del scaler (el bias ya la incluye); solo la usa explain()
+        self.num_center = (np.zeros(len(self.num_cols)) if num_center is None
+                           else np.ascontiguousarray(num_center, dtype=np.float64))
+
+        # Parte categórica: por columna, valor de relleno, categorías y el peso
+        # de cada una (el último peso es 0 para categorías desconocidas)
+        self.cat_cols = list(cat_cols)
+        self.cat_fill = list(cat_fill)
+        self.cat_categories = [np.asarray(c) for c in cat_categories]
+        self._cat_index = [pd.Index(c) for c in self.cat_categories]
+        self.cat_weights = [np.ascontiguousarray(w, dtype=np.float64) for w in cat_weights]
+
+        self.classes_ = np.asarray(classes)
+        self.logit_scale = float(logit_scale)
+
+    @classmethod
+    def from_pipeline(cls, pipeline):
+        """
+        Compila un Pipeline(ColumnTransformer, clasificador logístico) ajustado.
+        Lanza ValueError si el pipeline tiene pasos que el kernel no soporta.
+        """
+        preprocess = pipeline.steps[0][1]
+        clf = pipeline.steps[-1][1]
+
+        if type(clf).__name__ not in LOGISTIC_ESTIMATORS:
+            raise ValueError(f"Clasificador no soportado: {type(clf).__name__}")
+        if type(clf).__name__ == "SGDClassifier" and clf.loss not in ("log_loss", "log"):
+            raise ValueError("SGDClassifier solo se compila con loss='log_loss'")
+        if len(clf.classes_) != 2:
+            raise ValueError("Solo se compilan modelos binarios")
+
+        coef = np.asarray(clf.coef_, dtype=np.float64).ravel()
+        bias = float(np.ravel(clf.intercept_)[0])
+        logit_scale = 2.0 if getattr(clf, "multi_class", None) == "multinomial" else 1.0
+
+        num_cols, num_fill, num_weights, num_center = [], [], [], []
+        cat_cols, cat_fill, cat_categories, cat_weights = [], [], [], []
+        pos = 0
+
+        for name, transformer, columns in preprocess.transformers_:
+            if transformer == "drop" or len(columns) == 0:
+                continue
+            if transformer == "passthrough" or not hasattr(transformer, "named_steps"):
+                raise ValueError(f"Transformador no soportado: {name}")
+
+            steps = transformer.named_steps
+            imputer = steps.get("imputer")
+            if imputer is None or getattr(imputer, "add_indicator", False):
+                raise ValueError(f"Imputer no soportado en '{name}'")
+            statistics = imputer.statistics_
+
+            if "onehot" in steps:
+                onehot = steps["onehot"]
+                if getattr(onehot, "drop_idx_", None) is not None or getattr(onehot, "_infrequent_enabled", False):
+                    raise ValueError("OneHotEncoder con drop o categorías infrecuentes no soportado")
+                for col, fill, categories in zip(columns, statistics, onehot.categories_):
+                    n = len(categories)
+                    cat_cols.append(col)
+                    cat_fill.append(fill)
+                    cat_categories.append(categories)
+                    cat_weights.append(np.append(coef[pos:pos + n], 0.0))
+                    pos += n
+                continue
+
+            # Columnas numéricas: las que el imputer no pudo ajustar (todo NaN)
+            # no salen del ColumnTransformer, salvo con keep_empty_features
+            keep = ~np.isnan(statistics.astype(np.float64))
+            if getattr(imputer, "keep_empty_features", False):
+                keep[:] = True
+            columns = [c for c, k in zip(columns, keep) if k]
+            fill = np.nan_to_num(statistics.astype(np.float64)[keep])
+
+            weights = coef[pos:pos + len(columns)]
+            pos += len(columns)
+
+            scaler = steps.get("scaler")
+            center = np.zeros(len(columns))
+            if scaler is not None:
+                scale = scaler.scale_ if scaler.scale_ is not None else np.ones(len(columns))
+                weights = weights / scale
+                if scaler.with_mean:
+                    center = np.asarray(scaler.mean_, dtype=np.float64)
+                    bias -= float(np.dot(center, weights))
+            extra = set(steps) - {"imputer", "scaler"}
+            if extra:
+                raise ValueError(f"Pasos no soportados en '{name}': {sorted(extra)}")
+
+            num_cols.extend(columns)
+            num_fill.extend(fill)
+            num_weights.extend(weights)
+            num_center.extend(center)
+
+        if pos != len(coef):
+            raise ValueError("El número de coeficientes no coincide con las columnas transformadas")
+
+        return cls(num_cols, num_fill, num_weights, bias,
+                   cat_cols, cat_fill, cat_categories, cat_weights, clf.classes_, logit_scale,
+                   num_center)
+
+    def to_dict(self):
+        """Arrays y listas planas para guardar con joblib (sin objetos de sklearn)"""
+        return {
+            "num_cols": self.num_cols,
+            "num_fill": self.num_fill,
+            "num_weights": self.num_weights,
+            "bias": self.bias,
+            "cat_cols": self.cat_cols,
+            "cat_fill": self.cat_fill,
+            "cat_categories": self.cat_categories,
+            "cat_weights": self.cat_weights,
+            "classes": self.classes_,
+            "logit_scale": self.logit_scale,
+            "num_center": self.num_center
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["num_cols"], data["num_fill"], data["num_weights"], data["bias"],
+                   data["cat_cols"], data["cat_fill"], data["cat_categories"], data["cat_weights"],
+                   data["classes"], data["logit_scale"], data.get("num_center"))
+
+    @property
+    def feature_names(self):
+        return self.num_cols + self.cat_cols
+
+    def decision_function(self, X):
+        """Logit de la clase positiva para cada fila del DataFrame X"""
+        z = np.full(len(X), self.bias)
+
+        if self.num_cols:
+            values = X[self.num_cols].to_numpy(dtype=np.float64, na_value=np.nan)
+            values = np.where(np.isnan(values), self.num_fill, values)
+            z += values @ self.num_weights
+
+        for col, fill, index, weights in zip(self.cat_cols, self.cat_fill,
+                                             self._cat_index, self.cat_weights):
+            values = X[col].where(X[col].notna(), fill)
+            # Código -1 (desconocida) apunta al último peso, que vale 0
+            codes = index.get_indexer(values)
+            z += weights[codes]
+
+        return z * self.logit_scale
+
+    def predict_proba(self, X):
+        """Probabilidades [clase 0, clase 1] como el predict_proba de sklearn"""
+        return _probabilities(self.decision_function(X))
+
+    def contributions(self, X):
+        """
+        Matriz (filas, feature_names) con la aportación de cada
+        característica al logit y el logit base (el de una fila con todas
+        las numéricas en su media); base + suma de la fila = decision_function
+        """
+        n = len(X)
+        out = np.empty((n, len(self.num_cols) + len(self.cat_cols)))
+        base = self.bias
+
+        if self.num_cols:
+            values = X[self.num_cols].to_numpy(dtype=np.float64, na_value=np.nan)
+            values = np.where(np.isnan(values), self.num_fill, values)
+            np.multiply(values - self.num_center, self.num_weights, out=out[:, :len(self.num_cols)])
+            base += float(self.num_center @ self.num_weights)
+
+        for j, (col, fill, index, weights) in enumerate(zip(self.cat_cols, self.cat_fill,
+                                                             self._cat_index, self.cat_weights)):
+            values = X[col].where(X[col].notna(), fill)
+            out[:, len(self.num_cols) + j] = weights[index.get_indexer(values)]
+
+        return out * self.logit_scale, base * self.logit_scale
+
+    def explain(self, X, k):
+        """
+        Probabilidades y las k características que más aportan a cada fila
+        en una sola pasada: (probabilidades, índices en feature_names (n, k),
+        aportaciones (n, k)) ordenadas por valor absoluto descendente
+        """
+        contributions, base = self.contributions(X)
+        probabilities = _probabilities(base + contributions.sum(axis=1))
+        top = top_k(contributions, k)
+        return probabilities, top, np.take_along_axis(contributions, top, axis=1)
+
+def top_k(values, k):
+    """
+    Índices de las k columnas de mayor valor absoluto de cada fila, de mayor
+    a menor. Con muchas columnas se usa argpartition (lineal) y solo se
+    ordenan las k elegidas; con pocas, ordenar la fila entera es más rápido
+    (argpartition por fila tiene más coste fijo)
+    """
+    magnitude = np.abs(values)
+    k = min(k, values.shape[1])
+    if values.shape[1] < PARTITION_MIN_COLUMNS:
+        return np.argsort(-magnitude, axis=1)[:, :k]
+    top = np.argpartition(-magnitude, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(magnitude, top, axis=1), axis=1, kind="stable")
+    return np.take_along_axis(top, order, axis=1)
+
+def _probabilities(z):
+    p = np.exp(-np.logaddexp(0.0, -z))  # sigmoide estable
+    return np.column_stack([1.0 - p, p])
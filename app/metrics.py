@@ -0,0 +1,309 @@
+# =========================
+# Métricas del proceso: contadores, histogramas y spans de tiempo
+# =========================
+# Las métricas se registran por nombre y etiquetas en REGISTRY y
+# /api/metrics las exporta en el formato de texto de Prometheus. Cada
+# worker de uvicorn tiene las suyas (Prometheus suma los workers).
+#
+# span("classify.parse") mide un tramo de código y lo guarda en el
+# histograma exoplanets_span_seconds{span="classify.parse"}; el histograma
+# de cada span se busca una sola vez, así que medir cuesta ~1 µs.
+
+import bisect
+import collections
+import os
+import sys
+import threading
+import time
+
+PREFIX = "exoplanets_"
+
+# Límites de los histogramas de spans (segundos)
+SPAN_BUCKETS = [0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+                0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60]
+
+# Perfilador por petición (cabecera X-Profile: 1); apagado por defecto
+PROFILE_ENABLED = os.getenv("PROFILE_ENABLED", "0") == "1"
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL_MS", "5")) / 1000
+
+class Histogram:
+    """
+    Histograma acumulado con límites fijos (seguro entre hilos)
+    """
+    def __init__(self, buckets):
+        self.buckets = sorted(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    def snapshot(self):
+        """Conteos acumulados por límite superior (formato tipo Prometheus)"""
+        with self._lock:
+            counts = list(self.counts)
+            total_sum, total_count = self.sum, self.count
+        cumulative = 0
+        buckets = {}
+        for bound, n in zip(self.buckets + [float("inf")], counts):
+            cumulative += n
+            buckets["+Inf" if bound == float("inf") else str(bound)] = cumulative
+        return {"buckets": buckets, "sum": total_sum, "count": total_count}
+
+class Counter:
+    """Contador que solo sube (seguro entre hilos)"""
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+class Gauge:
+    """Valor que se lee al exportar (p. ej. tamaño del pool)"""
+    def __init__(self, read):
+        self.read = read
+
+class Registry:
+    """Métricas por (nombre, etiquetas), con su tipo y descripción"""
+    def __init__(self):
+        self._families = {}   # nombre -> (tipo, ayuda, {etiquetas: métrica})
+        self._lock = threading.Lock()
+
+    def get(self, kind, name, help, factory, labels):
+        key = tuple(sorted(labels.items()))
+        family = self._families.get(name)
+        if family is not None and key in family[2]:
+            return family[2][key]
+        with self._lock:
+            family = self._families.setdefault(name, (kind, help, {}))
+            if family[0] != kind:
+                raise ValueError(f"La métrica {name} ya existe como {family[0]}")
+            return family[2].setdefault(key, factory())
+
+    def register(self, kind, name, help, metric, **labels):
+        """Añade una métrica que ya existe (p. ej. los histogramas del planificador)"""
+        with self._lock:
+            family = self._families.setdefault(name, (kind, help, {}))
+            family[2][tuple(sorted(labels.items()))] = metric
+        return metric
+
+    def render(self):
+        """Texto en formato de exposición de Prometheus"""
+        with self._lock:
+            families = [(name, kind, help, dict(metrics))
+                        for name, (kind, help, metrics) in sorted(self._families.items())]
+        lines = []
+        for name, kind, help, metrics in families:
+            # Los contadores se exportan con el sufijo _total también en
+            # HELP/TYPE (como prometheus_client), para que la familia
+            # coincida con el nombre de sus muestras
+            family = f"{name}_total" if kind == "counter" else name
+            lines.append(f"# HELP {family} {help}")
+            lines.append(f"# TYPE {family} {kind}")
+            for labels, metric in metrics.items():
+                if kind == "histogram":
+                    snap = metric.snapshot()
+                    for bound, n in snap["buckets"].items():
+                        lines.append(f"{name}_bucket{_labels(labels + (('le', bound),))} {n}")
+                    lines.append(f"{name}_sum{_labels(labels)} {_number(snap['sum'])}")
+                    lines.append(f"{name}_count{_labels(labels)} {snap['count']}")
+                elif kind == "counter":
+                    lines.append(f"{family}{_labels(labels)} {_number(metric.value)}")
+                else:
+                    try:
+                        value = metric.read()
+                    except Exception:
+                        continue
+                    if value is not None:
+                        lines.append(f"{name}{_labels(labels)} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+def _labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in labels)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(labels, escaped)) + "}"
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+REGISTRY = Registry()
+
+def counter(name, help, **labels):
+    return REGISTRY.get("counter", PREFIX + name, help, Counter, labels)
+
+def histogram(name, help, buckets, **labels):
+    return REGISTRY.get("histogram", PREFIX + name, help, lambda: Histogram(buckets), labels)
+
+def gauge(name, help, read, **labels):
+    return REGISTRY.register("gauge", PREFIX + name, help, Gauge(read), **labels)
+
+def render():
+    return REGISTRY.render()
+
+# =========================
+# Spans
+# =========================
+
+_spans = {}
+
+class span:
+    """
+    Mide el bloque y lo suma al histograma del span. Si el bloque lanza una
+    excepción se cuenta en exoplanets_span_errors_total. Con timings (dict)
+    la duración se guarda además en timings[name].
+    """
+    __slots__ = ("name", "timings", "start")
+
+    def __init__(self, name, timings=None):
+        self.name = name
+        self.timings = timings
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        observe_span(self.name, time.perf_counter() - self.start, self.timings)
+        if exc_type is not None:
+            counter("span_errors", "Spans terminados con excepción", span=self.name).inc()
+        return False
+
+def observe_span(name, seconds, timings=None):
+    """Registra la duración de un span (p. ej. medida en otro proceso)"""
+    hist = _spans.get(name)
+    if hist is None:
+        hist = _spans[name] = histogram("span_seconds", "Duración de los tramos instrumentados", SPAN_BUCKETS, span=name)
+    hist.observe(seconds)
+    if timings is not None:
+        timings[name] = timings.get(name, 0.0) + seconds
+
+# =========================
+# Perfilador por muestreo
+# =========================
+
+class SamplingProfiler:
+    """
+    Toma la pila de todos los hilos del proceso cada 'interval' segundos
+    (sys._current_frames) y cuenta las pilas repetidas. El resultado va en
+    formato "collapsed" (una pila por línea: hilo;f1;f2 conteo), que leen
+    flamegraph.pl y speedscope. Con peticiones concurrentes salen también
+    las pilas de las demás.
+    """
+    def __init__(self, interval=PROFILE_INTERVAL):
+        self.interval = interval
+        self.stacks = collections.Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def collapsed(self):
+        return "".join(f"{stack} {n}\n" for stack, n in self.stacks.most_common())
+
+class ProfileMiddleware:
+    """
+    Middleware ASGI: una petición con la cabecera X-Profile: 1 se perfila
+    completa (incluida una respuesta en streaming) y las pilas se guardan en
+    PROFILE_DIR; la ruta del archivo va en la cabecera X-Profile-File.
+    Solo actúa con PROFILE_ENABLED=1.
+    """
+    def __init__(self, app, enabled=PROFILE_ENABLED, directory=PROFILE_DIR):
+        self.app = app
+        self.enabled = enabled
+        self.directory = directory
+
+    async def __call__(self, scope, receive, send):
+        if not self.enabled or scope["type"] != "http" or (b"x-profile", b"1") not in scope["headers"]:
+            return await self.app(scope, receive, send)
+
+        os.makedirs(self.directory, exist_ok=True)
+        name = scope["path"].strip("/").replace("/", "_") or "root"
+        path = os.path.join(self.directory, f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{name}.folded")
+
+        async def send_with_header(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(b"x-profile-file", path.encode())]
+            await send(message)
+
+        profiler = SamplingProfiler().start()
+        try:
+            await self.app(scope, receive, send_with_header)
+        finally:
+            profiler.stop()
+            with open(path, "w") as f:
+                f.write(profiler.collapsed())
+            print(f"🔬 Perfil de {scope['path']}: {profiler.samples} muestras en {path}")
+
+# =========================
+# Peticiones HTTP
+# =========================
+
+HTTP_BUCKETS = [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30]
+
+class RequestMetricsMiddleware:
+    """
+    Middleware ASGI: peticiones y latencia por ruta (la plantilla, p. ej.
+    /api/planets/{dataset}, para no crear una serie por URL) y código de estado
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        start = time.perf_counter()
+        request_path = scope["path"]
+        status = [500]
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            path = getattr(scope.get("route"), "path", None)
+            if path is None:
+                path = "/static" if request_path.startswith("/static/") else "unmatched"
+            method = scope["method"]
+            counter("http_requests", "Peticiones HTTP", method=method, route=path, status=str(status[0])).inc()
+            histogram("http_request_seconds", "Duración de las peticiones HTTP", HTTP_BUCKETS,
+                      method=method, route=path).observe(time.perf_counter() - start)
@@ -0,0 +1,188 @@
+# =========================
+# Ruteo por misión (Kepler, K2, TESS)
+# =========================
+# Cada misión tiene su propio modelo. Las filas se asignan a una misión por
+# las columnas que traen (todo el archivo de una vez si su esquema es de una
+# sola misión, fila a fila si mezcla misiones) y cada grupo se predice con un
+# solo predict vectorizado de su modelo.
+
+import numpy as np
+import pandas as pd
+
+# Columna auxiliar con la misión que predice cada fila
+MISSION_COL = "_mission"
+
+# Columnas que identifican una misión (las que quedan tras prepare_features)
+KEPLER_PREFIX = "koi_"
+KEPLER_COLS = {"kepid", "kepoi_name", "kepler_name"}
+TESS_COLS = {"toi", "tid", "tfopwg_disp"}
+
+def _kepler_cols(columns):
+    return [c for c in columns if c.startswith(KEPLER_PREFIX) or c in KEPLER_COLS]
+
+def _tess_cols(columns):
+    return [c for c in columns if c in TESS_COLS]
+
+def detect_mission(columns):
+    """
+    Misión por esquema: 'Kepler', 'TESS', 'K2' o None si el archivo trae
+    columnas de Kepler y de TESS a la vez (hay que decidir fila a fila)
+    """
+    kepler = bool(_kepler_cols(columns))
+    tess = bool(_tess_cols(columns))
+    if kepler and tess:
+        return None
+    if kepler:
+        return "Kepler"
+    if tess:
+        return "TESS"
+    return "K2"
+
+def detect_row_missions(X):
+    """
+    Misión de cada fila: Kepler si tiene algún valor koi_*, TESS si tiene
+    toi/tid y K2 en otro caso. Devuelve un array de strings.
+    """
+    mission = detect_mission(X.columns)
+    if mission is not None:
+        return np.full(len(X), mission, dtype=object)
+
+    kepler = X[_kepler_cols(X.columns)].notna().any(axis=1).to_numpy()
+    tess = X[_tess_cols(X.columns)].notna().any(axis=1).to_numpy()
+    return np.where(kepler, "Kepler", np.where(tess, "TESS", "K2")).astype(object)
+
+class ModelRouter:
+    """
+    Modelos en servicio por misión. Tiene la misma interfaz que
+    ExoplanetModel (predict, is_loaded, mission, version, feature_names)
+    para que el planificador de inferencia lo use sin cambios.
+    """
+    def __init__(self, models=None, default=None, cache=None):
+        # {misión: ExoplanetModel}; default predice las misiones sin modelo propio
+        self.models = dict(models or {})
+        self.default = default
+        # PredictionCache opcional delante del predict de cada modelo
+        self.cache = cache
+
+    @property
+    def mission(self):
+        return self.default.mission if self.default is not None else None
+
+    @property
+    def version(self):
+        return self.default.version if self.default is not None else None
+
+    @property
+    def feature_names(self):
+        return self.default.feature_names if self.default is not None else None
+
+    def is_loaded(self):
+        return self.default is not None and self.default.is_loaded()
+
+    def versions(self):
+        """{misión: versión} de los modelos en servicio"""
+        return {mission: model.version for mission, model in sorted(self.models.items())}
+
+    def model_for(self, mission):
+        return self.models.get(mission, self.default)
+
+    def route(self, X, mission=None):
+        """
+        Añade a X la columna MISSION_COL con la misión del modelo que va a
+        predecir cada fila (la detectada o la del modelo por defecto si esa
+        misión no tiene modelo). Con mission se usa esa para todas las filas
+        (p. ej. la que se decidió con la cabecera del CSV).
+        """
+        if mission is not None:
+            detected = np.full(len(X), mission, dtype=object)
+        else:
+            detected = detect_row_missions(X)
+        served = detected.copy()
+        for mission in pd.unique(detected):
+            if mission not in self.models and self.default is not None:
+                served[detected == mission] = self.default.mission
+        return X.assign(**{MISSION_COL: served})
+
+    def _groups(self, X):
+        missions = X[MISSION_COL].to_numpy() if MISSION_COL in X.columns else detect_row_missions(X)
+        unique = pd.unique(missions)
+        if len(unique) <= 1:
+            # Un solo grupo (o ninguna fila): sin reordenar
+            return [(unique[0] if len(unique) else None, None)]
+        return [(mission, np.flatnonzero(missions == mission)) for mission in unique]
+
+    def select(self, X):
+        """
+        Columnas de X que necesitan los modelos de sus misiones (KeyError si
+        falta alguna); se usa para juntar peticiones en un lote
+        """
+        if MISSION_COL not in X.columns:
+            X = self.route(X)
+        needed = []
+        for mission, _ in self._groups(X):
+            model = self.model_for(mission)
+            if model is None:
+                raise ValueError(f"No hay modelo para la misión {mission}")
+            needed.extend(c for c in model.feature_names if c not in needed)
+        return X[needed + [MISSION_COL]]
+
+    def predict(self, X):
+        """
+        Predicciones de filas de cualquier misión: un predict por grupo de
+        misión y los resultados se colocan en el orden original
+        """
+        groups = self._groups(X)
+        if len(groups) == 1:
+            model = self.model_for(groups[0][0])
+            if model is None:
+                raise ValueError(f"No hay modelo para la misión {groups[0][0]}")
+            return self._predict(model, X[model.feature_names])
+
+        predictions = None
+        probabilities = np.empty((len(X), 2))
+        for mission, positions in groups:
+            model = self.model_for(mission)
+            if model is None:
+                raise ValueError(f"No hay modelo para la misión {mission}")
+            preds, probs = self._predict(model, X.iloc[positions][model.feature_names])
+            if predictions is None:
+                predictions = np.empty(len(X), dtype=preds.dtype)
+            predictions[positions] = preds
+            probabilities[positions] = probs
+        return predictions, probabilities
+
+    def explain(self, X, k):
+        """
+        predict() con las k características que más aportan a cada fila
+        (ExoplanetModel.explain por grupo de misión). Sin caché: las
+        aportaciones salen de la misma pasada que las probabilidades.
+        Si las misiones tienen distinto número de características, las filas
+        de la que tiene menos se completan con None / NaN.
+        """
+        results = []
+        for mission, positions in self._groups(X):
+            model = self.model_for(mission)
+            if model is None:
+                raise ValueError(f"No hay modelo para la misión {mission}")
+            if positions is None:
+                rows, frame = slice(None), X[model.feature_names]
+            else:
+                rows, frame = positions, X.iloc[positions][model.feature_names]
+            results.append((rows, model.explain(frame, k)))
+
+        width = max(top.shape[1] for _, (_, _, top, _) in results)
+        predictions = np.empty(len(X), dtype=results[0][1][0].dtype)
+        probabilities = np.empty((len(X), 2))
+        names = np.full((len(X), width), None, dtype=object)
+        contributions = np.full((len(X), width), np.nan)
+        for rows, (preds, probs, top, values) in results:
+            predictions[rows] = preds
+            probabilities[rows] = probs
+            names[rows, :top.shape[1]] = top
+            contributions[rows, :values.shape[1]] = values
+        return predictions, probabilities, names, contributions
+
+    def _predict(self, model, X):
+        if self.cache is not None:
+            return self.cache.predict(model, X)
+        return model.predict(X)
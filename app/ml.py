@@ -3,133 +3,203 @@
 # =========================
 
 # --- Importación de librerías ---
+# sklearn solo se importa al entrenar o al cargar el pipeline completo;
+# para servir basta con el kernel compilado (app/kernel.py)
 import pandas as pd
 import numpy as np
-from sklearn.model_selection import train_test_split
-from sklearn.compose import ColumnTransformer
-from sklearn.pipeline import Pipeline
-from sklearn.preprocessing import OneHotEncoder, StandardScaler
-from sklearn.impute import SimpleImputer
-from sklearn.linear_model import LogisticRegression
-from sklearn.metrics import (
-    classification_report, confusion_matrix, ConfusionMatrixDisplay,
-    roc_auc_score, roc_curve, auc
-)
-import matplotlib.pyplot as plt
-import seaborn as sns
 import joblib
 import warnings
 import os
 
+from app.columnar import file_hash, load_frame
+from app.drift import Reference, drift_path_for
+from app.kernel import CompiledModel
+from app.metrics import span
+
 warnings.filterwarnings("ignore")
 
+# Objetivo binario: 1 = Confirmed/Candidate, 0 = False Positive
+TARGET_COLUMN = "is_confirmed"
+POSITIVE_LABELS = {"CONFIRMED", "CANDIDATE"}
+NEGATIVE_LABELS = {"FALSE POSITIVE"}
+
+# Columnas de fuga o identificadores (además de la de disposición)
+DROP_COLS = [
+    "kepid", "kepoi_name", "kepler_name",
+    "koi_pdisposition", "koi_comment", "koi_fittype",
+    "tic_id", "toi_id", "planet_name", "comments"
+]
+
+MAX_MISSING_PCT = 0.95
+
+def detect_disposition(columns):
+    """(columna_disposición, misión) según las columnas del catálogo"""
+    if "koi_disposition" in columns:
+        return "koi_disposition", "Kepler"
+    if "disposition" in columns:
+        return "disposition", "K2"
+    if "tfopwg_disp" in columns:
+        return "tfopwg_disp", "TESS"
+    raise ValueError("No se encontró ninguna columna de disposición conocida (koi_disposition, disposition, tfopwg_disp).")
+
+def load_training_data(csv_path):
+    """
+    Lee el catálogo, detecta la misión y deja solo las filas etiquetables
+    con la columna objetivo. Devuelve (df, columna_disposición, misión).
+    """
+    # Se lee desde el cache columnar tipado (se construye la primera vez)
+    df = load_frame(csv_path)
+    print(f"\nArchivo cargado: {csv_path}")
+    print("Shape:", df.shape)
+    print("Columnas:", df.columns[:10].tolist())
+
+    # --- Detección automática de columna de disposición según archivo
+    disposition_col, mission = detect_disposition(df.columns)
+
+    print(f"Misión detectada: {mission} (columna '{disposition_col}')")
+
+    # --- Crear target binario desde la columna de disposición ---
+    mask = df[disposition_col].isin(POSITIVE_LABELS | NEGATIVE_LABELS)
+    df = df[mask].copy()  # nos quedamos con filas etiquetables
+    df[TARGET_COLUMN] = np.where(df[disposition_col].isin(POSITIVE_LABELS), 1, 0)
+
+    print("\nDistribución de estados:")
+    print(df[disposition_col].value_counts())
+    print("\nObjetivo is_confirmed (1=Confirmed/Candidate, 0=False Positive):")
+    print(df[TARGET_COLUMN].value_counts())
+    return df, disposition_col, mission
+
+def select_features(df, disposition_col, max_missing_pct=MAX_MISSING_PCT):
+    """
+    Quita columnas casi vacías, identificadores y la disposición.
+    Devuelve (X, y).
+    """
+    # --- Limpiar columnas casi vacías ---
+    keep_cols = [c for c in df.columns if df[c].isna().mean() <= max_missing_pct]
+    df = df[keep_cols]
+
+    # --- Separar X, y ---
+    y = df[TARGET_COLUMN].astype(int)
+    drop = [TARGET_COLUMN, disposition_col] + DROP_COLS
+    X = df.drop(columns=[c for c in drop if c in df.columns])
+    return X, y
+
+def split_column_types(X):
+    """(columnas_numéricas, columnas_categóricas) de X"""
+    numeric_cols = [c for c in X.columns if pd.api.types.is_numeric_dtype(X[c])]
+    categorical_cols = [c for c in X.columns if c not in numeric_cols]
+    return numeric_cols, categorical_cols
+
+def build_preprocessor(numeric_cols, categorical_cols, imputer_strategy="median", center=False):
+    """
+    ColumnTransformer: imputación + escala para números, one-hot para texto.
+    center=True resta además la media (lo necesita el descenso por gradiente
+    de train_streaming; lbfgs converge igual sin centrar)
+    """
+    from sklearn.compose import ColumnTransformer
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import OneHotEncoder, StandardScaler
+    from sklearn.impute import SimpleImputer
+
+    # --- Pipelines ---
+    numeric_pipe = Pipeline(steps=[
+        ("imputer", SimpleImputer(strategy=imputer_strategy)),
+        ("scaler", StandardScaler(with_mean=center))
+    ])
+
+    categorical_pipe = Pipeline(steps=[
+        ("imputer", SimpleImputer(strategy="most_frequent")),
+        ("onehot", OneHotEncoder(handle_unknown="ignore", sparse_output=True))
+    ])
+
+    return ColumnTransformer(
+        transformers=[
+            ("num", numeric_pipe, numeric_cols),
+            ("cat", categorical_pipe, categorical_cols)
+        ]
+    )
+
+def build_classifier(C=1.0, penalty="l2", solver="lbfgs", max_iter=400, n_jobs=-1):
+    """Regresión logística con clases balanceadas"""
+    from sklearn.linear_model import LogisticRegression
+
+    return LogisticRegression(
+        C=C,
+        penalty=penalty,
+        max_iter=max_iter,
+        class_weight="balanced",
+        multi_class="ovr",
+        solver=solver,
+        n_jobs=n_jobs
+    )
+
 class ExoplanetModel:
     def __init__(self):
         self.model = None
         self.preprocessor = None
         self.mission = None
         self.feature_names = None
+        self.compiled = None
+        self.version = None  # hash del .pkl guardado o cargado
+        self.reference = None  # distribución de entrenamiento para el monitor de deriva
     
     def train_model(self, csv_path):
         """
         Entrena el modelo con un archivo CSV
         """
+        # Duración de cada fase (también en /api/metrics como train.*)
+        timings = {}
+
         # =========================
         # CARGA Y CONFIGURACIÓN DEL DATASET
         # =========================
-        df = pd.read_csv(csv_path, comment="#", low_memory=False)
-        print(f"\nArchivo cargado: {csv_path}")
-        print("Shape:", df.shape)
-        print("Columnas:", df.columns[:10].tolist())
-
-        # --- Detección automática de columna de disposición según archivo
-        if "koi_disposition" in df.columns:
-            disposition_col = "koi_disposition"
-            self.mission = "Kepler"
-        elif "disposition" in df.columns:
-            disposition_col = "disposition"
-            self.mission = "K2"
-        elif "tfopwg_disp" in df.columns:
-            disposition_col = "tfopwg_disp"
-            self.mission = "TESS"
-        else:
-            raise ValueError("No se encontró ninguna columna de disposición conocida (koi_disposition, disposition, tfopwg_disp).")
-
-        print(f"Misión detectada: {self.mission} (columna '{disposition_col}')")
-
-        # --- Crear target binario desde la columna de disposición ---
-        pos = {"CONFIRMED", "CANDIDATE"}
-        neg = {"FALSE POSITIVE"}
-
-        mask = df[disposition_col].isin(pos.union(neg))
-        df = df[mask].copy()  # nos quedamos con filas etiquetables
-        df["is_confirmed"] = np.where(df[disposition_col].isin(pos), 1, 0)
-
-        print("\nDistribución de estados:")
-        print(df[disposition_col].value_counts())
-        print("\nObjetivo is_confirmed (1=Confirmed/Candidate, 0=False Positive):")
-        print(df["is_confirmed"].value_counts())
-
-        TARGET_COLUMN = "is_confirmed"
-
-        # --- Descartar columnas de fuga o identificadores ---
-        DROP_COLS = [
-            disposition_col, "kepid", "kepoi_name", "kepler_name",
-            "koi_pdisposition", "koi_comment", "koi_fittype",
-            "tic_id", "toi_id", "planet_name", "comments"
-        ]
+        with span("train.load", timings):
+            df, disposition_col, self.mission = load_training_data(csv_path)
+        with span("train.select_features", timings):
+            X, y = select_features(df, disposition_col)
+        
+        return self._fit_evaluate(X, y, timings)
+
+    def train_from_store(self, missions=None):
+        """
+        Entrena el modelo unificado de las tres misiones con las matrices ya
+        calculadas del almacén de características (app/features.py). Se
+        publica como misión 'Unified' y clasifica objetos por su id.
+        """
+        from app import features
 
-        # --- Limpiar columnas casi vacías ---
-        max_missing_pct = 0.95
-        keep_cols = [c for c in df.columns if df[c].isna().mean() <= max_missing_pct]
-        df = df[keep_cols]
+        timings = {}
+        with span("train.load", timings):
+            X, y = features.training_matrix(missions or features.MISSIONS)
+        self.mission = features.UNIFIED_MISSION
+        print(f"\nAlmacén de características: {X.shape}, misiones {X['mission'].unique().tolist()}")
+        return self._fit_evaluate(X, y, timings)
+
+    def _fit_evaluate(self, X, y, timings):
+        """
+        Pipeline (preprocesamiento + regresión logística), split estratificado,
+        entrenamiento, evaluación y compilación. Devuelve las métricas.
+        """
+        from sklearn.model_selection import train_test_split
+        from sklearn.pipeline import Pipeline
+        from sklearn.metrics import classification_report, roc_auc_score
 
-        # --- Separar X, y ---
-        y = df[TARGET_COLUMN].astype(int)
-        X = df.drop(columns=[TARGET_COLUMN] + [c for c in DROP_COLS if c in df.columns], errors="ignore")
-        
         # Guardar nombres de características para referencia futura
         self.feature_names = X.columns.tolist()
 
         # --- Tipos ---
-        numeric_cols = [c for c in X.columns if pd.api.types.is_numeric_dtype(X[c])]
-        categorical_cols = [c for c in X.columns if c not in numeric_cols]
+        numeric_cols, categorical_cols = split_column_types(X)
 
         print(f"\nCaracterísticas numéricas: {len(numeric_cols)}")
         print(f"Características categóricas: {len(categorical_cols)}")
 
-        # --- Pipelines ---
-        numeric_pipe = Pipeline(steps=[
-            ("imputer", SimpleImputer(strategy="median")),
-            ("scaler", StandardScaler(with_mean=False))
-        ])
-
-        categorical_pipe = Pipeline(steps=[
-            ("imputer", SimpleImputer(strategy="most_frequent")),
-            ("onehot", OneHotEncoder(handle_unknown="ignore", sparse_output=True))
-        ])
-
         # --- Preprocesamiento combinado ---
-        self.preprocessor = ColumnTransformer(
-            transformers=[
-                ("num", numeric_pipe, numeric_cols),
-                ("cat", categorical_pipe, categorical_cols)
-            ]
-        )
+        self.preprocessor = build_preprocessor(numeric_cols, categorical_cols)
 
-        # --- Modelo de Regresión Logística ---
-        log_reg = LogisticRegression(
-            max_iter=400,
-            class_weight="balanced",
-            multi_class="ovr",
-            solver="lbfgs",
-            n_jobs=-1
-        )
-
-        # --- Pipeline completo ---
+        # --- Pipeline completo con Regresión Logística ---
         self.model = Pipeline(steps=[
             ("preprocess", self.preprocessor),
-            ("model", log_reg)
+            ("model", build_classifier())
         ])
 
         # =========================
@@ -142,39 +212,164 @@ class ExoplanetModel:
 
         # --- Entrenamiento ---
         print("\nEntrenando modelo...")
-        self.model.fit(X_train, y_train)
+        with span("train.fit", timings):
+            self.model.fit(X_train, y_train)
 
         # --- Evaluación ---
-        y_pred = self.model.predict(X_test)
-        print("\n== Classification report ==")
-        print(classification_report(y_test, y_pred, digits=4, zero_division=0))
+        with span("train.evaluate", timings):
+            y_pred = self.model.predict(X_test)
+            print("\n== Classification report ==")
+            print(classification_report(y_test, y_pred, digits=4, zero_division=0))
 
-        # --- Métricas adicionales ---
-        y_probs = self.model.predict_proba(X_test)[:, 1]
-        roc_auc = roc_auc_score(y_test, y_probs)
+            # --- Métricas adicionales ---
+            y_probs = self.model.predict_proba(X_test)[:, 1]
+            roc_auc = roc_auc_score(y_test, y_probs)
         print(f"AUC-ROC Score: {roc_auc:.2f}")
 
+        with span("train.reference", timings):
+            self.reference = Reference.from_frame(X_train, y_probs)
+
         print(f"\n✅ Entrenamiento completado correctamente para la misión {self.mission}.")
+        with span("train.compile", timings):
+            self.compile_model()
         
         return {
             "mission": self.mission,
             "accuracy": (y_pred == y_test).mean(),
             "roc_auc": roc_auc,
-            "features_used": len(self.feature_names)
+            "features_used": len(self.feature_names),
+            "timings": {name: round(seconds, 4) for name, seconds in timings.items()}
+        }
+
+    def tune_model(self, csv_path, param_grid=None, n_folds=5, n_jobs=-1):
+        """
+        Entrena con búsqueda de hiperparámetros y validación cruzada
+        (app/tuning.py). Se queda con el mejor pipeline; el resultado
+        incluye el informe de tiempos de cada candidato.
+        """
+        from sklearn.model_selection import train_test_split
+        from sklearn.metrics import roc_auc_score
+        from app.tuning import search
+
+        df, disposition_col, self.mission = load_training_data(csv_path)
+        y = df[TARGET_COLUMN].astype(int)
+        train_idx, test_idx = train_test_split(
+            np.arange(len(df)), test_size=0.20, random_state=42, stratify=y
+        )
+        df_train, df_test = df.iloc[train_idx], df.iloc[test_idx]
+
+        self.model, self.feature_names, report = search(
+            df_train, disposition_col, param_grid=param_grid, n_folds=n_folds, n_jobs=n_jobs
+        )
+        self.preprocessor = self.model.steps[0][1]
+
+        # --- Evaluación con la partición que no vio la búsqueda ---
+        y_test = df_test[TARGET_COLUMN].astype(int)
+        y_probs = self.model.predict_proba(df_test[self.feature_names])[:, 1]
+        roc_auc = roc_auc_score(y_test, y_probs)
+        print(f"AUC-ROC Score (test): {roc_auc:.2f}")
+        self.reference = Reference.from_frame(df_train[self.feature_names], y_probs)
+
+        print(f"\n✅ Búsqueda completada para la misión {self.mission}: {report['best']['params']}")
+        self.compile_model()
+
+        return {
+            "mission": self.mission,
+            "accuracy": float(((y_probs >= 0.5).astype(int) == y_test.to_numpy()).mean()),
+            "roc_auc": float(roc_auc),
+            "features_used": len(self.feature_names),
+            "tuning": report
+        }
+
+    def train_streaming(self, csv_path, chunk_rows=None, epochs=None):
+        """
+        Entrena por bloques sin cargar el catálogo entero (app/streaming.py):
+        una pasada de estadísticas y SGDClassifier.partial_fit por épocas.
+        El modelo se guarda y se carga igual que el de train_model.
+        """
+        from app import streaming
+
+        timings = {}
+        self.model, self.feature_names, self.mission, report = streaming.train_streaming(
+            csv_path, chunk_rows=chunk_rows or streaming.CHUNK_ROWS,
+            epochs=epochs or streaming.EPOCHS, timings=timings
+        )
+        self.preprocessor = self.model.steps[0][1]
+        self.reference = report.pop("reference")
+
+        print(f"\n✅ Entrenamiento por bloques completado para la misión {self.mission}.")
+        with span("train_streaming.compile", timings):
+            self.compile_model()
+
+        return {
+            "mission": self.mission,
+            "accuracy": report["accuracy"],
+            "roc_auc": report["roc_auc"],
+            "features_used": len(self.feature_names),
+            "streaming": report["streaming"],
+            "timings": {name: round(seconds, 4) for name, seconds in timings.items()}
         }
 
     def predict(self, X_new):
         """
         Hacer predicciones con nuevos datos
         """
-        if self.model is None:
+        if not self.is_loaded():
             raise ValueError("Modelo no entrenado. Llama a train_model primero.")
         
-        predictions = self.model.predict(X_new)
-        probabilities = self.model.predict_proba(X_new)
+        # Una sola pasada por el pipeline: la etiqueta sale de las probabilidades
+        with span("model.predict_proba"):
+            if self.compiled is not None:
+                probabilities = self.compiled.predict_proba(X_new)
+                classes = self.compiled.classes_
+            else:
+                probabilities = self.model.predict_proba(X_new)
+                classes = self.model.classes_
+        predictions = classes[np.argmax(probabilities, axis=1)]
         
         return predictions, probabilities
 
+    def explain(self, X_new, k):
+        """
+        predict() más las k características que más aportan al logit de cada
+        fila: (predicciones, probabilidades, nombres (n, k), aportaciones (n, k)).
+        Sale de la misma pasada por el kernel, así que necesita el modelo compilado.
+        """
+        if self.compiled is None:
+            raise ValueError("Las explicaciones necesitan el modelo compilado (clasificador lineal)")
+
+        with span("model.explain"):
+            probabilities, top, contributions = self.compiled.explain(X_new, k)
+        predictions = self.compiled.classes_[np.argmax(probabilities, axis=1)]
+        names = np.asarray(self.compiled.feature_names, dtype=object)
+        return predictions, probabilities, names[top], contributions
+
+    @property
+    def classes(self):
+        """Clases del clasificador en el orden de las columnas de probabilidad"""
+        return self.compiled.classes_ if self.compiled is not None else self.model.classes_
+
+    def select(self, X):
+        """Columnas de X que usa el modelo (KeyError si falta alguna)"""
+        return X[self.feature_names]
+
+    def is_loaded(self):
+        """True si hay pipeline de sklearn o kernel compilado para predecir"""
+        return self.model is not None or self.compiled is not None
+
+    def compile_model(self):
+        """
+        Compila el pipeline a un kernel de NumPy (app/kernel.py) que evita la
+        validación de sklearn en cada predicción. Si el pipeline tiene pasos
+        que el kernel no soporta se sigue usando sklearn.
+        """
+        try:
+            self.compiled = CompiledModel.from_pipeline(self.model)
+        except Exception as e:
+            self.compiled = None
+            print(f"⚠️ Modelo no compilado, se usa sklearn: {e}")
+        return self.compiled
+
     def save_model(self, filepath="models/exoplanet_model.pkl"):
         """
         Guardar el modelo entrenado
@@ -192,23 +387,95 @@ class ExoplanetModel:
         }
         
         joblib.dump(model_data, filepath)
+        self.version = file_hash(filepath)
         print(f"✅ Modelo guardado en: {filepath}")
+        self.save_kernel(filepath)
+        # Referencia del monitor de deriva (<modelo>.drift.json)
+        if self.reference is not None:
+            self.reference.save(drift_path_for(filepath))
 
-    def load_model(self, filepath="models/exoplanet_model.pkl"):
+    def save_kernel(self, filepath="models/exoplanet_model.pkl"):
         """
-        Cargar modelo entrenado
+        Guarda el kernel compilado junto al .pkl (<modelo>.kernel.joblib).
+        Son solo arrays de NumPy sin comprimir: se cargan con mmap_mode sin
+        importar sklearn y los workers comparten las páginas del archivo.
+        """
+        if self.compiled is None:
+            return None
+
+        kernel_path = kernel_path_for(filepath)
+        kernel_data = {
+            'kernel': self.compiled.to_dict(),
+            'mission': self.mission,
+            'feature_names': self.feature_names,
+            'pipeline_hash': file_hash(filepath)
+        }
+        # Escritura atómica: otro worker puede estar leyéndolo
+        tmp_path = f"{kernel_path}.{os.getpid()}.tmp"
+        joblib.dump(kernel_data, tmp_path)
+        os.replace(tmp_path, kernel_path)
+        return kernel_path
+
+    def load_model(self, filepath="models/exoplanet_model.pkl", serving=False):
+        """
+        Cargar modelo entrenado.
+        Con serving=True se carga solo el kernel compilado (memoria mapeada)
+        si está al día con el .pkl; si no, se carga el pipeline y se regenera.
         """
         if not os.path.exists(filepath):
             raise FileNotFoundError(f"Modelo no encontrado en: {filepath}")
+
+        # Sin referencia (modelos anteriores al monitor) no se mide su deriva
+        self.reference = Reference.load(drift_path_for(filepath))
+
+        if serving and self._load_kernel(filepath):
+            print(f"✅ Modelo cargado (kernel): {self.mission}")
+            print(f"Características: {len(self.feature_names)}")
+            return
         
         model_data = joblib.load(filepath)
         self.model = model_data['pipeline']
         self.mission = model_data['mission']
         self.feature_names = model_data['feature_names']
+        self.version = file_hash(filepath)
+        self.compile_model()
+
+        if serving:
+            try:
+                self.save_kernel(filepath)
+            except OSError as e:
+                print(f"⚠️ No se pudo guardar el kernel: {e}")
         
         print(f"✅ Modelo cargado: {self.mission}")
         print(f"Características: {len(self.feature_names)}")
 
+    def _load_kernel(self, filepath):
+        kernel_path = kernel_path_for(filepath)
+        if not os.path.exists(kernel_path):
+            return False
+        try:
+            kernel_data = joblib.load(kernel_path, mmap_mode="r")
+        except Exception as e:
+            print(f"⚠️ Kernel ilegible, se carga el pipeline: {e}")
+            return False
+        version = file_hash(filepath)
+        if kernel_data.get('pipeline_hash') != version:
+            return False
+        # Kernels anteriores a explain() no guardan la media del scaler: se regeneran
+        if 'num_center' not in kernel_data['kernel']:
+            return False
+
+        self.model = None
+        self.version = version
+        self.compiled = CompiledModel.from_dict(kernel_data['kernel'])
+        self.mission = kernel_data['mission']
+        self.feature_names = kernel_data['feature_names']
+        return True
+
+def kernel_path_for(filepath):
+    """Ruta del kernel compilado que acompaña a un modelo .pkl"""
+    return os.path.splitext(filepath)[0] + ".kernel.joblib"
+
 # Función para entrenar fácilmente
 def train_exoplanet_model(dataset_type="KEPLER"):
     """
@@ -0,0 +1,236 @@
+# =========================
+# Planetas confirmados más parecidos (vecinos más cercanos)
+# =========================
+# Índice KD-tree (scipy cKDTree) sobre los planetas confirmados del almacén
+# de características (app/features.py) de las tres misiones, en el espacio
+# (log periodo, log radio, Teq, Teff, log g). Cada dimensión se estandariza
+# como lo hace el StandardScaler del modelo: media y desviación típica de
+# la columna en el almacén.
+#
+# Hay un árbol por misión. Cuando la ingesta publica una versión nueva del
+# almacén de una misión solo se reconstruye su árbol (con la misma escala);
+# la escala se recalcula, y con ella todos los árboles, cuando el número de
+# objetos cambió más de REBUILD_FRACTION desde que se fijó. La búsqueda
+# consulta los tres árboles y se queda con los k más cercanos.
+
+import os
+import threading
+import time
+
+import numpy as np
+
+from app import features
+from app.metrics import observe_span, span
+
+SPACE_COLUMNS = ["log_period", "log_planet_radius", "teq", "star_teff", "star_logg"]
+DEFAULT_K = int(os.getenv("NEIGHBORS_K", "5"))
+MAX_K = 50
+REBUILD_FRACTION = float(os.getenv("NEIGHBORS_REBUILD_FRACTION", "0.2"))
+
+# Columnas de cada vecino en la respuesta (valores en unidades del catálogo)
+NEIGHBOR_COLUMNS = ["period", "planet_radius", "teq", "star_teff", "star_logg"]
+
+class MissionTree:
+    """KD-tree de los planetas confirmados de una versión del almacén"""
+    def __init__(self, table, mean, std):
+        from scipy.spatial import cKDTree
+
+        self.mission = table.mission
+        self.version = table.version
+        values = np.column_stack([np.asarray(table.columns[c]) for c in SPACE_COLUMNS])
+        confirmed = np.asarray(table.columns["confirmed"]) == 1
+        # Solo los que tienen todas las dimensiones: un hueco no tiene distancia
+        self.rows = np.flatnonzero(confirmed & np.isfinite(values).all(axis=1))
+        self.tree = cKDTree((values[self.rows] - mean) / std)
+        self.table = table
+
+    def __len__(self):
+        return len(self.rows)
+
+class IndexSnapshot:
+    """
+    Árboles y la escala con la que se construyeron. No se modifica: refresh()
+    publica uno nuevo entero, así que una búsqueda nunca mezcla la escala
+    nueva con árboles de la anterior.
+    """
+    def __init__(self, trees, mean, std, scale_rows):
+        self.trees = trees
+        self.mean = mean
+        self.std = std
+        self.scale_rows = scale_rows
+
+EMPTY_SNAPSHOT = IndexSnapshot({}, None, None, 0)
+
+def fit_scale(tables):
+    """(media, desviación típica) de cada dimensión en las tablas del almacén"""
+    values = np.concatenate([
+        np.column_stack([np.asarray(t.columns[c]) for c in SPACE_COLUMNS]) for t in tables
+    ])
+    with np.errstate(invalid="ignore"):
+        mean = np.nanmean(values, axis=0)
+        std = np.nanstd(values, axis=0)
+    # Igual que StandardScaler: una columna constante (o vacía) no se escala
+    return np.where(np.isfinite(mean), mean, 0.0), np.where(np.isfinite(std) & (std > 0), std, 1.0)
+
+class NeighborIndex:
+    """
+    Árboles de las tres misiones y escala común. refresh() se llama antes
+    de cada búsqueda y solo hace trabajo si cambió alguna versión.
+    """
+    def __init__(self):
+        self.snapshot = EMPTY_SNAPSHOT
+        self._lock = threading.Lock()
+
+    @property
+    def trees(self):
+        return self.snapshot.trees
+
+    @property
+    def mean(self):
+        return self.snapshot.mean
+
+    @property
+    def std(self):
+        return self.snapshot.std
+
+    def clear(self):
+        """Descarta los árboles (la siguiente búsqueda los reconstruye)"""
+        with self._lock:
+            self.snapshot = EMPTY_SNAPSHOT
+
+    def refresh(self):
+        """Reconstruye los árboles de las misiones con versión nueva; True si cambió algo"""
+        tables = {m: features.open_table(m) for m in features.MISSIONS}
+        tables = {m: t for m, t in tables.items() if t is not None and len(t)}
+        versions = {m: t.version for m, t in tables.items()}
+
+        with self._lock:
+            current = self.snapshot
+            if versions == {m: tree.version for m, tree in current.trees.items()}:
+                return False
+            start = time.perf_counter()
+            rows = sum(len(t) for t in tables.values())
+            mean, std, scale_rows = current.mean, current.std, current.scale_rows
+            rescale = mean is None or abs(rows - scale_rows) > REBUILD_FRACTION * max(scale_rows, 1)
+            if rescale and tables:
+                mean, std = fit_scale(tables.values())
+                scale_rows = rows
+
+            trees = {}
+            for mission, table in tables.items():
+                tree = current.trees.get(mission)
+                if rescale or tree is None or tree.version != table.version:
+                    tree = MissionTree(table, mean, std)
+                trees[mission] = tree
+            rebuilt = [m for m in trees if trees[m] is not current.trees.get(m)]
+            # Árboles y escala se publican juntos
+            self.snapshot = IndexSnapshot(trees, mean, std, scale_rows)
+            seconds = time.perf_counter() - start
+            observe_span("neighbors.refresh", seconds)
+            print(f"🌐 Índice de vecinos: {sum(len(t) for t in trees.values())} confirmados, "
+                  f"reconstruido {'+'.join(rebuilt) or '-'} en {seconds:.3f}s")
+        return True
+
+    def query(self, frame, k=DEFAULT_K, exclude_ids=None):
+        """
+        Los k confirmados más cercanos a cada fila de frame (columnas
+        canónicas). Las dimensiones que falten en la consulta se rellenan con
+        la media (no influyen en la distancia). Con exclude_ids se descarta
+        el propio objeto de cada fila.
+        Devuelve (distancias, misiones, filas) de forma (n, k) y los árboles
+        consultados; las posiciones sin vecino tienen distancia inf.
+        """
+        self.refresh()
+        # Una sola lectura: árboles y escala de la misma versión del índice
+        snapshot = self.snapshot
+        by_mission = snapshot.trees
+        # Un árbol vacío (misión sin confirmados completos) no aporta vecinos
+        trees = [tree for tree in by_mission.values() if len(tree)]
+        n = len(frame)
+        if not trees or n == 0:
+            return (np.full((n, k), np.inf), np.full((n, k), None, dtype=object),
+                    np.full((n, k), -1), by_mission)
+
+        values = np.column_stack([frame[c].to_numpy(dtype=np.float64) for c in SPACE_COLUMNS])
+        points = (values - snapshot.mean) / snapshot.std
+        points[~np.isfinite(points)] = 0.0
+
+        extra = 1 if exclude_ids is not None else 0
+        distances, owners, rows = [], [], []
+        for i, tree in enumerate(trees):
+            kk = min(k + extra, len(tree))
+            d, idx = tree.tree.query(points, k=kk, workers=-1)
+            d, idx = d.reshape(n, kk), idx.reshape(n, kk)
+            table_rows = tree.rows[idx]
+            if exclude_ids is not None:
+                same = tree.table.ids[table_rows] == np.asarray(exclude_ids, dtype=str)[:, None]
+                d = np.where(same, np.inf, d)
+            distances.append(d)
+            owners.append(np.full((n, kk), i))
+            rows.append(table_rows)
+
+        distances = np.concatenate(distances, axis=1)
+        owners = np.concatenate(owners, axis=1)
+        rows = np.concatenate(rows, axis=1)
+        if distances.shape[1] < k:
+            pad = k - distances.shape[1]
+            distances = np.pad(distances, ((0, 0), (0, pad)), constant_values=np.inf)
+            owners = np.pad(owners, ((0, 0), (0, pad)), constant_values=-1)
+            rows = np.pad(rows, ((0, 0), (0, pad)), constant_values=-1)
+
+        # Los k mejores de todos los árboles, ordenados por distancia
+        order = np.argsort(distances, axis=1, kind="stable")[:, :k]
+        distances = np.take_along_axis(distances, order, axis=1)
+        owners = np.take_along_axis(owners, order, axis=1)
+        rows = np.take_along_axis(rows, order, axis=1)
+        missions = np.array([tree.mission for tree in trees] + [None], dtype=object)
+        owners = np.where(np.isfinite(distances), owners, -1)
+        return distances, missions[owners], np.where(np.isfinite(distances), rows, -1), by_mission
+
+    def columns(self, frame, k=DEFAULT_K, exclude_ids=None):
+        """
+        Vecinos de cada fila como arrays (n, k): object_id, mission,
+        distance y los valores de NEIGHBOR_COLUMNS (None/NaN sin vecino)
+        """
+        with span("neighbors.query"):
+            distances, missions, rows, trees = self.query(frame, k, exclude_ids)
+
+        columns = {
+            "object_id": np.full(rows.shape, None, dtype=object),
+            "mission": missions,
+            "distance": np.where(np.isfinite(distances), distances, np.nan)
+        }
+        columns.update({c: np.full(rows.shape, np.nan) for c in NEIGHBOR_COLUMNS})
+        # Valores de los vecinos leídos de una vez por misión
+        for mission, tree in trees.items():
+            hit = missions == mission
+            if hit.any():
+                columns["object_id"][hit] = tree.table.ids[rows[hit]]
+                for c in NEIGHBOR_COLUMNS:
+                    columns[c][hit] = np.asarray(tree.table.columns[c])[rows[hit]]
+        return columns
+
+    def stats(self):
+        snapshot = self.snapshot
+        return {
+            "confirmed": {m: len(t) for m, t in snapshot.trees.items()},
+            "versions": {m: t.version for m, t in snapshot.trees.items()},
+            "space": SPACE_COLUMNS,
+            "mean": snapshot.mean.tolist() if snapshot.mean is not None else None,
+            "std": snapshot.std.tolist() if snapshot.std is not None else None
+        }
+
+def records(columns):
+    """Lista por fila de consulta con sus vecinos como dicts"""
+    keys = list(columns)
+    mission = keys.index("mission")
+    out = []
+    for i in range(len(columns["mission"])):
+        values = [columns[key][i].tolist() for key in keys]
+        neighbors = []
+        for row in zip(*values):
+            if row[mission] is None:
+                break
+            neighbors.append({key: (None if isinstance(v, float) and v != v else v) for key, v in zip(keys, row)})
+        out.append(neighbors)
+    return out
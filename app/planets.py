@@ -0,0 +1,197 @@
+import re
+
+from app import db
+
+# Columnas útiles por tabla
+USEFUL_COLS = {
+    "kepler": ["kepid", "kepoi_name", "kepler_name", "koi_disposition", "koi_period", "koi_prad", "koi_teq", "koi_steff"],
+    "k2planets": ["pl_name", "hostname", "disposition", "pl_orbper", "pl_rade", "pl_eqt", "st_teff", "st_rad", "st_mass", "st_logg", "sy_dist", "disc_year"],
+    "tess": ["toi", "tid", "tfopwg_disp", "pl_orbper", "pl_rade", "pl_eqt", "st_teff"]
+}
+
+# Columnas numéricas para convertir a float
+NUMERIC_COLS = ["koi_period", "koi_prad", "koi_teq", "koi_steff",
+                "pl_orbper", "pl_rade", "pl_eqt", "st_teff", "st_rad", "st_mass", "st_logg", "sy_dist", "disc_year"]
+
+# Clave de cada tabla para paginar por cursor. No siempre es única (en el
+# export de K2 pl_name se repite, una fila por referencia), así que se pagina
+# por (clave, ctid): el cursor es '<clave>@<ctid>' de la última fila
+KEY_COLS = {"kepler": "kepoi_name", "k2planets": "pl_name", "tess": "toi"}
+CURSOR_COLUMN = "_row_ctid"
+CURSOR_PATTERN = re.compile(r"^(.*)@(\(\d+,\d+\))$", re.DOTALL)
+
+# Misión detectada por las columnas -> tabla
+MISSION_DATASETS = {"Kepler": "kepler", "K2": "k2planets", "TESS": "tess"}
+DATASET_MISSIONS = {dataset: mission for mission, dataset in MISSION_DATASETS.items()}
+
+# Columnas usadas por los filtros
+DISPOSITION_COLS = {"kepler": "koi_disposition", "k2planets": "disposition", "tess": "tfopwg_disp"}
+PERIOD_COLS = {"kepler": "koi_period", "k2planets": "pl_orbper", "tess": "pl_orbper"}
+RADIUS_COLS = {"kepler": "koi_prad", "k2planets": "pl_rade", "tess": "pl_rade"}
+TEQ_COLS = {"kepler": "koi_teq", "k2planets": "pl_eqt", "tess": "pl_eqt"}
+TEFF_COLS = {"kepler": "koi_steff", "k2planets": "st_teff", "tess": "st_teff"}
+# Grupos de objetos repetidos entre misiones (app/crossmatch.py) y
+# columnas que se añaden a cada fila con crossmatch=join|dedupe
+MATCH_TABLE = "crossmatch"
+MATCH_COLS = {
+    "match_group": "x.group_id",
+    "match_missions": "x.group_missions",
+    # Sin grupo el objeto es su propio principal
+    "match_primary": "COALESCE(x.is_primary, TRUE)"
+}
+
+# Año de descubrimiento (número) o fecha en texto que empieza por el año
+YEAR_COLS = {"k2planets": "disc_year", "tess": "toi_created"}
+
+# Tipos de PostgreSQL que ya son numéricos (no hace falta validar el texto)
+SQL_NUMERIC_TYPES = {"smallint", "integer", "bigint", "numeric", "real", "double precision"}
+
+# Número en texto; lo demás ('' o valores raros) se devuelve como NULL
+NUMERIC_PATTERN = r"^\s*[-+]?([0-9]+\.?[0-9]*|\.[0-9]+)([eE][-+]?[0-9]+)?\s*$"
+
+# Cache de tipos de columna por tabla
+_column_types = {}
+
+class FilterError(ValueError):
+    """Filtro sobre una columna que la tabla no tiene (un 400 en la API)"""
+
+async def get_column_types(dataset):
+    """
+    Devuelve {columna: tipo} de la tabla <dataset>_raw (se consulta una sola vez)
+    """
+    if dataset not in _column_types:
+        rows = await db.fetch(
+            "SELECT column_name, data_type FROM information_schema.columns "
+            "WHERE table_name = $1;",
+            f"{dataset}_raw"
+        )
+        if not rows:
+            return {}
+        _column_types[dataset] = {r["column_name"]: r["data_type"] for r in rows}
+    return _column_types[dataset]
+
+def numeric_expr(col, col_type):
+    """Expresión SQL que convierte la columna a double precision"""
+    if col_type in SQL_NUMERIC_TYPES:
+        return f"{col}::double precision"
+    return f"(CASE WHEN {col}::text ~ '{NUMERIC_PATTERN}' THEN {col}::text::double precision END)"
+
+def select_list(dataset, column_types, projection="useful"):
+    """
+    Columnas del SELECT: las USEFUL_COLS que existen en la tabla, con las
+    numéricas convertidas en SQL, o todas ('*') con projection='all'
+    """
+    if projection == "all":
+        return "*"
+    select = []
+    for col in USEFUL_COLS[dataset]:
+        if col not in column_types:
+            continue
+        if col in NUMERIC_COLS:
+            select.append(f"{numeric_expr(col, column_types[col])} AS {col}")
+        else:
+            select.append(col)
+    return ", ".join(select)
+
+def build_filters(dataset, column_types, param, disposition=None,
+                  period_min=None, period_max=None, radius_min=None, radius_max=None):
+    """
+    Condiciones del WHERE; param(valor) añade el argumento y devuelve su $n.
+    FilterError si se filtra por una columna que la tabla no tiene.
+    """
+    def column(cols, name):
+        col = cols[dataset]
+        if col not in column_types:
+            raise FilterError(f"La tabla {dataset}_raw no tiene la columna {col} (filtro {name})")
+        return col
+
+    where = []
+    if disposition:
+        where.append(f"{column(DISPOSITION_COLS, 'disposition')} = {param(disposition.upper())}")
+
+    ranges = [
+        (PERIOD_COLS, "period_min", period_min, ">="), (PERIOD_COLS, "period_max", period_max, "<="),
+        (RADIUS_COLS, "radius_min", radius_min, ">="), (RADIUS_COLS, "radius_max", radius_max, "<=")
+    ]
+    for cols, name, value, op in ranges:
+        if value is not None:
+            col = column(cols, name)
+            where.append(f"{numeric_expr(col, column_types[col])} {op} {param(float(value))}")
+    return where
+
+def make_cursor(key_value, ctid):
+    """Cursor de la página siguiente a la fila con esa clave y ctid"""
+    return f"{key_value}@{ctid}"
+
+def parse_cursor(after):
+    """(clave, ctid); un cursor con solo la clave da ctid None"""
+    match = CURSOR_PATTERN.match(after)
+    if match is None:
+        return after, None
+    return match.group(1), match.group(2)
+
+def build_planets_query(dataset, column_types, limit, after=None, crossmatch=None, **filters):
+    """
+    Construye el SELECT paginado por cursor de una tabla de planetas.
+    Solo se piden las USEFUL_COLS que existen en la tabla, con las columnas
+    numéricas convertidas en SQL, más el ctid de cada fila (CURSOR_COLUMN)
+    para el cursor. Las filas sin clave no se paginan. Devuelve (sql, args)
+    para asyncpg.
+
+    crossmatch='join' añade el grupo de cada objeto en las otras misiones
+    (MATCH_COLS, NULL si no tiene); 'dedupe' además deja solo el objeto
+    principal de cada grupo. Es un LEFT JOIN por índice con MATCH_TABLE.
+    """
+    key = KEY_COLS[dataset]
+    args = []
+
+    def param(value):
+        args.append(value)
+        return f"${len(args)}"
+
+    where = []
+    if after is None:
+        where.append(f"{key} IS NOT NULL")
+    else:
+        value, ctid = parse_cursor(str(after))
+        if column_types.get(key) in SQL_NUMERIC_TYPES:
+            value = float(value)
+        value = param(value)
+        if ctid is None:
+            where.append(f"{key} > {value}")
+        else:
+            # key >= $n deja usar el índice de la clave; el ctid desempata
+            where.append(f"{key} >= {value} AND ({key} > {value} OR {dataset}_raw.ctid > {param(ctid)}::text::tid)")
+    where.extend(build_filters(dataset, column_types, param, **filters))
+
+    sql = f"SELECT {select_list(dataset, column_types)}, {dataset}_raw.ctid::text AS {CURSOR_COLUMN}"
+    if crossmatch is None:
+        sql += f" FROM {dataset}_raw"
+    else:
+        sql += "".join(f", {expr} AS {alias}" for alias, expr in MATCH_COLS.items())
+        sql += (f" FROM {dataset}_raw LEFT JOIN {MATCH_TABLE} x"
+                f" ON x.dataset = {param(dataset)} AND x.object_id = {dataset}_raw.{key}::text")
+        if crossmatch == "dedupe":
+            where.append("x.is_primary IS NOT FALSE")
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += f" ORDER BY {key}, {dataset}_raw.ctid LIMIT {param(limit)};"
+    return sql, args
+
+def build_export_query(dataset, column_types, projection="useful", **filters):
+    """
+    SELECT de la tabla completa (con los mismos filtros que la paginación)
+    para exportarla con un cursor; sin ORDER BY, en el orden físico de la
+    tabla, para que PostgreSQL la lea secuencialmente
+    """
+    args = []
+
+    def param(value):
+        args.append(value)
+        return f"${len(args)}"
+
+    where = build_filters(dataset, column_types, param, **filters)
+    sql = f"SELECT {select_list(dataset, column_types, projection)} FROM {dataset}_raw"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    return sql, args
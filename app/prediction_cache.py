@@ -0,0 +1,347 @@
+# =========================
+# Cache de predicciones por contenido de fila
+# =========================
+# Clave: hash de 64 bits de la fila normalizada (columnas del modelo, números
+# como float64) combinado con la versión del modelo, así que un modelo nuevo
+# no reutiliza resultados del anterior. Dos niveles:
+#   - memoria: LRU con TTL en una tabla hash sobre arrays de NumPy (búsqueda vectorizada)
+#   - disco (opcional): SQLite en modo WAL compartido por los workers
+# Solo las filas que no están en ningún nivel se predicen, en un único lote.
+
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+# auto: solo modelos sin kernel compilado (con el kernel predecir cuesta
+# lo mismo que calcular el hash); on: todos; off: desactivado
+CACHE_MODE = os.getenv("PREDICTION_CACHE", "auto")
+MAX_ENTRIES = int(os.getenv("PREDICTION_CACHE_ENTRIES", "500000"))
+TTL_SECONDS = float(os.getenv("PREDICTION_CACHE_TTL", "86400"))
+# Ruta del SQLite compartido; vacío = sin nivel en disco
+DISK_PATH = os.getenv("PREDICTION_CACHE_DB", "")
+
+SQLITE_BATCH = 500       # claves por consulta IN (...)
+PURGE_EVERY = 100        # escrituras en disco entre limpiezas de entradas caducadas
+# Con más fallos que esto es más rápido predecir que buscar en SQLite
+DISK_MAX_ROWS = int(os.getenv("PREDICTION_CACHE_DB_MAX_ROWS", "1000"))
+
+# Multiplicador para combinar los hashes de las columnas (FNV-1a de 64 bits)
+HASH_PRIME = np.uint64(0x100000001B3)
+# Multiplicador de Fibonacci: reparte las claves entre los huecos de la tabla
+FIBONACCI_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+
+def row_hashes(X, version):
+    """
+    Hash de cada fila de X combinado con la versión del modelo (uint64).
+    Los números se pasan a float64 para que 5200 y 5200.0 den el mismo hash.
+    """
+    hashes = np.full(len(X), np.uint64(int(version, 16) & 0xFFFFFFFFFFFFFFFF))
+    for col in X.columns:
+        series = X[col]
+        if pd.api.types.is_numeric_dtype(series):
+            # + 0.0 deja -0.0 como 0.0
+            values = series.to_numpy(dtype=np.float64, na_value=np.nan) + 0.0
+        else:
+            values = series.to_numpy(dtype=object)
+        hashes = (hashes * HASH_PRIME) ^ pd.util.hash_array(values)
+    return hashes
+
+class _MemoryTier:
+    """
+    LRU con TTL sobre una tabla hash de direccionamiento abierto en arrays de
+    NumPy (sondeo lineal vectorizado): get y put cuestan O(filas del lote),
+    no O(entradas). La tabla se mantiene como mucho a media carga. Al pasar
+    de max_entries se descartan de una vez las caducadas y las EVICT_FRACTION
+    usadas hace más tiempo y se reconstruye, así que ese coste se reparte
+    entre muchas escrituras.
+    """
+    EVICT_FRACTION = 0.25
+    MIN_CAPACITY = 1024
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._tick = 0
+        self._lock = threading.Lock()
+        self._allocate(self.MIN_CAPACITY)
+
+    def _allocate(self, capacity):
+        self.filled = np.zeros(capacity, dtype=bool)
+        self.keys = np.zeros(capacity, dtype=np.uint64)
+        self.probs = np.zeros((capacity, 2))
+        self.expires = np.zeros(capacity)
+        self.last_used = np.zeros(capacity, dtype=np.int64)
+        self._claim = np.empty(capacity, dtype=np.int64)
+        self.size = 0
+        self._shift = np.uint64(64 - (capacity.bit_length() - 1))
+
+    def __len__(self):
+        return self.size
+
+    def _home(self, keys):
+        """Hueco inicial de cada clave (hash de Fibonacci: los bits altos del producto)"""
+        return ((keys * FIBONACCI_MULTIPLIER) >> self._shift).astype(np.int64)
+
+    def _find(self, keys):
+        """Hueco de cada clave en la tabla o -1"""
+        mask = len(self.keys) - 1
+        pos = self._home(keys)
+        found = np.full(len(keys), -1, dtype=np.int64)
+        pending = np.arange(len(keys))
+        while len(pending):
+            p = pos[pending]
+            filled = self.filled[p]
+            match = filled & (self.keys[p] == keys[pending])
+            found[pending[match]] = p[match]
+            # Un hueco vacío termina la búsqueda; uno ocupado por otra clave, al siguiente
+            pending = pending[filled & ~match]
+            pos[pending] = (pos[pending] + 1) & mask
+        return found
+
+    def _insert(self, keys):
+        """Ocupa un hueco por clave (distintas entre sí y que no están en la tabla)"""
+        mask = len(self.keys) - 1
+        pos = self._home(keys)
+        slots = np.empty(len(keys), dtype=np.int64)
+        pending = np.arange(len(keys))
+        while len(pending):
+            p = pos[pending]
+            free = ~self.filled[p]
+            # Si varias claves llegan al mismo hueco libre entra una (la que
+            # quede escrita en _claim); las demás lo verán ocupado en la
+            # siguiente vuelta. Sin ordenar: O(claves pendientes) por vuelta.
+            self._claim[p[free]] = pending[free]
+            won = free & (self._claim[p] == pending)
+            self.filled[p[won]] = True
+            self.keys[p[won]] = keys[pending[won]]
+            slots[pending[won]] = p[won]
+            advance = ~free
+            pos[pending[advance]] = (p[advance] + 1) & mask
+            pending = pending[~won]
+        self.size += len(keys)
+        return slots
+
+    def _fill(self, keys):
+        """
+        _insert para la tabla recién vaciada: ordenadas por hueco inicial, cada
+        clave va al primer hueco libre desde el suyo, es decir
+        max(inicial, hueco de la anterior + 1), un máximo acumulado sin vueltas.
+        Las pocas que pasarían del final de la tabla se insertan con _insert.
+        """
+        home = self._home(keys)
+        order = np.argsort(home)
+        ranks = np.arange(len(keys))
+        slot = np.maximum.accumulate(home[order] - ranks) + ranks
+        fits = slot < len(self.keys)
+        slot, placed = slot[fits], order[fits]
+        self.filled[slot] = True
+        self.keys[slot] = keys[placed]
+        self.size += len(placed)
+        slots = np.empty(len(keys), dtype=np.int64)
+        slots[placed] = slot
+        rest = order[~fits]
+        slots[rest] = self._insert(keys[rest])
+        return slots
+
+    def _make_room(self, incoming, now):
+        """
+        Reconstruye la tabla si 'incoming' claves más no caben: sin las
+        caducadas, sin las menos usadas si se pasa de max_entries y con el
+        tamaño que deje la carga por debajo de la mitad. True si se reconstruyó.
+        """
+        over = self.size + incoming > self.max_entries
+        if not over and 2 * (self.size + incoming) <= len(self.keys):
+            return False
+        keep = self.filled & (self.expires > now)
+        if over:
+            target = max(self.max_entries - incoming - int(self.max_entries * self.EVICT_FRACTION), 0)
+            candidates = np.flatnonzero(keep)
+            excess = len(candidates) - target
+            if excess > 0:
+                oldest = np.argpartition(self.last_used[candidates], excess - 1)[:excess]
+                keep[candidates[oldest]] = False
+
+        rows = np.flatnonzero(keep)
+        survivors = (self.keys.take(rows), self.probs.take(rows, axis=0),
+                     self.expires.take(rows), self.last_used.take(rows))
+        capacity = max(self.MIN_CAPACITY, 1 << (2 * (len(rows) + incoming) - 1).bit_length())
+        if capacity == len(self.keys):
+            # Mismo tamaño: se vacía y se reutilizan los arrays
+            self.filled[:] = False
+            self.size = 0
+        else:
+            self._allocate(capacity)
+        slots = self._fill(survivors[0])
+        self.probs[slots], self.expires[slots], self.last_used[slots] = survivors[1:]
+        return True
+
+    def get(self, keys, now):
+        """(máscara de aciertos, probabilidades de los aciertos)"""
+        with self._lock:
+            pos = self._find(keys)
+            hit = pos >= 0
+            hit[hit] = self.expires[pos[hit]] > now
+            self._tick += 1
+            self.last_used[pos[hit]] = self._tick
+            return hit, self.probs[pos[hit]]
+
+    def put(self, keys, probs, now):
+        if not len(keys):
+            return
+        # Una clave repetida en el lote se queda con el valor más nuevo
+        last = ~pd.Index(keys).duplicated(keep="last")
+        keys, probs = keys[last][-self.max_entries:], probs[last][-self.max_entries:]
+        with self._lock:
+            self._tick += 1
+            slots = self._find(keys)
+            if self._make_room(int((slots < 0).sum()), now):
+                slots = self._find(keys)
+            new = slots < 0
+            slots[new] = self._insert(keys[new])
+            self.probs[slots] = probs
+            self.expires[slots] = now + self.ttl
+            self.last_used[slots] = self._tick
+
+    def clear(self):
+        with self._lock:
+            self._allocate(self.MIN_CAPACITY)
+
+class _DiskTier:
+    """SQLite (WAL) compartido entre procesos; una conexión por hilo"""
+    def __init__(self, path, ttl):
+        self.path = path
+        self.ttl = ttl
+        self._local = threading.local()
+        self._writes = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS predictions ("
+                "key INTEGER PRIMARY KEY, p0 REAL, p1 REAL, expires REAL) WITHOUT ROWID"
+            )
+            self._local.conn = conn
+        return conn
+
+    def get(self, keys, now):
+        """(máscara de aciertos, probabilidades de los aciertos)"""
+        signed = keys.view(np.int64)
+        found = {}
+        conn = self._conn()
+        for start in range(0, len(signed), SQLITE_BATCH):
+            batch = signed[start:start + SQLITE_BATCH].tolist()
+            rows = conn.execute(
+                f"SELECT key, p0, p1 FROM predictions WHERE expires > ? "
+                f"AND key IN ({','.join('?' * len(batch))})",
+                [now] + batch
+            ).fetchall()
+            found.update((key, (p0, p1)) for key, p0, p1 in rows)
+        if not found:
+            return np.zeros(len(keys), dtype=bool), np.empty((0, 2))
+        hit = np.fromiter((k in found for k in signed.tolist()), dtype=bool, count=len(keys))
+        probs = np.array([found[k] for k in signed[hit].tolist()], dtype=np.float64)
+        return hit, probs
+
+    def put(self, keys, probs, now):
+        if not len(keys):
+            return
+        conn = self._conn()
+        expires = now + self.ttl
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO predictions (key, p0, p1, expires) VALUES (?, ?, ?, ?)",
+                zip(keys.view(np.int64).tolist(), probs[:, 0].tolist(), probs[:, 1].tolist(),
+                    [expires] * len(keys))
+            )
+            self._writes += 1
+            if self._writes % PURGE_EVERY == 0:
+                conn.execute("DELETE FROM predictions WHERE expires <= ?", (now,))
+
+class PredictionCache:
+    def __init__(self, mode=CACHE_MODE, max_entries=MAX_ENTRIES, ttl=TTL_SECONDS, disk_path=DISK_PATH):
+        self.mode = mode
+        self.memory = _MemoryTier(max_entries, ttl)
+        self.disk = _DiskTier(disk_path, ttl) if disk_path else None
+        # Las escrituras en disco no bloquean la respuesta
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prediction-cache") if disk_path else None
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def enabled_for(self, model):
+        if self.mode == "off" or model.version is None:
+            return False
+        return self.mode == "on" or model.compiled is None
+
+    def predict(self, model, X):
+        """
+        Igual que model.predict(X) pero las filas ya vistas con esta versión
+        del modelo salen del cache y solo las demás se predicen
+        """
+        if not self.enabled_for(model) or len(X) == 0:
+            return model.predict(X)
+
+        X = model.select(X)
+        keys = row_hashes(X, model.version)
+        now = time.time()
+        probabilities = np.empty((len(X), 2))
+
+        hit, probs = self.memory.get(keys, now)
+        probabilities[hit] = probs
+        hits_memory = int(hit.sum())
+        hits_disk = 0
+
+        miss = np.flatnonzero(~hit)
+        if self.disk is not None and 0 < len(miss) <= DISK_MAX_ROWS:
+            found, probs = self.disk.get(keys[miss], now)
+            if found.any():
+                probabilities[miss[found]] = probs
+                self.memory.put(keys[miss[found]], probs, now)
+                hits_disk = int(found.sum())
+                miss = miss[~found]
+
+        if len(miss):
+            _, probs = model.predict(X.iloc[miss])
+            probabilities[miss] = probs
+            self.memory.put(keys[miss], probs, now)
+            if self.disk is not None:
+                self._writer.submit(self.disk.put, keys[miss], probs, now)
+
+        with self._lock:
+            self.hits_memory += hits_memory
+            self.hits_disk += hits_disk
+            self.misses += len(miss)
+
+        predictions = model.classes[np.argmax(probabilities, axis=1)]
+        return predictions, probabilities
+
+    def clear(self):
+        self.memory.clear()
+
+    def stats(self):
+        """Contadores de aciertos y fallos"""
+        with self._lock:
+            hits = self.hits_memory + self.hits_disk
+            total = hits + self.misses
+            return {
+                "mode": self.mode,
+                "disk": self.disk.path if self.disk is not None else None,
+                "entries": len(self.memory),
+                "hits_memory": self.hits_memory,
+                "hits_disk": self.hits_disk,
+                "misses": self.misses,
+                "hit_ratio": hits / total if total else 0.0
+            }
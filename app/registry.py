@@ -0,0 +1,242 @@
+# =========================
+# Registro versionado de modelos
+# =========================
+# models/registry/<misión>/<versión>/model.pkl   pipeline (+ model.kernel.joblib, model.drift.json)
+# models/registry/<misión>/<versión>/meta.json   misión, features, métricas, hash
+# models/registry/<misión>/CURRENT               versión vigente de la misión
+# models/registry/ACTIVE                         "<misión>/<versión>" que sirve la app
+#
+# La versión es el hash del contenido de model.pkl. Los punteros se cambian
+# con os.replace, así que cada worker ve la versión vieja o la nueva, nunca
+# un archivo a medio escribir.
+
+import asyncio
+import json
+import os
+import shutil
+import time
+import uuid
+
+from app.missions import ModelRouter
+from app.ml import ExoplanetModel
+
+REGISTRY_DIR = os.getenv("MODEL_REGISTRY_DIR", "models/registry")
+RELOAD_INTERVAL = float(os.getenv("MODEL_RELOAD_INTERVAL", "2"))
+ACTIVE_POINTER = "ACTIVE"
+CURRENT_POINTER = "CURRENT"
+
+def _write_atomic(path, text):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+def _read_pointer(path):
+    try:
+        with open(path) as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+def model_path(mission, version):
+    return os.path.join(REGISTRY_DIR, mission, version, "model.pkl")
+
+def read_meta(mission, version):
+    try:
+        with open(os.path.join(REGISTRY_DIR, mission, version, "meta.json")) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def publish(model, metrics, activate=True):
+    """
+    Guarda un modelo entrenado como nueva versión de su misión y, si
+    activate=True, lo deja como el modelo que sirve la app
+    """
+    mission_dir = os.path.join(REGISTRY_DIR, model.mission)
+    staging = os.path.join(mission_dir, f".staging-{uuid.uuid4().hex}")
+    model.save_model(os.path.join(staging, "model.pkl"))
+    version = model.version
+
+    meta = {
+        "version": version,
+        "mission": model.mission,
+        "feature_names": model.feature_names,
+        "metrics": {k: (float(v) if isinstance(v, float) else v) for k, v in metrics.items()},
+        "hash": version,
+        "created_at": time.time()
+    }
+    _write_atomic(os.path.join(staging, "meta.json"), json.dumps(meta, indent=2))
+
+    final = os.path.join(mission_dir, version)
+    if os.path.exists(final):
+        shutil.rmtree(staging)
+    else:
+        os.replace(staging, final)
+
+    _write_atomic(os.path.join(mission_dir, CURRENT_POINTER), version)
+    if activate:
+        _write_atomic(os.path.join(REGISTRY_DIR, ACTIVE_POINTER), f"{model.mission}/{version}")
+    print(f"✅ Modelo publicado: {model.mission}/{version}")
+    return meta
+
+def activate(mission, version):
+    """Sirve una versión ya registrada (también sirve para volver atrás)"""
+    meta = read_meta(mission, version)
+    if meta is None:
+        raise FileNotFoundError(f"Versión no encontrada: {mission}/{version}")
+    _write_atomic(os.path.join(REGISTRY_DIR, mission, CURRENT_POINTER), version)
+    _write_atomic(os.path.join(REGISTRY_DIR, ACTIVE_POINTER), f"{mission}/{version}")
+    return meta
+
+def current_version(mission):
+    return _read_pointer(os.path.join(REGISTRY_DIR, mission, CURRENT_POINTER))
+
+def active_ref():
+    """'<misión>/<versión>' activo o None si el registro está vacío"""
+    return _read_pointer(os.path.join(REGISTRY_DIR, ACTIVE_POINTER))
+
+def list_models():
+    """Todas las versiones registradas, de la más nueva a la más vieja"""
+    active = active_ref()
+    models = []
+    if not os.path.isdir(REGISTRY_DIR):
+        return models
+    for mission in sorted(os.listdir(REGISTRY_DIR)):
+        mission_dir = os.path.join(REGISTRY_DIR, mission)
+        if not os.path.isdir(mission_dir):
+            continue
+        current = current_version(mission)
+        for version in os.listdir(mission_dir):
+            meta = read_meta(mission, version)
+            if meta is None:
+                continue
+            meta["current"] = version == current
+            meta["active"] = f"{mission}/{version}" == active
+            models.append(meta)
+    models.sort(key=lambda m: m["created_at"], reverse=True)
+    return models
+
+def current_model_paths():
+    """{misión: ruta del model.pkl vigente} según los punteros CURRENT"""
+    paths = {}
+    if not os.path.isdir(REGISTRY_DIR):
+        return paths
+    for mission in sorted(os.listdir(REGISTRY_DIR)):
+        version = current_version(mission)
+        if version and os.path.exists(model_path(mission, version)):
+            paths[mission] = model_path(mission, version)
+    return paths
+
+class ModelWatcher:
+    """
+    Mantiene los modelos que sirve este worker (uno por misión, más el
+    activo como modelo por defecto) y los cambia cuando los punteros del
+    registro apuntan a otra versión. Cada worker de uvicorn tiene su
+    watcher, así que todos recogen las versiones nuevas sin reiniciar.
+    """
+    def __init__(self, fallback_path, interval=RELOAD_INTERVAL, cache=None):
+        self.fallback_path = fallback_path
+        self.interval = interval
+        self.cache = cache
+        self.model = ModelRouter(cache=cache)
+        # Ruta del modelo por defecto y {misión: ruta} de los que sirve el router
+        self.default_path = None
+        self.paths = {}
+        self._loaded = None
+        self._by_path = {}
+        self._task = None
+
+    def _default_target(self):
+        ref = active_ref()
+        if ref is not None:
+            path = os.path.join(REGISTRY_DIR, ref, "model.pkl")
+            if os.path.exists(path):
+                return path
+        # Registro vacío: el modelo de siempre
+        return self.fallback_path
+
+    def refresh(self):
+        """
+        Carga los modelos si cambió algún puntero. Los nuevos se cargan
+        completos antes de sustituir el router, así que las peticiones en
+        curso siguen con los anteriores. Un modelo que no cambió se reutiliza
+        y el activo es el mismo objeto que el de su misión (los kernels con
+        memoria mapeada se comparten además entre workers).
+        """
+        default_target = self._default_target()
+        targets = current_model_paths()
+        if (default_target, targets) == self._loaded:
+            return False
+
+        previous = self._by_path
+        loaded = {}
+
+        def load(path):
+            if path not in loaded:
+                model = previous.get(path)
+                if model is None:
+                    model = ExoplanetModel()
+                    model.load_model(path, serving=True)
+                    print(f"🔄 Modelo en servicio: {path}")
+                loaded[path] = model
+            return loaded[path]
+
+        default = load(default_target) if os.path.exists(default_target) else None
+        models = {}
+        for mission, path in targets.items():
+            try:
+                models[mission] = load(path)
+            except Exception as e:
+                print(f"❌ Error cargando modelo de {mission}: {e}")
+        if default is not None:
+            models.setdefault(default.mission, default)
+
+        # El modelo de siempre sigue sirviendo su misión mientras el registro no tenga otra
+        if default_target != self.fallback_path and os.path.exists(self.fallback_path):
+            try:
+                legacy = load(self.fallback_path)
+                models.setdefault(legacy.mission, legacy)
+            except Exception as e:
+                print(f"❌ Error cargando modelo: {e}")
+
+        if default is None and models:
+            default = next(iter(models.values()))
+
+        self.model = ModelRouter(models, default, self.cache)
+        path_of = {id(model): path for path, model in loaded.items()}
+        self.default_path = path_of[id(default)] if default is not None else None
+        self.paths = {mission: path_of[id(model)] for mission, model in models.items()}
+        self._loaded = (default_target, targets)
+        self._by_path = loaded
+        return True
+
+    async def reload(self):
+        """refresh() en un hilo: cargar el .pkl no bloquea el event loop"""
+        return await asyncio.to_thread(self.refresh)
+
+    async def start(self):
+        try:
+            await self.reload()
+        except Exception as e:
+            print(f"❌ Error cargando modelo: {e}")
+            # No levantamos excepción para permitir que la app inicie
+        if self._task is None:
+            self._task = asyncio.create_task(self._watch())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _watch(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.reload()
+            except Exception as e:
+                print(f"❌ Error recargando modelo: {e}")
@@ -1,190 +1,1026 @@
-from fastapi import APIRouter, File, UploadFile, HTTPException
-from fastapi.responses import JSONResponse
-from app.db import get_connection  # ✅ Asegúrate que db.py existe
-from app.ml import ExoplanetModel  # ✅ Importar desde ml.py
+from fastapi import APIRouter, File, UploadFile, HTTPException, Query, Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from app import db  # ✅ Asegúrate que db.py existe
+from app import batch, crossmatch, drift, export, features, jobs, metrics, neighbors, registry, summaries
+from app.inference import InferenceScheduler
+from app.metrics import counter, span
+from app.missions import MISSION_COL, detect_mission, detect_row_missions
+from app.prediction_cache import PredictionCache
+from app.registry import ModelWatcher
+from app.schema import SchemaError, plan_upload
+from app.serialization import (FORMAT_PATTERN, columnar, dumps, explanation_columns, ndjson_lines,
+                               prediction_stats, records, result_columns)
+from app.planets import (USEFUL_COLS, KEY_COLS, MISSION_DATASETS, CURSOR_COLUMN, FilterError,
+                         build_export_query, build_planets_query, get_column_types, make_cursor)
 import pandas as pd
 import numpy as np
-from io import StringIO
+from io import BytesIO
+import asyncio
+import csv
 import os
 
 router = APIRouter()
 
-# Columnas útiles por tabla
-USEFUL_COLS = {
-    "kepler": ["kepid", "kepoi_name", "kepler_name", "koi_disposition", "koi_period", "koi_prad", "koi_teq", "koi_steff"],
-    "k2planets": ["pl_name", "hostname", "disposition", "pl_orber", "pl_rade", "pl_eqt", "st_teff", "st_rad", "st_mass", "st_logg", "sy_dist", "disc_year"],  
-    "tess": ["toi", "tid", "tfopwg_disp", "pl_orbper", "pl_rade", "pl_eqt", "st_teff"]
-}
+# Columnas que nunca entran al modelo (identificadores o fuga de etiqueta)
+DROP_COLS = [
+    "kepid", "kepoi_name", "kepler_name", "koi_pdisposition",
+    "koi_comment", "koi_fittype", "tic_id", "toi_id",
+    "planet_name", "comments"
+]
 
-# Columnas numéricas para convertir a float
-NUMERIC_COLS = ["koi_period", "koi_prad", "koi_teq", "koi_steff", 
-                "pl_orbper", "pl_rade", "pl_eqt", "st_teff", "st_rad", "st_mass", "st_logg", "sy_dist", "disc_year"]
+# Columnas de disposición según la misión
+DISPOSITION_COLS = ["koi_disposition", "disposition", "tfopwg_disp"]
 
-# Instancia global del modelo
-exoplanet_model = ExoplanetModel()
+# Tamaño de los bloques para la clasificación en streaming
+STREAM_CHUNK_ROWS = 5000
+STREAM_READ_BYTES = 1024 * 1024
 
-# Cargar modelo al iniciar
-try:
-    exoplanet_model.load_model("models/exoplanet_model.pkl")
-    print("✅ Modelo de exoplanetas cargado exitosamente")
-except Exception as e:
-    print(f"❌ Error cargando modelo: {e}")
-    # No levantamos excepción para permitir que la app inicie
+MODEL_PATH = "models/exoplanet_model.pkl"
+
+# crossmatch=join añade el grupo de cada objeto en las otras misiones;
+# crossmatch=dedupe deja un objeto por grupo (app/crossmatch.py)
+CROSSMATCH_PATTERN = "^(join|dedupe)$"
+
+# Características por fila con explain=true en /api/classify
+EXPLAIN_TOP_K = int(os.getenv("EXPLAIN_TOP_K", "5"))
+MAX_EXPLAIN_TOP_K = 50
+
+# Modelo en servicio: sale del registro (versión activa) o de MODEL_PATH si
+# el registro está vacío, y se recarga solo cuando se publica otra versión.
+# Se arranca en main.py; los handlers toman watcher.model una vez por petición.
+# Las filas ya predichas con la misma versión del modelo salen del cache.
+prediction_cache = PredictionCache()
+watcher = ModelWatcher(MODEL_PATH, cache=prediction_cache)
+
+# Planetas confirmados más parecidos (KD-tree sobre el almacén de características)
+neighbor_index = neighbors.NeighborIndex()
+
+# Junta las predicciones concurrentes en lotes (se arranca en main.py); cada
+# handler le pasa el modelo que tomó, así toda la petición usa la misma versión
+scheduler = InferenceScheduler(lambda: watcher.model)
+
+# Deriva de las características y de las probabilidades de lo clasificado
+# frente al entrenamiento de cada modelo (app/drift.py)
+drift_monitor = drift.DriftMonitor()
+
+# Métricas del planificador, el cache y el pool en /api/metrics
+metrics.REGISTRY.register("histogram", "exoplanets_inference_latency_seconds",
+                          "Latencia de scheduler.predict por petición", scheduler.latency)
+metrics.REGISTRY.register("histogram", "exoplanets_inference_batch_rows",
+                          "Filas por lote predicho", scheduler.batch_rows)
+metrics.REGISTRY.register("histogram", "exoplanets_inference_batch_requests",
+                          "Peticiones por lote predicho", scheduler.batch_requests)
+for _field in ("hits_memory", "hits_disk", "misses", "entries"):
+    metrics.gauge(f"prediction_cache_{_field}", "Estado del cache de predicciones",
+                  lambda field=_field: prediction_cache.stats()[field])
+metrics.gauge("db_pool_connections", "Conexiones abiertas del pool de PostgreSQL",
+              lambda: db._pool.get_size() if db._pool is not None else None)
+metrics.gauge("drift_max_psi", "Mayor PSI de una característica frente al entrenamiento",
+              drift_monitor.max_psi)
 
 @router.get("/planets/{dataset}")
-def read_planets(dataset: str, limit: int = 50):
+async def read_planets(
+    dataset: str,
+    limit: int = Query(50, ge=1, le=1000),
+    after: str = None,
+    disposition: str = None,
+    period_min: float = None,
+    period_max: float = None,
+    radius_min: float = None,
+    radius_max: float = None,
+    crossmatch: str = Query(None, pattern=CROSSMATCH_PATTERN)
+):
     """
-    Devuelve las primeras 'limit' filas de la tabla seleccionada
+    Devuelve una página de 'limit' filas de la tabla seleccionada.
+    Para la siguiente página se pasa after=<next_after> de la respuesta.
+    Con crossmatch=join cada fila trae match_group, match_missions y
+    match_primary; con crossmatch=dedupe se omiten los objetos que ya están
+    en otra misión con mejor caracterización (el principal de su grupo).
     """
     if dataset not in USEFUL_COLS:
         return {"error": "Dataset no válido. Usa: kepler, k2planets o tess"}
     
-    conn = get_connection()
-    cur = conn.cursor()
-    
-    # Ejecuta la consulta
-    cur.execute(f"SELECT * FROM {dataset}_raw LIMIT %s;", (limit,))
-    rows = cur.fetchall()
-    
-    # Nombres de columnas en la tabla
-    colnames = [desc[0] for desc in cur.description]
-    conn.close()
-
-    results = []
-    for row in rows:
-        row_dict = {}
-        for i, value in enumerate(row):
-            col = colnames[i]
-            if col not in USEFUL_COLS[dataset]:
-                continue  # saltar columnas que no queremos
-            if col in NUMERIC_COLS and value is not None and value != '':
-                try:
-                    row_dict[col] = float(value)
-                except ValueError:
-                    row_dict[col] = value
-            else:
-                row_dict[col] = value
-        results.append(row_dict)
+    with span("planets.query"):
+        column_types = await get_column_types(dataset)
+        if not column_types:
+            raise HTTPException(status_code=404, detail=f"La tabla {dataset}_raw no existe")
+        if crossmatch is not None:
+            await require_crossmatch()
+
+        try:
+            sql, args = build_planets_query(
+                dataset, column_types, limit, after=after, crossmatch=crossmatch, disposition=disposition,
+                period_min=period_min, period_max=period_max,
+                radius_min=radius_min, radius_max=radius_max
+            )
+        except FilterError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Cursor 'after' no válido para {dataset}")
+
+    # Ejecuta la consulta con una conexión del pool
+    with span("planets.fetch"):
+        rows = await db.fetch(sql, *args)
+    with span("planets.convert"):
+        results = [dict(row) for row in rows]
+        ctids = [row.pop(CURSOR_COLUMN) for row in results]
+
+    # Cursor de la siguiente página (None si ya no quedan filas)
+    key = KEY_COLS[dataset]
+    next_after = make_cursor(results[-1][key], ctids[-1]) if len(results) == limit else None
 
     return {
         "dataset": dataset,
         "limit": limit,
         "total": len(results),
+        "next_after": next_after,
         "data": results
     }
 
+@router.get("/planets/{dataset}/export")
+async def export_planets(
+    dataset: str,
+    format: str = Query("csv", pattern=export.EXPORT_FORMAT_PATTERN),
+    columns: str = Query("useful", pattern="^(useful|all)$"),
+    disposition: str = None,
+    period_min: float = None,
+    period_max: float = None,
+    radius_min: float = None,
+    radius_max: float = None
+):
+    """
+    Exporta la tabla completa (o filtrada) en CSV, NDJSON o Parquet sin
+    cargarla en memoria: se lee con un cursor del servidor y se envía por
+    bloques. columns=useful exporta las USEFUL_COLS; columns=all, todas.
+    """
+    if dataset not in USEFUL_COLS:
+        raise HTTPException(status_code=404, detail="Dataset no válido. Usa: kepler, k2planets o tess")
+    if not export.available(format):
+        raise HTTPException(status_code=400, detail=f"El formato {format} necesita pyarrow")
+    column_types = await get_column_types(dataset)
+    if not column_types:
+        raise HTTPException(status_code=404, detail=f"La tabla {dataset}_raw no existe")
+
+    try:
+        sql, args = build_export_query(
+            dataset, column_types, projection=columns, disposition=disposition,
+            period_min=period_min, period_max=period_max, radius_min=radius_min, radius_max=radius_max
+        )
+    except FilterError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return StreamingResponse(
+        export.stream_query(sql, args, format, dataset),
+        media_type=export.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{dataset}.{format}"'}
+    )
+
+@router.get("/planets/{dataset}/summary")
+async def planets_summary(dataset: str, request: Request):
+    """
+    Resumen precalculado de la tabla (disposiciones, histogramas y años).
+    Se sirve desde memoria; con If-None-Match y la misma versión devuelve 304.
+    """
+    if dataset not in USEFUL_COLS:
+        raise HTTPException(status_code=404, detail="Dataset no válido. Usa: kepler, k2planets o tess")
+    if not await get_column_types(dataset):
+        raise HTTPException(status_code=404, detail=f"La tabla {dataset}_raw no existe")
+
+    entry = await summaries.get_summary(dataset)
+    headers = {"ETag": entry["etag"], "Cache-Control": "no-cache"}
+    if_none_match = request.headers.get("if-none-match", "")
+    if entry["etag"] in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")] or if_none_match.strip() == "*":
+        return Response(status_code=304, headers=headers)
+    return Response(entry["body"], media_type="application/json", headers=headers)
+
+@router.post("/planets/{dataset}/summary/refresh")
+async def refresh_planets_summary(dataset: str):
+    """Recalcula el resumen completo (p. ej. tras cargar la tabla por fuera de la app)"""
+    if dataset not in USEFUL_COLS:
+        raise HTTPException(status_code=404, detail="Dataset no válido. Usa: kepler, k2planets o tess")
+    if not await get_column_types(dataset):
+        raise HTTPException(status_code=404, detail=f"La tabla {dataset}_raw no existe")
+    entry = await summaries.refresh_summary(dataset)
+    return {"success": True, "dataset": dataset, "version": entry["version"]}
+
+async def require_crossmatch():
+    """409 si el cross-match aún no se ha construido"""
+    if not await crossmatch.table_ready():
+        raise HTTPException(status_code=409, detail="Cross-match no construido: ingiere los catálogos "
+                                                    "o usa POST /api/crossmatch/rebuild")
+
+async def crossmatch_columns(missions, object_ids):
+    """
+    match_group, match_missions y match_primary de cada fila (misión y id
+    del objeto en su catálogo); las filas sin id no tienen grupo
+    """
+    datasets = np.array([MISSION_DATASETS.get(m) for m in missions], dtype=object)
+    known = np.flatnonzero(np.not_equal(datasets, None) & np.not_equal(object_ids, None))
+    found = await crossmatch.lookup(datasets[known], np.asarray(object_ids, dtype=object)[known])
+    columns = {
+        "match_group": np.full(len(missions), None, dtype=object),
+        "match_missions": np.full(len(missions), None, dtype=object),
+        "match_primary": np.ones(len(missions), dtype=bool)
+    }
+    columns["match_group"][known] = found["group_id"]
+    columns["match_missions"][known] = found["group_missions"]
+    columns["match_primary"][known] = found["is_primary"]
+    return columns
+
+def dedupe_rows(matches):
+    """Máscara con una fila por grupo del cross-match (el principal si está)"""
+    return crossmatch.dedupe_mask(matches["match_group"], matches["match_primary"])
+
+@router.post("/crossmatch/rebuild")
+async def rebuild_crossmatch():
+    """Recalcula los grupos del cross-match (p. ej. tras cargar tablas por fuera de la app)"""
+    return {"success": True, **await crossmatch.rebuild()}
+
 @router.get("/datasets")
 def list_datasets():
     """Devuelve la lista de datasets disponibles"""
     return {"datasets": list(USEFUL_COLS.keys())}
 
+def model_columns(columns):
+    """
+    Columnas que pueden entrar al modelo: sin identificadores ni columnas de
+    disposición (varias si el archivo mezcla misiones)
+    """
+    return [c for c in columns if c not in DROP_COLS and c not in DISPOSITION_COLS]
+
+def prepare_features(df):
+    """
+    Quita identificadores y la columna de disposición antes de predecir
+    """
+    return df[model_columns(df.columns)].copy()
+
+def find_header(buffer, final=False):
+    """
+    Cabecera de un CSV: (columnas, líneas de comentario '#' o vacías antes
+    de ella) o None si el buffer aún no tiene la línea completa.
+    Con final=True lo que queda sin salto de línea cuenta como línea.
+    """
+    pos = 0
+    skipped = 0
+    while pos < len(buffer):
+        nl = buffer.find(b"\n", pos)
+        if nl == -1:
+            if not final:
+                return None
+            nl = len(buffer)
+        line = buffer[pos:nl + 1]
+        pos = nl + 1
+        if line.strip() and not line.startswith(b"#"):
+            return next(csv.reader([line.decode("utf-8")])), skipped
+        skipped += 1
+    return None
+
+def upload_plan(model, columns):
+    """
+    Plan de lectura del CSV (columnas y tipos que necesitan los modelos) a
+    partir de su cabecera; si falta alguna columna responde 422 sin parsear
+    el resto del archivo
+    """
+    if columns is None:
+        raise HTTPException(status_code=400, detail="El CSV está vacío")
+    try:
+        return plan_upload(model, model_columns(columns))
+    except SchemaError as e:
+        raise HTTPException(status_code=422, detail={
+            "error": str(e),
+            "mission": e.mission,
+            "missing": e.missing
+        })
+
+def with_key_columns(plan, columns):
+    """Añade al plan las columnas id de cada misión (kepoi_name, pl_name, toi) que trae el CSV"""
+    for key in KEY_COLS.values():
+        if key in columns:
+            if key not in plan.usecols:
+                plan.usecols.append(key)
+            plan.dtypes[key] = str
+    return plan
+
+def upload_object_ids(df, missions):
+    """Id de cada fila en el catálogo de su misión (None si el CSV no trae esa columna)"""
+    ids = np.full(len(df), None, dtype=object)
+    for mission in pd.unique(missions):
+        key = KEY_COLS.get(MISSION_DATASETS.get(mission))
+        if key in df.columns:
+            rows = missions == mission
+            ids[rows] = df[key].to_numpy(dtype=object)[rows]
+    ids[pd.isna(ids)] = None
+    return ids
+
+def read_upload(data, plan, skiprows=0):
+    """Parsea solo las columnas del plan; un valor no numérico en una columna numérica es un 422"""
+    try:
+        return pd.read_csv(BytesIO(data), skiprows=skiprows, **plan.read_options())
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=f"Valor no válido en el CSV: {e}")
+
 @router.post("/classify")
-async def classify_exoplanet(file: UploadFile = File(...)):
+async def classify_exoplanet(
+    file: UploadFile = File(...),
+    format: str = Query("records", pattern=FORMAT_PATTERN),
+    explain: bool = Query(False),
+    top_k: int = Query(EXPLAIN_TOP_K, ge=1, le=MAX_EXPLAIN_TOP_K),
+    crossmatch: str = Query(None, pattern=CROSSMATCH_PATTERN)
+):
+    """
+    Clasifica un CSV. format=records devuelve un objeto por fila; format=columnar
+    devuelve listas por campo ({"mission": [...], "prediction": [...], "p_exoplanet": [...]})
+
+    Con explain=true cada fila trae además las top_k características que más
+    aportan a su logit (top_features) y cuánto (top_contributions: coeficiente
+    × valor escalado; positivo empuja hacia EXOPLANET)
+
+    Si el CSV trae el id del objeto (kepoi_name, pl_name o toi),
+    crossmatch=join añade su grupo en las otras misiones y crossmatch=dedupe
+    clasifica una sola fila por grupo (el id de cada fila sigue siendo su
+    posición en el archivo)
+    """
     try:
         if not file.filename.endswith('.csv'):
             raise HTTPException(status_code=400, detail="El archivo debe ser CSV")
         
-        # Leer y procesar CSV
-        contents = await file.read()
-        csv_string = contents.decode('utf-8')
-        df = pd.read_csv(StringIO(csv_string))
+        model = watcher.model
+        if not model.is_loaded():
+            raise HTTPException(status_code=500, detail="Modelo no disponible")
+
+        with span("classify.read_upload"):
+            contents = await file.read()
+
+        # La cabecera decide qué columnas se leen (y falla antes de parsear si falta alguna)
+        with span("classify.parse"):
+            header = find_header(contents, final=True)
+            plan = upload_plan(model, header[0] if header else None)
+            if crossmatch is not None:
+                await require_crossmatch()
+                plan = with_key_columns(plan, header[0])
+            df = read_upload(contents, plan, skiprows=header[1])
         
         print(f"📊 CSV cargado: {df.shape}")
         
-        # Preprocesamiento (igual que en tu entrenamiento)
-        DROP_COLS = [
-            "kepid", "kepoi_name", "kepler_name", "koi_pdisposition", 
-            "koi_comment", "koi_fittype", "tic_id", "toi_id", 
-            "planet_name", "comments"
-        ]
+        # Preprocesamiento y misión de cada fila (cada una va al modelo de su misión)
+        with span("classify.preprocess"):
+            df_clean = model.route(prepare_features(df), plan.mission)
+            missions = df_clean[MISSION_COL].to_numpy()
         
-        # Detectar columna de disposición si existe
-        disposition_cols = ["koi_disposition", "disposition", "tfopwg_disp"]
-        for col in disposition_cols:
-            if col in df.columns:
-                DROP_COLS.append(col)
-                break
-        
-        # Limpiar columnas
-        keep_cols = [c for c in df.columns if c not in DROP_COLS]
-        df_clean = df[keep_cols].copy()
-        
-        # Hacer predicción
-        if exoplanet_model.model is None:
-            raise HTTPException(status_code=500, detail="Modelo no disponible")
-        
-        predictions, probabilities = exoplanet_model.predict(df_clean)
+        # Grupos entre misiones por el id de cada fila (una consulta por índice)
+        positions = None
+        if crossmatch is not None:
+            with span("classify.crossmatch"):
+                row_missions = detect_row_missions(df)
+                matches = await crossmatch_columns(row_missions, upload_object_ids(df, row_missions))
+                if crossmatch == "dedupe":
+                    keep = dedupe_rows(matches)
+                    positions = np.flatnonzero(keep)
+                    df_clean = df_clean[keep]
+                    missions = missions[keep]
+                    matches = {name: values[keep] for name, values in matches.items()}
+
+        with span("classify.predict"):
+            if explain:
+                try:
+                    predictions, probabilities, names, contributions = await scheduler.explain(df_clean, top_k, model)
+                except ValueError as e:
+                    raise HTTPException(status_code=409, detail=str(e))
+            else:
+                predictions, probabilities = await scheduler.predict(df_clean, model)
+        observe_drift(model, df_clean, missions, probabilities, "classify.drift")
         
-        # Formatear resultados
-        results = []
-        for i, (pred, prob) in enumerate(zip(predictions, probabilities)):
-            result = {
-                "id": i + 1,
-                "prediction": int(pred),
-                "prediction_label": "EXOPLANET" if pred == 1 else "FALSE POSITIVE",
-                "confidence": float(max(prob)),
-                "probability_exoplanet": float(prob[1]),
-                "probability_false_positive": float(prob[0])
+        # Resultados y estadísticas calculados sobre los arrays completos
+        with span("classify.response"):
+            columns = result_columns(predictions, probabilities, missions)
+            if positions is not None:
+                columns["id"] = positions + 1
+            if explain:
+                columns = explanation_columns(columns, names, contributions)
+            if crossmatch is not None:
+                columns.update(matches)
+            counts = mission_counts(missions)
+            stats = {
+                **prediction_stats(len(predictions), int(columns["prediction"].sum()),
+                                   float(columns["confidence"].sum())),
+                **mission_stats(model, counts)
             }
-            results.append(result)
-        
-        # Estadísticas
-        stats = {
-            "total_samples": len(predictions),
-            "exoplanets_detected": int(sum(predictions)),
-            "false_positives": len(predictions) - int(sum(predictions)),
-            "confidence_avg": float(np.mean([max(prob) for prob in probabilities])),
-            "model_mission": exoplanet_model.mission
-        }
+            body = dumps({
+                "success": True,
+                "format": format,
+                "predictions": records(columns) if format == "records" else columnar_with_ids(columns, positions),
+                "statistics": stats,
+                "message": f"Procesados {len(predictions)} muestras usando modelo {stats['model_mission']}"
+            })
+        count_classified(counts)
         
-        return JSONResponse({
-            "success": True,
-            "predictions": results,
-            "statistics": stats,
-            "message": f"Procesados {len(predictions)} muestras usando modelo {exoplanet_model.mission}"
-        })
+        return Response(body, media_type="application/json")
         
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"❌ Error en clasificación: {e}")
         raise HTTPException(status_code=500, detail=f"Error procesando archivo: {str(e)}")
 
-@router.post("/train")
-async def train_model(dataset_type: str = "KEPLER"):
+def observe_drift(model, X, missions, probabilities, name):
+    """Suma lo clasificado al monitor de deriva; si falla, la respuesta sale igual"""
+    try:
+        with span(name):
+            drift_monitor.observe(model, X, missions, probabilities)
+    except Exception as e:
+        print(f"⚠️ Monitor de deriva: {e}")
+
+def columnar_with_ids(columns, positions):
+    """Formato columnar; si se quitaron filas (crossmatch=dedupe) incluye el id de las que quedan"""
+    compact = columnar(columns)
+    if positions is not None:
+        compact["id"] = columns["id"]
+    return compact
+
+def count_classified(counts):
+    """Suma las filas clasificadas por misión a exoplanets_classified_rows_total"""
+    for mission, n in counts.items():
+        counter("classified_rows", "Filas clasificadas", mission=mission).inc(n)
+
+def mission_counts(missions):
+    """Filas por misión, p. ej. {'Kepler': 120, 'TESS': 3}"""
+    values, counts = np.unique(missions.astype(str), return_counts=True)
+    return {str(v): int(c) for v, c in zip(values, counts)}
+
+def mission_stats(model, counts):
+    """Misiones usadas en una respuesta y versión del modelo de cada una"""
+    missions = sorted(counts) or ([model.mission] if model.mission else [])
+    return {
+        "model_mission": "+".join(missions) if missions else None,
+        "model_versions": {m: model.model_for(m).version for m in missions},
+        "missions": counts
+    }
+
+def _split_records(buffer):
+    """
+    Separa el buffer en registros CSV completos y devuelve (registros, resto).
+    Un salto de línea dentro de un campo entre comillas no cierra el registro.
+    """
+    if b'"' not in buffer:
+        lines = buffer.split(b"\n")
+        return [line + b"\n" for line in lines[:-1]], lines[-1]
+
+    records = []
+    start = pos = quotes = 0
+    while True:
+        nl = buffer.find(b"\n", pos)
+        if nl == -1:
+            break
+        quotes += buffer.count(b'"', pos, nl)
+        pos = nl + 1
+        if quotes % 2 == 0:
+            records.append(buffer[start:pos])
+            start = pos
+            quotes = 0
+    return records, buffer[start:]
+
+async def peek_header(blocks):
+    """
+    Lee del flujo lo justo para tener la cabecera. Devuelve (columnas o None,
+    flujo que vuelve a empezar desde el principio).
+    """
+    buffered = []
+    found = None
+    async for block in blocks:
+        buffered.append(block)
+        found = find_header(b"".join(buffered))
+        if found is not None:
+            break
+    if found is None and buffered:
+        found = find_header(b"".join(buffered), final=True)
+
+    async def replay():
+        for block in buffered:
+            yield block
+        async for block in blocks:
+            yield block
+
+    return (found[0] if found else None), replay()
+
+async def iter_csv_chunks(blocks, chunk_rows, read_options=None):
+    """
+    Agrupa un flujo de bytes CSV en DataFrames de como máximo chunk_rows filas.
+    Solo se mantiene en memoria el bloque actual, nunca el archivo completo.
+    read_options se pasa a pd.read_csv (p. ej. usecols y dtype del plan).
+    """
+    read_options = read_options or {}
+    header = None
+    pending = b""
+    records = []
+
+    def records_from(buffer):
+        nonlocal header
+        for record in buffer:
+            # Cabeceras de comentarios (#) que exporta la NASA y líneas vacías
+            if not record.strip() or record.startswith(b"#"):
+                continue
+            if header is None:
+                header = record
+            else:
+                records.append(record)
+
+    async for block in blocks:
+        complete, pending = _split_records(pending + block)
+        records_from(complete)
+        while len(records) >= chunk_rows:
+            batch, records[:] = records[:chunk_rows], records[chunk_rows:]
+            yield pd.read_csv(BytesIO(header + b"".join(batch)), **read_options)
+
+    # Último registro sin salto de línea final
+    if pending.strip():
+        records_from([pending + b"\n"])
+    if records:
+        yield pd.read_csv(BytesIO(header + b"".join(records)), **read_options)
+
+async def _iter_upload_blocks(upload):
+    while True:
+        block = await upload.read(STREAM_READ_BYTES)
+        if not block:
+            break
+        yield block
+
+async def upload_blocks(request):
     """
-    Endpoint para entrenar el modelo con diferentes datasets
+    Bloques del CSV de la petición: cuerpo crudo (text/csv) o campo 'file'
+    de un multipart. Devuelve (bloques, True si era multipart).
     """
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith("multipart/form-data"):
+        form = await request.form()
+        upload = form.get("file")
+        if upload is None or isinstance(upload, str):
+            raise HTTPException(status_code=400, detail="Falta el archivo CSV en el campo 'file'")
+        if not upload.filename.endswith('.csv'):
+            raise HTTPException(status_code=400, detail="El archivo debe ser CSV")
+        return _iter_upload_blocks(upload), True
+    return request.stream(), False
+
+async def _stream_predictions(chunks, model, format="records", mission=None):
+    """
+    Genera una línea NDJSON por fila (o una por bloque con format=columnar)
+    y una línea final con estadísticas
+    """
+    offset = 0
+    exoplanets = 0
+    confidence_sum = 0.0
+    missions_used = {}
     try:
-        global exoplanet_model
-        
-        dataset_type = dataset_type.upper()
-        valid_datasets = ["KEPLER", "K2", "TESS"]
-        
-        if dataset_type not in valid_datasets:
-            raise HTTPException(
-                status_code=400, 
-                detail=f"Dataset debe ser uno de: {valid_datasets}"
-            )
-        
-        # Entrenar nuevo modelo
-        exoplanet_model = ExoplanetModel()
-        results = exoplanet_model.train_model(f"data/{dataset_type}.csv")
-        exoplanet_model.save_model()
-        
+        async for chunk in chunks:
+            with span("classify_stream.preprocess"):
+                X = model.route(prepare_features(chunk), mission)
+                missions = X[MISSION_COL].to_numpy()
+            with span("classify_stream.predict"):
+                predictions, probabilities = await scheduler.predict(X, model)
+            observe_drift(model, X, missions, probabilities, "classify_stream.drift")
+
+            with span("classify_stream.response"):
+                columns = result_columns(predictions, probabilities, missions, offset)
+                if format == "records":
+                    lines = ndjson_lines(records(columns))
+                else:
+                    lines = dumps({"offset": offset, **columnar(columns)}) + b"\n"
+            yield lines
+
+            counts = mission_counts(missions)
+            count_classified(counts)
+            for mission, count in counts.items():
+                missions_used[mission] = missions_used.get(mission, 0) + count
+            offset += len(predictions)
+            exoplanets += int(columns["prediction"].sum())
+            confidence_sum += float(columns["confidence"].sum())
+
+        stats = {
+            **prediction_stats(offset, exoplanets, confidence_sum),
+            **mission_stats(model, missions_used)
+        }
+        yield dumps({"success": True, "statistics": stats}) + b"\n"
+
+    except Exception as e:
+        # La respuesta ya empezó: el error se informa como última línea
+        print(f"❌ Error en clasificación (stream): {e}")
+        yield dumps({"success": False, "error": f"Error procesando archivo: {str(e)}"}) + b"\n"
+
+class _BodyStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse para cuando el generador consume el cuerpo de la petición.
+    La versión normal escucha la desconexión en paralelo con receive() y se
+    quedaría con los mensajes del cuerpo; aquí la desconexión llega al
+    generador como ClientDisconnect al leer request.stream().
+    """
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+@router.post("/classify/stream")
+async def classify_exoplanet_stream(
+    request: Request,
+    chunk_rows: int = STREAM_CHUNK_ROWS,
+    format: str = Query("records", pattern=FORMAT_PATTERN)
+):
+    """
+    Clasificación en streaming para CSV grandes (respuesta NDJSON).
+
+    Acepta el CSV como cuerpo crudo (Content-Type: text/csv), que se procesa
+    mientras se sube, o como multipart con el campo 'file' igual que /classify
+    (en ese caso Starlette guarda la subida en un archivo temporal antes).
+    El archivo se lee en bloques de 'chunk_rows' filas y cada bloque se
+    predice y se envía al cliente antes de leer el siguiente. Con
+    format=columnar cada bloque es una sola línea con listas por campo.
+    """
+    if chunk_rows < 1:
+        raise HTTPException(status_code=400, detail="chunk_rows debe ser mayor que 0")
+
+    model = watcher.model
+    if not model.is_loaded():
+        raise HTTPException(status_code=500, detail="Modelo no disponible")
+
+    blocks, multipart = await upload_blocks(request)
+    response_class = StreamingResponse if multipart else _BodyStreamingResponse
+
+    # Se valida la cabecera antes de empezar la respuesta
+    columns, blocks = await peek_header(blocks)
+    plan = upload_plan(model, columns)
+    chunks = iter_csv_chunks(blocks, chunk_rows, plan.read_options())
+
+    return response_class(
+        _stream_predictions(chunks, model, format, plan.mission),
+        media_type="application/x-ndjson"
+    )
+
+@router.post("/classify/jobs", status_code=202)
+async def submit_classify_job(request: Request):
+    """
+    Clasificación asíncrona de archivos muy grandes. El CSV (cuerpo crudo o
+    multipart como en /classify/stream) se guarda en disco partido en shards
+    mientras se sube y se responde con el id del trabajo; los shards se
+    clasifican en paralelo en un pool de procesos. El progreso se consulta
+    en /classify/jobs/{job_id} y el resultado se descarga de
+    /classify/jobs/{job_id}/result.
+    """
+    model = watcher.model
+    if not model.is_loaded():
+        raise HTTPException(status_code=500, detail="Modelo no disponible")
+
+    blocks, _ = await upload_blocks(request)
+    columns, blocks = await peek_header(blocks)
+    plan = upload_plan(model, columns)
+
+    job = jobs.new_job("classify", {"mission": plan.mission, "models": model.versions()})
+    writer = batch.ShardWriter(os.path.join(batch.job_dir(job["id"]), "shards"), b"")
+    try:
+        pending = b""
+        async for block in blocks:
+            complete, pending = _split_records(pending + block)
+            writer.write(_data_records(complete, writer))
+        if pending.strip():
+            writer.write(_data_records([pending + b"\n"], writer))
+        shards = writer.close()
+    except BaseException:
+        writer.close()
+        batch.delete_job(job["id"])
+        raise
+
+    if not shards:
+        batch.delete_job(job["id"])
+        raise HTTPException(status_code=400, detail="El CSV no tiene filas")
+
+    jobs.update_job(job["id"], upload_bytes=writer.bytes,
+                    progress={"shards": len(shards), "shards_done": 0, "rows_done": 0})
+    batch.start_job(job["id"], shards, watcher.default_path, watcher.paths,
+                    plan.read_options(), plan.mission)
+    return {
+        "success": True,
+        "job_id": job["id"],
+        "status": job["status"],
+        "shards": len(shards),
+        "message": f"Clasificación de {writer.bytes} bytes en cola"
+    }
+
+def _data_records(records, writer):
+    """Quita comentarios y líneas vacías; la primera línea que queda es la cabecera del writer"""
+    for record in records:
+        if not record.strip() or record.startswith(b"#"):
+            continue
+        if not writer.header:
+            writer.header = record
+            continue
+        yield record
+
+def _classify_job(job_id):
+    job = jobs.get_job(job_id)
+    if job is None or job.get("kind") != "classify":
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado")
+    return job
+
+@router.get("/classify/jobs/{job_id}")
+async def classify_job_status(job_id: str):
+    """Estado del trabajo (queued, running, done o failed) y shards/filas procesados"""
+    return _classify_job(job_id)
+
+@router.get("/classify/jobs/{job_id}/result")
+async def classify_job_result(job_id: str, format: str = Query("csv", pattern="^(csv|ndjson|npz)$")):
+    """
+    Resultado de un trabajo terminado: csv o ndjson (en streaming, una fila
+    por muestra como /classify) o npz (un array por columna, para NumPy)
+    """
+    job = _classify_job(job_id)
+    if job["status"] != "done":
+        raise HTTPException(status_code=409, detail=f"El trabajo está en estado {job['status']}")
+
+    if format == "npz":
+        return FileResponse(os.path.join(batch.job_dir(job_id), "result.npz"),
+                            media_type="application/octet-stream", filename=f"{job_id}.npz")
+
+    def rows():
+        for i, (offset, shard) in enumerate(batch.iter_results(job_id, job["progress"]["shards"])):
+            probabilities = np.column_stack([shard["probability_false_positive"], shard["probability_exoplanet"]])
+            columns = result_columns(shard["prediction"], probabilities, shard["mission"], offset)
+            if format == "ndjson":
+                yield ndjson_lines(records(columns))
+            else:
+                yield pd.DataFrame(columns).to_csv(index=False, header=i == 0).encode()
+
+    media_type = "application/x-ndjson" if format == "ndjson" else "text/csv"
+    return StreamingResponse(rows(), media_type=media_type, headers={
+        "Content-Disposition": f'attachment; filename="{job_id}.{format}"'
+    })
+
+@router.delete("/classify/jobs/{job_id}")
+async def delete_classify_job(job_id: str):
+    """Cancela el trabajo (si sigue en curso) y borra sus archivos"""
+    _classify_job(job_id)
+    batch.delete_job(job_id)
+    return {"success": True, "job_id": job_id}
+
+@router.get("/classify/objects")
+async def classify_objects(
+    ids: str = Query(..., description="Ids separados por comas (kepoi_name, pl_name o toi)"),
+    format: str = Query("records", pattern=FORMAT_PATTERN),
+    crossmatch: str = Query(None, pattern=CROSSMATCH_PATTERN)
+):
+    """
+    Clasifica objetos ya ingeridos por su id con el modelo unificado: las
+    características salen del almacén (app/features.py), sin CSV ni
+    preprocesamiento por petición. crossmatch=join|dedupe como en /classify.
+    """
+    wanted = [i for i in ids.split(",") if i.strip()]
+    if not wanted:
+        raise HTTPException(status_code=400, detail="Indica al menos un id")
+
+    router_model = watcher.model
+    model = router_model.models.get(features.UNIFIED_MISSION)
+    if model is None:
+        raise HTTPException(status_code=409, detail="No hay modelo unificado: entrena con dataset_type=ALL")
+
+    with span("classify_objects.lookup"):
+        found, missing = features.lookup(wanted)
+    if found.empty:
+        raise HTTPException(status_code=404, detail={"error": "Ningún id encontrado", "missing": missing})
+
+    if crossmatch is not None:
+        await require_crossmatch()
+        with span("classify_objects.crossmatch"):
+            matches = await crossmatch_columns(found["mission"].to_numpy(), found["object_id"].to_numpy(dtype=object))
+            if crossmatch == "dedupe":
+                keep = dedupe_rows(matches)
+                found = found[keep].reset_index(drop=True)
+                matches = {name: values[keep] for name, values in matches.items()}
+
+    with span("classify_objects.predict"):
+        X = found[model.feature_names].assign(**{MISSION_COL: features.UNIFIED_MISSION})
+        predictions, probabilities = await scheduler.predict(X, router_model)
+    observe_drift(router_model, X, X[MISSION_COL].to_numpy(), probabilities, "classify_objects.drift")
+
+    with span("classify_objects.response"):
+        columns = result_columns(predictions, probabilities, found["mission"].to_numpy())
+        columns["object_id"] = found["object_id"].to_numpy(dtype=object)
+        if crossmatch is not None:
+            columns.update(matches)
+        counts = mission_counts(columns["mission"])
+        body = dumps({
+            "success": True,
+            "format": format,
+            "predictions": (records(columns) if format == "records"
+                            else {**columnar(columns), "object_id": columns["object_id"]}),
+            "missing": missing,
+            "statistics": {
+                **prediction_stats(len(predictions), int(columns["prediction"].sum()),
+                                   float(columns["confidence"].sum())),
+                "model_mission": model.mission,
+                "model_versions": {model.mission: model.version},
+                "missions": counts
+            }
+        })
+    count_classified(counts)
+    return Response(body, media_type="application/json")
+
+@router.get("/features")
+async def feature_store():
+    """Versión, objetos y catálogos de origen del almacén de características de cada misión"""
+    return {"missions": features.store_info(), "feature_columns": features.FEATURE_COLUMNS}
+
+def neighbor_response(columns, k, format, **extra):
+    """Cuerpo de /neighbors: una lista de vecinos por fila o un array (n, k) por campo"""
+    return Response(dumps({
+        "success": True,
+        "k": k,
+        "format": format,
+        **extra,
+        "neighbors": neighbors.records(columns) if format == "records" else columns
+    }), media_type="application/json")
+
+@router.get("/neighbors")
+async def similar_planets(
+    ids: str = Query(..., description="Ids separados por comas (kepoi_name, pl_name o toi)"),
+    k: int = Query(neighbors.DEFAULT_K, ge=1, le=neighbors.MAX_K),
+    format: str = Query("records", pattern=FORMAT_PATTERN)
+):
+    """
+    Los k planetas confirmados (de cualquier misión) más parecidos a cada
+    objeto ingerido, en (periodo, radio, Teq, Teff, log g) estandarizados
+    """
+    wanted = [i for i in ids.split(",") if i.strip()]
+    if not wanted:
+        raise HTTPException(status_code=400, detail="Indica al menos un id")
+    found, missing = features.lookup(wanted)
+    if found.empty:
+        raise HTTPException(status_code=404, detail={"error": "Ningún id encontrado", "missing": missing})
+
+    columns = await asyncio.to_thread(
+        neighbor_index.columns, found, k, found["object_id"].to_numpy(dtype=str)
+    )
+    return neighbor_response(columns, k, format, object_id=found["object_id"].tolist(),
+                             mission=found["mission"].tolist(), missing=missing)
+
+@router.post("/neighbors")
+async def similar_planets_upload(
+    file: UploadFile = File(...),
+    k: int = Query(neighbors.DEFAULT_K, ge=1, le=neighbors.MAX_K),
+    format: str = Query("records", pattern=FORMAT_PATTERN)
+):
+    """
+    Vecinos confirmados de cada fila de un CSV de una misión (las mismas
+    columnas que /classify); si trae el id del objeto, el propio objeto no
+    cuenta como vecino
+    """
+    contents = await file.read()
+    header = find_header(contents, final=True)
+    if header is None:
+        raise HTTPException(status_code=400, detail="El CSV está vacío")
+    mission = detect_mission(header[0])
+    if mission is None:
+        raise HTTPException(status_code=422, detail="El CSV mezcla columnas de varias misiones")
+
+    sources = features.SOURCE_COLUMNS[mission]
+    usecols = [c for c in header[0] if c in set(sources.values())]
+    try:
+        df = pd.read_csv(BytesIO(contents), skiprows=header[1], usecols=usecols,
+                         dtype={sources["object_id"]: str})
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=f"Valor no válido en el CSV: {e}")
+    frame = features.canonical_frame(df, mission)
+    exclude = frame["object_id"].to_numpy(dtype=str) if sources["object_id"] in df.columns else None
+
+    columns = await asyncio.to_thread(neighbor_index.columns, frame, k, exclude)
+    return neighbor_response(columns, k, format, mission=mission, rows=len(frame))
+
+@router.get("/neighbors/index")
+async def neighbor_index_stats():
+    """Planetas confirmados indexados por misión y escala de cada dimensión"""
+    await asyncio.to_thread(neighbor_index.refresh)
+    return neighbor_index.stats()
+
+@router.post("/train", status_code=202)
+async def train_model(
+    dataset_type: str = "KEPLER",
+    tune: bool = False,
+    folds: int = Query(5, ge=2, le=20),
+    streaming: bool = False
+):
+    """
+    Lanza un entrenamiento en segundo plano y devuelve el id del trabajo.
+    dataset_type=ALL entrena el modelo unificado de las tres misiones con
+    el almacén de características (app/features.py). Con tune=true se hace búsqueda de hiperparámetros con validación
+    cruzada de 'folds' particiones (app/tuning.py). Con streaming=true se
+    entrena por bloques sin cargar el CSV entero (app/streaming.py).
+    El modelo nuevo se publica en el registro y todos los workers lo
+    empiezan a servir cuando termina; el estado se consulta en /train/{job_id}.
+    """
+    dataset_type = dataset_type.upper()
+    valid_datasets = ["KEPLER", "K2", "TESS", "ALL"]
+
+    if tune and streaming:
+        raise HTTPException(status_code=400, detail="tune y streaming no se pueden combinar")
+
+    if dataset_type == "ALL":
+        # Modelo unificado sobre el almacén de características (ya calculado al ingerir)
+        if tune or streaming:
+            raise HTTPException(status_code=400, detail="dataset_type=ALL no admite tune ni streaming")
+        if not features.store_info():
+            raise HTTPException(status_code=404, detail="El almacén de características está vacío")
+        job = jobs.submit_training(None, dataset_type, store=True)
         return {
             "success": True,
-            "message": f"Modelo entrenado exitosamente con {dataset_type}",
-            "results": results
+            "job_id": job["id"],
+            "status": job["status"],
+            "message": "Entrenamiento del modelo unificado en cola"
         }
-        
+
+    if dataset_type not in valid_datasets:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Dataset debe ser uno de: {valid_datasets}"
+        )
+
+    csv_path = f"data/{dataset_type}.csv"
+    if not os.path.exists(csv_path):
+        raise HTTPException(status_code=404, detail=f"Archivo no encontrado: {csv_path}")
+
+    try:
+        job = jobs.submit_training(csv_path, dataset_type, tune=tune, n_folds=folds, streaming=streaming)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error entrenando modelo: {str(e)}")
 
+    return {
+        "success": True,
+        "job_id": job["id"],
+        "status": job["status"],
+        "message": f"Entrenamiento con {dataset_type} en cola"
+    }
+
+@router.get("/train/{job_id}")
+async def train_status(job_id: str):
+    """Estado de un entrenamiento: queued, running, done o failed"""
+    job = jobs.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado")
+    return job
+
+@router.get("/models")
+async def list_models():
+    """Versiones del registro de modelos y cuál se está sirviendo"""
+    model = watcher.model
+    return {
+        "active": registry.active_ref(),
+        "serving": model.versions(),
+        "models": registry.list_models()
+    }
+
+@router.post("/models/{mission}/{version}/activate")
+async def activate_model(mission: str, version: str):
+    """Vuelve a servir una versión registrada (p. ej. para deshacer un entrenamiento)"""
+    try:
+        meta = registry.activate(mission, version)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    await watcher.reload()
+    return {"success": True, "active": f"{mission}/{version}", "model": meta}
+
+@router.get("/drift")
+async def drift_report():
+    """
+    Deriva de lo clasificado por este worker frente al entrenamiento de cada
+    modelo: PSI y KS por característica numérica y de la probabilidad de
+    EXOPLANET (status: ok < 0.1 <= warning < 0.25 <= drift)
+    """
+    model = watcher.model
+    return {
+        "serving": model.versions(),
+        "thresholds": {"warning": drift.PSI_WARNING, "drift": drift.PSI_DRIFT},
+        "bins": drift.DRIFT_BINS,
+        "models": drift_monitor.report()
+    }
+
+@router.delete("/drift")
+async def reset_drift():
+    """Vacía los conteos del monitor de deriva de este worker"""
+    drift_monitor.reset()
+    return {"success": True}
+
+@router.get("/inference/stats")
+async def inference_stats():
+    """Latencia por petición, tamaño de los lotes y aciertos del cache de predicciones"""
+    return {**scheduler.stats(), "prediction_cache": prediction_cache.stats()}
+
+@router.get("/metrics")
+async def prometheus_metrics():
+    """Métricas de este worker en formato de texto de Prometheus"""
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4")
+
 @router.get("/health")
 async def health_check():
+    model = watcher.model
     return {
         "status": "healthy", 
-        "model_loaded": exoplanet_model.model is not None,
-        "model_mission": exoplanet_model.mission if exoplanet_model.model else None,
-        "features_count": len(exoplanet_model.feature_names) if exoplanet_model.feature_names else 0
+        "database": await db.check_pool(),
+        "model_loaded": model.is_loaded(),
+        "model_mission": model.mission if model.is_loaded() else None,
+        "models": model.versions(),
+        "features_count": len(model.feature_names) if model.feature_names else 0
     }
 
@@ -0,0 +1,108 @@
+# =========================
+# Esquema de las subidas: columnas y tipos que necesitan los modelos
+# =========================
+# Cada modelo tiene un esquema compilado a partir de sus feature_names: las
+# columnas que usa y su tipo. Con la cabecera del CSV (antes de parsear el
+# resto) se decide qué modelos van a predecir, se comprueba que no falte
+# ninguna columna y se calcula qué leer: read_csv solo parsea esas columnas
+# (usecols) y las numéricas directamente como float64.
+
+import numpy as np
+
+from app.missions import TESS_COLS, detect_mission
+
+# Misiones posibles de las filas de un archivo que mezcla misiones
+ALL_MISSIONS = ("Kepler", "TESS", "K2")
+
+class SchemaError(ValueError):
+    """La cabecera del CSV no sirve para los modelos en servicio"""
+    def __init__(self, message, missing=None, mission=None):
+        super().__init__(message)
+        self.missing = missing or []
+        self.mission = mission
+
+class ModelSchema:
+    """Columnas que usa un modelo y tipo con el que se leen"""
+    def __init__(self, feature_names, categorical=(), version=None):
+        self.features = list(feature_names)
+        self.categorical = [c for c in self.features if c in set(categorical)]
+        self.version = version
+        # Las categóricas se dejan a la inferencia de pandas, igual que al
+        # entrenar (si no, '1' y 1 serían categorías distintas)
+        self.dtypes = {c: np.float64 for c in self.features if c not in self.categorical}
+
+    @classmethod
+    def from_model(cls, model):
+        return cls(model.feature_names, categorical_features(model), model.version)
+
+def categorical_features(model):
+    """Columnas categóricas (one-hot) del kernel compilado o del pipeline"""
+    if model.compiled is not None:
+        return list(model.compiled.cat_cols)
+    preprocess = model.model.named_steps.get("preprocess") if model.model is not None else None
+    for name, _, columns in getattr(preprocess, "transformers_", []):
+        if name == "cat":
+            return list(columns)
+    return []
+
+def schema_for(model):
+    """Esquema del modelo (se compila una vez por versión)"""
+    schema = getattr(model, "_schema", None)
+    if schema is None or schema.version != model.version:
+        schema = ModelSchema.from_model(model)
+        model._schema = schema
+    return schema
+
+class UploadPlan:
+    """
+    Qué leer de un CSV: columnas (usecols), tipos (dtype) y la misión del
+    archivo (None si mezcla misiones y hay que decidir fila a fila)
+    """
+    def __init__(self, usecols, dtypes, mission):
+        self.usecols = usecols
+        self.dtypes = dtypes
+        self.mission = mission
+
+    def read_options(self):
+        """Argumentos para pd.read_csv"""
+        return {"usecols": self.usecols, "dtype": self.dtypes}
+
+def plan_upload(router, columns):
+    """
+    Plan de lectura para un CSV con estas columnas (las que quedan tras
+    quitar identificadores y disposición). Lanza SchemaError si falta alguna
+    columna de los modelos que van a predecir.
+    """
+    columns = list(columns)
+    available = set(columns)
+    mission = detect_mission(columns)
+    missions = [mission] if mission is not None else list(ALL_MISSIONS)
+
+    schemas = []
+    for name in missions:
+        model = router.model_for(name)
+        if model is None:
+            raise SchemaError(f"No hay modelo para la misión {name}", mission=mission)
+        schema = schema_for(model)
+        if schema not in schemas:
+            schemas.append(schema)
+
+    needed = []
+    dtypes = {}
+    for schema in schemas:
+        needed.extend(c for c in schema.features if c not in needed)
+        dtypes.update(schema.dtypes)
+
+    missing = [c for c in needed if c not in available]
+    if missing:
+        raise SchemaError(
+            f"Faltan {len(missing)} columnas que usa el modelo: {', '.join(missing[:10])}",
+            missing=missing, mission=mission
+        )
+
+    usecols = list(needed)
+    if mission is None:
+        # Para decidir la misión de cada fila (las de Kepler se reconocen por
+        # sus columnas koi_* del modelo)
+        usecols.extend(c for c in columns if c in TESS_COLS and c not in usecols)
+    return UploadPlan(usecols, dtypes, mission)
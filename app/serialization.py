@@ -0,0 +1,121 @@
+# =========================
+# Resultados de clasificación: construcción con NumPy y JSON rápido
+# =========================
+# Las columnas del resultado (etiqueta, confianza, probabilidades) se
+# calculan sobre los arrays completos y se serializan de una vez con orjson
+# (está en requirements.txt y serializa arrays de NumPy sin pasarlos a
+# listas). El json de la biblioteca estándar queda solo como respaldo si
+# falta en el entorno.
+
+import gc
+import json
+from contextlib import contextmanager
+
+import numpy as np
+
+try:
+    import orjson
+except ImportError:
+    print("⚠️ orjson no está instalado (ver requirements.txt): se usa json, más lento")
+    orjson = None
+
+# records: una lista de objetos (una por fila); columnar: una lista por campo
+RESPONSE_FORMATS = ("records", "columnar")
+FORMAT_PATTERN = f"^({'|'.join(RESPONSE_FORMATS)})$"
+
+LABELS = {1: "EXOPLANET", 0: "FALSE POSITIVE"}
+
+# Columnas que se añaden con explain=true o crossmatch=... y que también
+# salen en el formato columnar
+OPTIONAL_COLUMNS = ("top_features", "top_contributions", "match_group", "match_missions", "match_primary")
+
+def result_columns(predictions, probabilities, missions, offset=0):
+    """Columnas del resultado de /api/classify como arrays (ids desde offset + 1)"""
+    predictions = np.asarray(predictions).astype(np.int64)
+    probabilities = np.asarray(probabilities, dtype=np.float64)
+    return {
+        "id": np.arange(offset + 1, offset + len(predictions) + 1),
+        "mission": np.asarray(missions, dtype=object),
+        "prediction": predictions,
+        "prediction_label": np.where(predictions == 1, LABELS[1], LABELS[0]).astype(object),
+        "confidence": probabilities.max(axis=1),
+        # Contiguos para que orjson los serialice sin pasar por listas
+        "probability_exoplanet": np.ascontiguousarray(probabilities[:, 1]),
+        "probability_false_positive": np.ascontiguousarray(probabilities[:, 0])
+    }
+
+def prediction_stats(total, exoplanets, confidence_sum):
+    """Totales de una respuesta de clasificación"""
+    return {
+        "total_samples": total,
+        "exoplanets_detected": exoplanets,
+        "false_positives": total - exoplanets,
+        "confidence_avg": confidence_sum / total if total else 0.0
+    }
+
+@contextmanager
+def _gc_paused():
+    """
+    Sin recolector cíclico mientras se crean muchos contenedores: cada
+    fila (dict y, con explain, dos listas) dispara pasadas del GC que
+    recorren todas las anteriores. No crean ciclos, así que no se pierde nada.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+def records(columns):
+    """Lista de dicts (formato de siempre de /api/classify)"""
+    keys = list(columns)
+    with _gc_paused():
+        values = [col.tolist() for col in columns.values()]
+        return [dict(zip(keys, row)) for row in zip(*values)]
+
+def explanation_columns(columns, names, contributions):
+    """
+    Añade a las columnas del resultado las k características que más aportan
+    a cada fila (top_features) y su aportación al logit (top_contributions),
+    como arrays (n, k): en records salen como dos listas por fila
+    """
+    contributions = np.asarray(contributions, dtype=np.float64)
+    # Sin NaN en el JSON: los huecos (modelos con menos de k características) van como null
+    missing = np.isnan(contributions)
+    if missing.any():
+        contributions = np.where(missing, None, contributions)
+    return {**columns, "top_features": names, "top_contributions": contributions}
+
+def columnar(columns):
+    """Formato compacto: una lista por campo"""
+    compact = {
+        "mission": columns["mission"],
+        "prediction": columns["prediction"],
+        "p_exoplanet": columns["probability_exoplanet"]
+    }
+    for key in OPTIONAL_COLUMNS:
+        if key in columns:
+            compact[key] = columns[key]
+    return compact
+
+def _default(obj):
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"{type(obj).__name__} no es serializable")
+
+def dumps(obj):
+    """JSON en bytes; acepta arrays y escalares de NumPy"""
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(obj, default=_default, ensure_ascii=False, separators=(",", ":")).encode()
+
+def ndjson_lines(rows):
+    """Una línea JSON por elemento (bytes, con salto de línea final)"""
+    if orjson is not None:
+        return b"".join(orjson.dumps(row, option=orjson.OPT_APPEND_NEWLINE) for row in rows)
+    encode = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+    return "".join(encode(row) + "\n" for row in rows).encode()
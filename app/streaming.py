@@ -0,0 +1,305 @@
+# =========================
+# Entrenamiento por bloques (catálogos que no caben en memoria)
+# =========================
+# Primera pasada por el CSV en bloques: proporción de vacíos, mediana
+# (muestra de reservorio), media y varianza (combinadas bloque a bloque con
+# la fórmula de Chan) y conteo de categorías. Con eso se arma el mismo
+# ColumnTransformer que usa train_model y el clasificador se ajusta con
+# SGDClassifier.partial_fit recorriendo los bloques varias veces (épocas).
+# En memoria solo hay un bloque, las estadísticas y el 20% de prueba
+# (etiqueta y probabilidad). El .pkl resultante es un Pipeline como el de
+# train_model, así que load_model y el kernel compilado lo usan igual.
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from app.columnar import _chunk_kind, _merge_kind, read_csv_chunks
+from app.drift import Reference
+from app.metrics import span
+from app.ml import (DROP_COLS, MAX_MISSING_PCT, NEGATIVE_LABELS, POSITIVE_LABELS,
+                    build_preprocessor, detect_disposition)
+
+CHUNK_ROWS = int(os.getenv("STREAM_CHUNK_ROWS", "50000"))   # la memoria pico crece con el bloque, no con el archivo
+EPOCHS = int(os.getenv("STREAM_EPOCHS", "3"))
+RESERVOIR_SIZE = int(os.getenv("STREAM_RESERVOIR_SIZE", "10000"))   # valores por columna para la mediana
+MAX_CATEGORIES = int(os.getenv("STREAM_MAX_CATEGORIES", "10000"))   # las más frecuentes; el resto cuenta como desconocida
+ALPHA = 1e-4
+TEST_FRACTION = 0.20
+
+# Multiplicador de Fibonacci: reparte los números de fila de forma uniforme
+# para elegir la partición de prueba sin guardar índices
+HASH_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+
+def test_mask(first_row, n_rows, fraction=TEST_FRACTION):
+    """Filas de prueba del bloque (determinista por número de fila)"""
+    rows = np.arange(first_row, first_row + n_rows, dtype=np.uint64)
+    return (rows * HASH_MULTIPLIER >> np.uint64(40)).astype(np.float64) / 2 ** 24 < fraction
+
+class ColumnStats:
+    """
+    Estadísticas de las columnas acumuladas bloque a bloque: tipo, valores
+    no vacíos, media y suma de cuadrados (Chan), reservorio para la mediana
+    y conteo de categorías
+    """
+    def __init__(self, reservoir_size=RESERVOIR_SIZE, max_categories=MAX_CATEGORIES, seed=42):
+        self.rows = 0
+        self.kinds = {}
+        self.count = {}
+        self.mean = {}
+        self.m2 = {}
+        self.seen = {}
+        self.reservoir = {}
+        self.categories = {}
+        self.reservoir_size = reservoir_size
+        self.max_categories = max_categories
+        self.rng = np.random.default_rng(seed)
+
+    def update(self, chunk):
+        self.rows += len(chunk)
+        for col in chunk.columns:
+            series = chunk[col]
+            kind = _chunk_kind(series)
+            self.kinds[col] = _merge_kind(self.kinds.get(col), kind)
+            if kind == "empty":
+                continue
+            if kind == "str":
+                counts = self.categories.setdefault(col, {})
+                for value, n in series.dropna().astype(str).value_counts().items():
+                    counts[value] = counts.get(value, 0) + int(n)
+                if len(counts) > 4 * self.max_categories:
+                    # Memoria acotada: solo siguen las más frecuentes (conteo aproximado)
+                    keep = sorted(counts, key=counts.get, reverse=True)[:2 * self.max_categories]
+                    self.categories[col] = {v: counts[v] for v in keep}
+            else:
+                values = series.to_numpy(dtype=np.float64, na_value=np.nan)
+                self._update_numeric(col, values[~np.isnan(values)])
+
+    def _update_numeric(self, col, values):
+        n_b = len(values)
+        if n_b == 0:
+            return
+        mean_b = values.mean()
+        m2_b = ((values - mean_b) ** 2).sum()
+        n_a = self.count.get(col, 0)
+        if n_a == 0:
+            self.count[col], self.mean[col], self.m2[col] = n_b, mean_b, m2_b
+        else:
+            n = n_a + n_b
+            delta = mean_b - self.mean[col]
+            self.mean[col] += delta * n_b / n
+            self.m2[col] += m2_b + delta ** 2 * n_a * n_b / n
+            self.count[col] = n
+        self._sample(col, values)
+
+    def _sample(self, col, values):
+        """Algoritmo R de muestreo de reservorio, vectorizado por bloque"""
+        reservoir = self.reservoir.get(col, np.empty(0))
+        seen = self.seen.get(col, 0)
+        free = self.reservoir_size - len(reservoir)
+        if free > 0:
+            # Hasta llenar el reservorio entran todos los valores
+            reservoir = np.concatenate([reservoir, values[:free]])
+            seen += len(values[:free])
+            values = values[free:]
+        if len(values):
+            # El valor i-ésimo sustituye a uno al azar con probabilidad tamaño / (i + 1)
+            positions = seen + np.arange(len(values))
+            slots = (self.rng.random(len(values)) * (positions + 1)).astype(np.int64)
+            keep = slots < self.reservoir_size
+            reservoir[slots[keep]] = values[keep]
+            seen += len(values)
+        self.reservoir[col] = reservoir
+        self.seen[col] = seen
+
+    def missing_fraction(self, col):
+        present = self.count.get(col, 0) + sum(self.categories.get(col, {}).values())
+        return 1.0 - present / self.rows if self.rows else 1.0
+
+    def median(self, col):
+        return float(np.median(self.reservoir[col]))
+
+    def imputed_mean(self, col, fill):
+        """Media de la columna con los vacíos rellenados con fill (lo que ve el scaler)"""
+        n_obs = self.count[col]
+        return (n_obs * self.mean[col] + (self.rows - n_obs) * fill) / self.rows
+
+    def imputed_variance(self, col, fill):
+        """Varianza de la columna con los vacíos rellenados con fill"""
+        n_obs = self.count[col]
+        mu = self.imputed_mean(col, fill)
+        ss = self.m2[col] + n_obs * (self.mean[col] - mu) ** 2 + (self.rows - n_obs) * (fill - mu) ** 2
+        return ss / self.rows
+
+    def top_categories(self, col):
+        counts = self.categories.get(col, {})
+        return sorted(counts, key=lambda v: (-counts[v], v))[:self.max_categories]
+
+def coerce_chunk(chunk, numeric_cols, categorical_cols):
+    """Tipos de la pasada de estadísticas (un bloque puede haberse leído con otros)"""
+    data = {}
+    for col in numeric_cols:
+        data[col] = pd.to_numeric(chunk[col], errors="coerce").astype(np.float64) if col in chunk else np.nan
+    for col in categorical_cols:
+        series = chunk[col] if col in chunk else pd.Series(np.nan, index=chunk.index)
+        data[col] = series.where(series.isna(), series.astype(str)).astype(object)
+    return pd.DataFrame(data, index=chunk.index)
+
+def stats_frame(stats, numeric_cols, categorical_cols):
+    """
+    DataFrame pequeño cuyas medianas, varianzas y categorías son las del
+    catálogo completo. Ajustar el ColumnTransformer sobre él deja los mismos
+    statistics_, scale_ y categories_ que un ajuste en memoria (la media del
+    scaler se fija después con fit_preprocessor).
+    """
+    categories = {col: stats.top_categories(col) for col in categorical_cols}
+    n = max([3] + [len(c) + 2 for c in categories.values()])
+    data = {}
+    for col in numeric_cols:
+        fill = stats.median(col)
+        # n - 2 valores en la mediana y dos a ±b: mediana fill y varianza 2b²/n
+        b = np.sqrt(stats.imputed_variance(col, fill) * n / 2)
+        values = np.full(n, fill)
+        values[0] -= b
+        values[1] += b
+        data[col] = values
+    for col in categorical_cols:
+        values = categories[col]
+        # Las que no aparecen una vez son de la moda (así sigue siendo la más frecuente)
+        data[col] = np.array(values + [values[0]] * (n - len(values)), dtype=object)
+    return pd.DataFrame(data)
+
+def fit_preprocessor(stats, numeric_cols, categorical_cols):
+    """ColumnTransformer de train_model (centrado) ajustado con las estadísticas"""
+    preprocessor = build_preprocessor(numeric_cols, categorical_cols, center=True)
+    preprocessor.fit(stats_frame(stats, numeric_cols, categorical_cols))
+    if numeric_cols:
+        # stats_frame es simétrico alrededor de la mediana; la media real es otra
+        steps = preprocessor.named_transformers_["num"].named_steps
+        medians = steps["imputer"].statistics_
+        steps["scaler"].mean_ = np.array([stats.imputed_mean(col, fill)
+                                          for col, fill in zip(numeric_cols, medians)])
+    return preprocessor
+
+def labelled(chunk, disposition_col):
+    """Filas etiquetables del bloque y su objetivo binario"""
+    mask = chunk[disposition_col].isin(POSITIVE_LABELS | NEGATIVE_LABELS).to_numpy()
+    y = chunk[disposition_col].isin(POSITIVE_LABELS).to_numpy()[mask].astype(int)
+    return mask, y
+
+def train_streaming(csv_path, chunk_rows=CHUNK_ROWS, epochs=EPOCHS, max_missing_pct=MAX_MISSING_PCT,
+                    random_state=42, timings=None):
+    """
+    Entrena por bloques. Devuelve (pipeline, feature_names, misión, informe)
+    con la exactitud y el AUC sobre la partición de prueba.
+    """
+    from sklearn.linear_model import SGDClassifier
+    from sklearn.metrics import roc_auc_score
+    from sklearn.pipeline import Pipeline
+
+    timings = {} if timings is None else timings
+
+    # --- Pasada 1: estadísticas ---
+    with span("train_streaming.stats", timings):
+        # Medianas, escala y categorías solo con las filas de entrenamiento
+        # (como train_model con X_train); los vacíos, con todas las etiquetables
+        stats = ColumnStats(seed=random_state)
+        present = pd.Series(dtype=np.int64)
+        disposition_col = mission = None
+        class_counts = np.zeros(2, dtype=np.int64)
+        row = chunks = labelled_rows = 0
+        for chunk in read_csv_chunks(csv_path, chunk_rows):
+            if disposition_col is None:
+                disposition_col, mission = detect_disposition(chunk.columns)
+            mask, y = labelled(chunk, disposition_col)
+            train = ~test_mask(row, len(chunk))[mask]
+            class_counts += np.bincount(y[train], minlength=2)
+            ignored = [disposition_col] + [c for c in DROP_COLS if c in chunk.columns]
+            rows = chunk[mask].drop(columns=ignored)
+            stats.update(rows[train])
+            present = present.add(rows.notna().sum(), fill_value=0)
+            labelled_rows += len(rows)
+            row += len(chunk)
+            chunks += 1
+        if disposition_col is None:
+            raise ValueError(f"{csv_path} no tiene filas")
+        if class_counts.min() == 0:
+            raise ValueError("Hacen falta filas de las dos clases para entrenar")
+
+        feature_names = [
+            col for col in stats.kinds
+            if stats.kinds[col] != "empty" and 1 - present.get(col, 0) / labelled_rows <= max_missing_pct
+        ]
+        numeric_cols = [c for c in feature_names if stats.kinds[c] != "str"]
+        categorical_cols = [c for c in feature_names if stats.kinds[c] == "str"]
+        preprocessor = fit_preprocessor(stats, numeric_cols, categorical_cols)
+
+    print(f"\nArchivo leído por bloques: {csv_path} ({labelled_rows} filas etiquetables, {chunks} bloques)")
+    print(f"Misión detectada: {mission} (columna '{disposition_col}')")
+    print(f"Características numéricas: {len(numeric_cols)}")
+    print(f"Características categóricas: {len(categorical_cols)}")
+
+    # Pesos balanceados como class_weight="balanced" (partial_fit no lo admite)
+    weights = class_counts.sum() / (2 * class_counts)
+    # average=True: los coeficientes son la media de los pasos (SGD sin promediar
+    # oscila mucho entre bloques y la exactitud cae aunque el AUC se mantenga)
+    clf = SGDClassifier(loss="log_loss", alpha=ALPHA, average=True,
+                        class_weight={0: weights[0], 1: weights[1]}, random_state=random_state)
+    rng = np.random.default_rng(random_state)
+
+    def labelled_chunks():
+        """(X transformado, y, máscara de prueba) de cada bloque"""
+        row = 0
+        for chunk in read_csv_chunks(csv_path, chunk_rows):
+            mask, y = labelled(chunk, disposition_col)
+            test = test_mask(row, len(chunk))[mask]
+            row += len(chunk)
+            if mask.any():
+                X = coerce_chunk(chunk[mask], numeric_cols, categorical_cols)
+                yield preprocessor.transform(X), y, test
+
+    # --- Pasadas 2..epochs+1: ajuste incremental ---
+    print(f"\nEntrenando por bloques ({epochs} épocas)...")
+    with span("train_streaming.fit", timings):
+        for epoch in range(epochs):
+            for Xt, y, test in labelled_chunks():
+                train = np.flatnonzero(~test)
+                if len(train) == 0:
+                    continue
+                order = rng.permutation(train)
+                clf.partial_fit(Xt[order], y[order], classes=np.array([0, 1]))
+
+    # --- Última pasada: evaluación con la partición de prueba ---
+    with span("train_streaming.evaluate", timings):
+        y_test, p_test = [], []
+        for Xt, y, test in labelled_chunks():
+            if test.any():
+                y_test.append(y[test])
+                p_test.append(clf.predict_proba(Xt[test])[:, 1])
+        y_test = np.concatenate(y_test) if y_test else np.empty(0, dtype=int)
+        p_test = np.concatenate(p_test) if p_test else np.empty(0)
+        accuracy = float(((p_test >= 0.5).astype(int) == y_test).mean()) if len(y_test) else float("nan")
+        roc_auc = float(roc_auc_score(y_test, p_test)) if len(np.unique(y_test)) == 2 else float("nan")
+    print(f"AUC-ROC Score (test): {roc_auc:.2f}")
+
+    pipeline = Pipeline(steps=[("preprocess", preprocessor), ("model", clf)])
+    # Referencia del monitor de deriva: cuantiles del reservorio (valores no vacíos)
+    reference = Reference.from_samples(
+        {c: stats.reservoir[c] for c in numeric_cols}, p_test,
+        missing={c: stats.missing_fraction(c) for c in numeric_cols}, rows=stats.rows
+    )
+    report = {
+        "accuracy": accuracy,
+        "roc_auc": roc_auc,
+        "reference": reference,
+        "streaming": {
+            "rows": labelled_rows,
+            "train_rows": stats.rows,
+            "test_rows": int(len(y_test)),
+            "chunks": chunks,
+            "chunk_rows": chunk_rows,
+            "epochs": epochs
+        }
+    }
+    return pipeline, feature_names, mission, report
@@ -0,0 +1,266 @@
+# =========================
+# Resúmenes precalculados de cada tabla (dashboard)
+# =========================
+# Conteo por disposición, histogramas de periodo, radio, Teq y Teff y
+# conteo por año de descubrimiento. Se calculan en SQL con un solo recorrido
+# de la tabla (GROUPING SETS), se guardan en planet_summaries y se sirven
+# desde memoria con ETag. Al ingerir filas no se recalcula todo: se suma la
+# diferencia entre el resumen de las filas afectadas antes y después.
+
+import asyncio
+import json
+import math
+import os
+import sys
+import time
+
+from app import db
+from app.planets import (DISPOSITION_COLS, KEY_COLS, PERIOD_COLS, RADIUS_COLS, SQL_NUMERIC_TYPES,
+                         TEFF_COLS, TEQ_COLS, USEFUL_COLS, YEAR_COLS, get_column_types, numeric_expr)
+
+# (columnas por tabla, mínimo, máximo, número de bins, escala logarítmica)
+# Los bins son fijos para poder sumar resúmenes parciales
+HISTOGRAMS = {
+    "period": (PERIOD_COLS, 0.1, 1000.0, 32, True),
+    "radius": (RADIUS_COLS, 0.1, 100.0, 30, True),
+    "teq": (TEQ_COLS, 0.0, 4000.0, 40, False),
+    "teff": (TEFF_COLS, 2000.0, 12000.0, 40, False)
+}
+
+SUMMARY_TABLE = "planet_summaries"
+SUMMARY_FORMAT = 1
+# Cada cuánto un worker comprueba si otro actualizó el resumen
+CHECK_SECONDS = float(os.getenv("SUMMARY_CHECK_SECONDS", "5"))
+
+# dataset -> {"version", "etag", "body", "checked_at"}
+_cache = {}
+_locks = {}
+_table_ready = False
+
+def histogram_edges(lo, hi, bins, log):
+    """Límites de los bins (los contadores llevan además un bin por debajo y otro por encima)"""
+    if log:
+        return [lo * (hi / lo) ** (i / bins) for i in range(bins + 1)]
+    return [lo + (hi - lo) * i / bins for i in range(bins + 1)]
+
+def _bucket_expr(expr, lo, hi, bins, log):
+    """Bin de width_bucket: 0 por debajo de lo, bins + 1 desde hi, NULL si no hay valor"""
+    if log:
+        return (f"CASE WHEN {expr} <= 0 THEN 0 "
+                f"ELSE width_bucket(ln({expr}), {math.log(lo)!r}, {math.log(hi)!r}, {bins}) END")
+    return f"width_bucket({expr}, {lo!r}, {hi!r}, {bins})"
+
+def _year_expr(col, col_type):
+    if col_type in SQL_NUMERIC_TYPES:
+        return f"floor({col})::int"
+    return f"(CASE WHEN {col}::text ~ '^\\s*[0-9]{{4}}' THEN substring(trim({col}::text) from 1 for 4)::int END)"
+
+async def _ensure_table(conn):
+    global _table_ready
+    if not _table_ready:
+        await conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {SUMMARY_TABLE} ("
+            "dataset text PRIMARY KEY, "
+            "version bigint NOT NULL, "
+            "summary jsonb NOT NULL, "
+            "updated_at timestamptz NOT NULL DEFAULT now())"
+        )
+        _table_ready = True
+
+async def compute(dataset, conn, keys=None):
+    """
+    Resumen de la tabla (o solo de las filas con esas claves) en un único
+    recorrido con GROUPING SETS
+    """
+    column_types = await get_column_types(dataset)
+    groups = {}
+    histograms = {}
+
+    disposition = DISPOSITION_COLS[dataset]
+    if disposition in column_types:
+        groups["disposition"] = f"COALESCE({disposition}::text, 'UNKNOWN')"
+    for name, (cols, lo, hi, bins, log) in HISTOGRAMS.items():
+        col = cols[dataset]
+        if col in column_types:
+            groups[name] = _bucket_expr(numeric_expr(col, column_types[col]), lo, hi, bins, log)
+            histograms[name] = {
+                "column": col,
+                "log": log,
+                "edges": histogram_edges(lo, hi, bins, log),
+                "counts": [0] * (bins + 2),
+                "nulls": 0
+            }
+    year = YEAR_COLS.get(dataset)
+    if year in column_types:
+        groups["year"] = _year_expr(year, column_types[year])
+
+    summary = {
+        "format": SUMMARY_FORMAT,
+        "rows": 0,
+        "dispositions": {},
+        "histograms": histograms,
+        "discovery_years": {}
+    }
+
+    aliases = list(groups)
+    inner = ", ".join(f"{expr} AS {alias}" for alias, expr in groups.items()) or "1 AS one"
+    where = ""
+    args = []
+    if keys is not None:
+        where = f" WHERE {KEY_COLS[dataset]}::text = ANY($1::text[])"
+        args.append([str(k) for k in keys])
+    sets = ", ".join(f"({alias})" for alias in aliases)
+    grouping = "".join(f", GROUPING({alias}) AS g_{alias}" for alias in aliases)
+    sql = (
+        f"SELECT {', '.join(aliases + ['count(*) AS n'])}{grouping} "
+        f"FROM (SELECT {inner} FROM {dataset}_raw{where}) s "
+        f"GROUP BY GROUPING SETS ({sets + ', ' if sets else ''}())"
+    )
+
+    for row in await conn.fetch(sql, *args):
+        # La única columna agrupada de la fila (ninguna = total de filas)
+        alias = next((a for a in aliases if row[f"g_{a}"] == 0), None)
+        n = row["n"]
+        if alias is None:
+            summary["rows"] = n
+        elif alias == "disposition":
+            summary["dispositions"][row[alias]] = n
+        elif alias == "year":
+            if row[alias] is not None:
+                summary["discovery_years"][str(row[alias])] = n
+        elif row[alias] is None:
+            histograms[alias]["nulls"] = n
+        else:
+            histograms[alias]["counts"][row[alias]] = n
+    return summary
+
+def merge(summary, delta, sign=1):
+    """
+    Suma (sign=1) o resta (sign=-1) un resumen parcial. Lanza ValueError si
+    los bins no coinciden (cambió la configuración: hay que recalcular).
+    """
+    if summary.get("format") != delta.get("format"):
+        raise ValueError("Formato de resumen distinto")
+    summary["rows"] += sign * delta["rows"]
+    for field in ("dispositions", "discovery_years"):
+        counts = summary[field]
+        for label, n in delta[field].items():
+            counts[label] = counts.get(label, 0) + sign * n
+            if counts[label] == 0:
+                del counts[label]
+    for name, hist in delta["histograms"].items():
+        target = summary["histograms"].get(name)
+        if target is None or target["edges"] != hist["edges"]:
+            raise ValueError(f"Histograma '{name}' con bins distintos")
+        target["counts"] = [a + sign * b for a, b in zip(target["counts"], hist["counts"])]
+        target["nulls"] += sign * hist["nulls"]
+    return summary
+
+def _remember(dataset, version, summary, updated_at):
+    body = json.dumps({
+        "dataset": dataset,
+        "version": version,
+        "updated_at": updated_at.isoformat(),
+        **summary
+    }).encode()
+    entry = {
+        "version": version,
+        "etag": f'"{dataset}-v{version}"',
+        "body": body,
+        "checked_at": time.monotonic()
+    }
+    _cache[dataset] = entry
+    return entry
+
+async def refresh_summary(dataset):
+    """Recalcula el resumen completo de la tabla y lo guarda"""
+    pool = await db.get_pool()
+    async with pool.acquire() as conn:
+        await _ensure_table(conn)
+        start = time.perf_counter()
+        summary = await compute(dataset, conn)
+        row = await conn.fetchrow(
+            f"INSERT INTO {SUMMARY_TABLE} (dataset, version, summary, updated_at) "
+            "VALUES ($1, 1, $2::jsonb, now()) "
+            "ON CONFLICT (dataset) DO UPDATE SET "
+            f"version = {SUMMARY_TABLE}.version + 1, summary = EXCLUDED.summary, updated_at = now() "
+            "RETURNING version, updated_at",
+            dataset, json.dumps(summary)
+        )
+    print(f"📊 Resumen de {dataset}: {summary['rows']} filas en {time.perf_counter() - start:.2f}s")
+    return _remember(dataset, row["version"], summary, row["updated_at"])
+
+async def apply_delta(dataset, conn, before, after):
+    """
+    Actualiza el resumen guardado con el cambio de las filas ingeridas:
+    before/after son compute(dataset, conn, keys) antes y después del upsert.
+    Se ejecuta dentro de la transacción de la ingesta (conn).
+    """
+    await _ensure_table(conn)
+    row = await conn.fetchrow(
+        f"SELECT summary FROM {SUMMARY_TABLE} WHERE dataset = $1 FOR UPDATE", dataset
+    )
+    if row is None:
+        return None
+    try:
+        summary = merge(merge(json.loads(row["summary"]), after, 1), before, -1)
+    except ValueError:
+        # Configuración nueva de bins: se recalcula todo
+        summary = await compute(dataset, conn)
+    row = await conn.fetchrow(
+        f"UPDATE {SUMMARY_TABLE} SET version = version + 1, summary = $2::jsonb, updated_at = now() "
+        "WHERE dataset = $1 RETURNING version, updated_at",
+        dataset, json.dumps(summary)
+    )
+    # El cache local se renueva en la siguiente petición (la transacción aún no terminó)
+    _cache.pop(dataset, None)
+    return row["version"]
+
+async def get_summary(dataset):
+    """
+    Resumen servido desde memoria. Cada CHECK_SECONDS se compara la versión
+    guardada (una fila por clave primaria) por si otro worker lo actualizó.
+    """
+    entry = _cache.get(dataset)
+    if entry is not None and time.monotonic() - entry["checked_at"] < CHECK_SECONDS:
+        return entry
+
+    lock = _locks.setdefault(dataset, asyncio.Lock())
+    async with lock:
+        entry = _cache.get(dataset)
+        if entry is not None and time.monotonic() - entry["checked_at"] < CHECK_SECONDS:
+            return entry
+
+        pool = await db.get_pool()
+        async with pool.acquire() as conn:
+            await _ensure_table(conn)
+            row = await conn.fetchrow(
+                f"SELECT version FROM {SUMMARY_TABLE} WHERE dataset = $1", dataset
+            )
+            if row is not None and entry is not None and row["version"] == entry["version"]:
+                entry["checked_at"] = time.monotonic()
+                return entry
+            if row is not None:
+                row = await conn.fetchrow(
+                    f"SELECT version, summary, updated_at FROM {SUMMARY_TABLE} WHERE dataset = $1", dataset
+                )
+                summary = json.loads(row["summary"])
+                if summary.get("format") == SUMMARY_FORMAT:
+                    return _remember(dataset, row["version"], summary, row["updated_at"])
+
+        # Primera vez (o formato viejo): se calcula completo
+        return await refresh_summary(dataset)
+
+if __name__ == "__main__":
+    # Uso: python -m app.summaries [kepler k2planets tess]
+    async def main(datasets):
+        try:
+            for dataset in datasets:
+                if await get_column_types(dataset):
+                    await refresh_summary(dataset)
+                else:
+                    print(f"⚠️ La tabla {dataset}_raw no existe")
+        finally:
+            await db.close_pool()
+
+    asyncio.run(main(sys.argv[1:] or list(USEFUL_COLS)))
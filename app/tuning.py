@@ -0,0 +1,194 @@
+# =========================
+# Búsqueda de hiperparámetros con validación cruzada
+# =========================
+# Cada combinación (umbral de columnas vacías, estrategia de imputación)
+# se preprocesa una sola vez por fold; los candidatos solo ajustan la
+# regresión logística sobre esas matrices ya transformadas. Los ajustes se
+# reparten entre todos los núcleos con joblib (procesos) y, tras el primer
+# fold, solo siguen los mejores candidatos.
+
+import itertools
+import math
+import os
+import sys
+import time
+
+import numpy as np
+from joblib import Parallel, delayed
+
+from app.ml import (MAX_MISSING_PCT, build_classifier, build_preprocessor,
+                    select_features, split_column_types)
+
+# Rejilla por defecto
+PARAM_GRID = {
+    "C": [0.01, 0.1, 1.0, 10.0],
+    "penalty": ["l1", "l2"],
+    "solver": ["lbfgs", "liblinear", "saga"],
+    "imputer_strategy": ["median", "mean"],
+    "max_missing_pct": [0.5, MAX_MISSING_PCT]
+}
+
+# Valores de los parámetros que no aparecen en una rejilla propia
+DEFAULT_PARAMS = {
+    "C": 1.0,
+    "penalty": "l2",
+    "solver": "lbfgs",
+    "imputer_strategy": "median",
+    "max_missing_pct": MAX_MISSING_PCT
+}
+
+# Penalizaciones que admite cada solver de LogisticRegression
+SOLVER_PENALTIES = {"lbfgs": {"l2"}, "liblinear": {"l1", "l2"}, "saga": {"l1", "l2"}}
+
+N_FOLDS = 5
+KEEP_FRACTION = 0.5  # candidatos que pasan del primer fold
+
+def candidates(param_grid=None):
+    """Combinaciones válidas de la rejilla (se descartan solver/penalty incompatibles)"""
+    grid = {k: [v] for k, v in DEFAULT_PARAMS.items()}
+    grid.update(param_grid or PARAM_GRID)
+    keys = list(grid)
+    result = []
+    for values in itertools.product(*(grid[k] for k in keys)):
+        params = dict(zip(keys, values))
+        if params["penalty"] in SOLVER_PENALTIES.get(params["solver"], {params["penalty"]}):
+            result.append(params)
+    return result
+
+def _transform_fold(X, y, numeric_cols, categorical_cols, strategy, train_idx, val_idx):
+    """Ajusta el ColumnTransformer en el fold de entrenamiento y transforma ambos"""
+    preprocessor = build_preprocessor(numeric_cols, categorical_cols, strategy)
+    X_train = preprocessor.fit_transform(X.iloc[train_idx], y[train_idx])
+    X_val = preprocessor.transform(X.iloc[val_idx])
+    return X_train, X_val
+
+def _fit_score(params, X_train, y_train, X_val, y_val):
+    """AUC de un candidato en un fold y segundos que tardó el ajuste"""
+    from sklearn.metrics import roc_auc_score
+
+    start = time.perf_counter()
+    clf = build_classifier(C=params["C"], penalty=params["penalty"], solver=params["solver"], n_jobs=1)
+    clf.fit(X_train, y_train)
+    score = roc_auc_score(y_val, clf.decision_function(X_val))
+    return float(score), time.perf_counter() - start
+
+def search(df, disposition_col, param_grid=None, n_folds=N_FOLDS, n_jobs=-1,
+           keep_fraction=KEEP_FRACTION, random_state=42):
+    """
+    Validación cruzada estratificada sobre la rejilla y reentrenamiento del
+    mejor candidato con todo df. Devuelve (pipeline, feature_names, informe).
+    """
+    from sklearn.model_selection import StratifiedKFold
+    from sklearn.pipeline import Pipeline
+
+    wall_start = time.perf_counter()
+    grid = candidates(param_grid)
+    if not grid:
+        raise ValueError("La rejilla no tiene combinaciones válidas")
+    timings = {}
+
+    with Parallel(n_jobs=n_jobs) as parallel:
+        # --- Matrices preprocesadas: una por (umbral, imputación, fold) ---
+        start = time.perf_counter()
+        keys = sorted({(p["max_missing_pct"], p["imputer_strategy"]) for p in grid})
+        y_all = None
+        folds = None
+        tasks = []
+        for threshold, strategy in keys:
+            X, y = select_features(df, disposition_col, threshold)
+            y = y.to_numpy()
+            if folds is None:
+                y_all = y
+                splitter = StratifiedKFold(n_splits=n_folds, shuffle=True, random_state=random_state)
+                folds = list(splitter.split(np.zeros(len(y)), y))
+            numeric_cols, categorical_cols = split_column_types(X)
+            tasks.extend(
+                ((threshold, strategy, i), (X, y, numeric_cols, categorical_cols, strategy, tr, va))
+                for i, (tr, va) in enumerate(folds)
+            )
+        matrices = dict(zip(
+            [key for key, _ in tasks],
+            parallel(delayed(_transform_fold)(*args) for _, args in tasks)
+        ))
+        timings["preprocess_seconds"] = time.perf_counter() - start
+
+        def run_fold(params_list, fold):
+            train_idx, val_idx = folds[fold]
+            return parallel(
+                delayed(_fit_score)(
+                    params,
+                    matrices[(params["max_missing_pct"], params["imputer_strategy"], fold)][0],
+                    y_all[train_idx],
+                    matrices[(params["max_missing_pct"], params["imputer_strategy"], fold)][1],
+                    y_all[val_idx]
+                )
+                for params in params_list
+            )
+
+        results = [{"params": p, "fold_auc": [], "fit_seconds": 0.0, "pruned": False} for p in grid]
+
+        # --- Primer fold con todos los candidatos ---
+        start = time.perf_counter()
+        for result, (score, seconds) in zip(results, run_fold(grid, 0)):
+            result["fold_auc"].append(score)
+            result["fit_seconds"] += seconds
+        timings["first_fold_seconds"] = time.perf_counter() - start
+
+        # --- Poda: solo los mejores siguen con el resto de folds ---
+        ranked = sorted(results, key=lambda r: r["fold_auc"][0], reverse=True)
+        keep = max(1, math.ceil(len(ranked) * keep_fraction))
+        survivors = ranked[:keep]
+        for result in ranked[keep:]:
+            result["pruned"] = True
+
+        start = time.perf_counter()
+        for fold in range(1, n_folds):
+            scores = run_fold([r["params"] for r in survivors], fold)
+            for result, (score, seconds) in zip(survivors, scores):
+                result["fold_auc"].append(score)
+                result["fit_seconds"] += seconds
+        timings["remaining_folds_seconds"] = time.perf_counter() - start
+
+    for result in results:
+        result["cv_auc_mean"] = float(np.mean(result["fold_auc"]))
+        result["cv_auc_std"] = float(np.std(result["fold_auc"]))
+        result["fit_seconds"] = round(result["fit_seconds"], 4)
+    results.sort(key=lambda r: (not r["pruned"], r["cv_auc_mean"]), reverse=True)
+    best = results[0]
+    print(f"🏆 Mejor candidato: {best['params']} (AUC CV {best['cv_auc_mean']:.4f} ± {best['cv_auc_std']:.4f})")
+
+    # --- Reentrenar el mejor con todos los datos de entrenamiento ---
+    start = time.perf_counter()
+    params = best["params"]
+    X, y = select_features(df, disposition_col, params["max_missing_pct"])
+    numeric_cols, categorical_cols = split_column_types(X)
+    pipeline = Pipeline(steps=[
+        ("preprocess", build_preprocessor(numeric_cols, categorical_cols, params["imputer_strategy"])),
+        ("model", build_classifier(C=params["C"], penalty=params["penalty"], solver=params["solver"]))
+    ])
+    pipeline.fit(X, y)
+    timings["refit_seconds"] = time.perf_counter() - start
+    timings["wall_seconds"] = time.perf_counter() - wall_start
+
+    report = {
+        "n_candidates": len(grid),
+        "n_folds": n_folds,
+        "n_jobs": n_jobs if n_jobs > 0 else os.cpu_count(),
+        "survivors": keep,
+        "preprocessed_matrices": len(matrices),
+        "timings": {k: round(v, 4) for k, v in timings.items()},
+        "best": {k: best[k] for k in ("params", "cv_auc_mean", "cv_auc_std")},
+        "candidates": results
+    }
+    return pipeline, X.columns.tolist(), report
+
+if __name__ == "__main__":
+    # Uso: python -m app.tuning data/KEPLER.csv [n_folds]
+    from app.ml import ExoplanetModel
+
+    model = ExoplanetModel()
+    results = model.tune_model(sys.argv[1], n_folds=int(sys.argv[2]) if len(sys.argv) > 2 else N_FOLDS)
+    timings = results["tuning"]["timings"]
+    print(f"⏱️ Tiempos: {timings}")
+    for c in results["tuning"]["candidates"][:10]:
+        print(f"  {c['cv_auc_mean']:.4f}  {c['fit_seconds']:7.3f}s  {'podado' if c['pruned'] else ''}  {c['params']}")
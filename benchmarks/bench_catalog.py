@@ -0,0 +1,59 @@
+"""
+Benchmark de carga de catálogos: pd.read_csv vs cache columnar (app.columnar).
+
+Uso:
+    python -m benchmarks.bench_catalog --rows 200000 --extra-cols 130
+    python -m benchmarks.bench_catalog --csv data/KEPLER.csv
+"""
+import argparse
+import os
+import shutil
+import tempfile
+
+from app import columnar
+from benchmarks.common import measure_in_subprocess
+from benchmarks.synthetic import kepler_frame, write_csv
+
+
+def main(args):
+    csv_path = args.csv
+    tmp_dir = None
+    if csv_path is None:
+        tmp_dir = tempfile.mkdtemp(prefix="bench_catalog_")
+        csv_path = write_csv(kepler_frame(args.rows, args.extra_cols), os.path.join(tmp_dir, "koi.csv"))
+    csv_path = os.path.abspath(csv_path)
+
+    # El cache se construye fuera de la medición (es un paso de ingesta)
+    cache_path, meta = columnar.open_cache(csv_path)
+    print(f"CSV: {csv_path} ({os.path.getsize(csv_path) / 2**20:.1f} MB, "
+          f"{meta['rows']} filas, {len(meta['columns'])} columnas)")
+
+    setup = "import pandas as pd\nfrom app import columnar"
+    # "+ scan" recorre todas las columnas numéricas (fuerza a leer las páginas mapeadas)
+    scan = "\ndf.select_dtypes('number').sum()"
+    cases = {
+        "pd.read_csv": f"df = pd.read_csv({csv_path!r}, comment='#', low_memory=False)",
+        "columnar.load_frame": f"df = columnar.load_frame({csv_path!r})",
+        "columnar.load_columns": f"meta, arrays, masks = columnar.load_columns({csv_path!r})",
+        "pd.read_csv + scan": f"df = pd.read_csv({csv_path!r}, comment='#', low_memory=False)" + scan,
+        "columnar.load_frame + scan": f"df = columnar.load_frame({csv_path!r})" + scan,
+    }
+    baseline = measure_in_subprocess("pass", setup)
+    print(f"{'ruta':28s} {'tiempo (s)':>10s} {'RSS pico (MB)':>14s}")
+    for name, code in cases.items():
+        result = measure_in_subprocess(code, setup)
+        print(f"{name:28s} {result['seconds']:10.3f} "
+              f"{result['max_rss_mb'] - baseline['max_rss_mb']:14.1f}")
+
+    # El CSV sintético y su cache no se conservan
+    if tmp_dir is not None:
+        shutil.rmtree(cache_path, ignore_errors=True)
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--csv", default=None, help="CSV real; si no se da se genera uno sintético")
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--extra-cols", type=int, default=130)
+    main(parser.parse_args())
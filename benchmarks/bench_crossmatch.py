@@ -0,0 +1,197 @@
+"""
+Benchmark del cross-match entre misiones (app.crossmatch).
+
+Genera catálogos sintéticos con RA/Dec del tamaño de los reales (KOI ~10k,
+K2 ~4k, TOI ~8k objetos) multiplicados por --scale: Kepler en su campo,
+K2 en campos sobre la eclíptica y TESS en todo el cielo, con una fracción de
+objetos de Kepler y K2 repetidos en TESS (posición con ~0.5" de error y el
+mismo periodo) y sistemas con varios planetas en la misma estrella. Mide
+match_groups (KD-tree sobre vectores unitarios) frente a comparar todos los
+pares por bloques (O(n²)) y comprueba que encuentran los mismos pares.
+
+Con --db carga además los catálogos en BENCH_DB_NAME y mide rebuild() (leer
+las tres tablas, emparejar y reescribir la tabla de grupos), lookup() de ids
+y una página de /api/planets con crossmatch=dedupe.
+
+Uso:
+    python -m benchmarks.bench_crossmatch --scale 1 10 50
+    python -m benchmarks.bench_crossmatch --scale 1 --db
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+import numpy as np
+
+# app.db lee DB_NAME al importarse: con --db nunca se toca la base de desarrollo
+BENCH_DB_NAME = os.getenv("BENCH_DB_NAME", "exoplanets_bench")
+os.environ["DB_NAME"] = BENCH_DB_NAME
+
+from app.crossmatch import chord, match_groups, match_pairs, periods_compatible, unit_vectors  # noqa: E402
+
+CATALOG_ROWS = {"kepler": 10_000, "k2planets": 4_000, "tess": 8_000}
+KEPLER_FIELD = (290.67, 44.5, 8.0)  # RA, Dec y radio (grados)
+K2_FIELDS = 20
+
+
+def disk(rng, n, ra, dec, radius):
+    """n posiciones uniformes (aprox.) en un disco del cielo"""
+    r = radius * np.sqrt(rng.random(n))
+    theta = rng.uniform(0, 2 * np.pi, n)
+    return (ra + r * np.cos(theta) / np.cos(np.radians(dec))) % 360, np.clip(dec + r * np.sin(theta), -90, 90)
+
+
+def sky_catalogs(scale, overlap=0.3, seed=0):
+    """{dataset: (ids, ra, dec, period)}; 'overlap' de los objetos de TESS están también en Kepler o K2"""
+    rng = np.random.default_rng(seed)
+    sizes = {d: int(n * scale) for d, n in CATALOG_ROWS.items()}
+
+    ra, dec = disk(rng, sizes["kepler"], *KEPLER_FIELD)
+    # Sistemas múltiples: un 20% comparte estrella con el objeto anterior (otro periodo)
+    same_star = np.flatnonzero(rng.random(sizes["kepler"]) < 0.2)
+    same_star = same_star[same_star > 0]
+    ra[same_star], dec[same_star] = ra[same_star - 1], dec[same_star - 1]
+    kepler = (np.array([f"K{i:08d}.01" for i in range(sizes["kepler"])], dtype=object),
+              ra, dec, rng.uniform(0.5, 500, sizes["kepler"]))
+
+    field = rng.integers(0, K2_FIELDS, sizes["k2planets"])
+    ra, dec = disk(rng, sizes["k2planets"], 0.0, 0.0, 7.0)
+    ra = (ra + field * 360 / K2_FIELDS) % 360
+    k2 = (np.array([f"K2-{i} b" for i in range(sizes["k2planets"])], dtype=object),
+          ra, dec, rng.uniform(0.5, 80, sizes["k2planets"]))
+
+    ra = rng.uniform(0, 360, sizes["tess"])
+    dec = np.degrees(np.arcsin(rng.uniform(-1, 1, sizes["tess"])))
+    period = rng.uniform(0.5, 30, sizes["tess"])
+    # Repetidos: copia de objetos de Kepler y K2 con error de posición y de periodo
+    n_shared = int(overlap * sizes["tess"])
+    n_kepler = n_shared * 2 // 3
+    source = [(kepler, rng.choice(sizes["kepler"], n_kepler, replace=False)),
+              (k2, rng.choice(sizes["k2planets"], n_shared - n_kepler, replace=False))]
+    start = 0
+    for (_, src_ra, src_dec, src_period), rows in source:
+        target = slice(start, start + len(rows))
+        jitter = rng.normal(0, 0.5 / 3600, (2, len(rows)))
+        ra[target] = (src_ra[rows] + jitter[0] / np.cos(np.radians(src_dec[rows]))) % 360
+        dec[target] = np.clip(src_dec[rows] + jitter[1], -90, 90)
+        period[target] = src_period[rows] * (1 + rng.normal(0, 1e-4, len(rows)))
+        start += len(rows)
+    tess = (np.array([f"{100 + i}.01" for i in range(sizes["tess"])], dtype=object), ra, dec, period)
+    return {"kepler": kepler, "k2planets": k2, "tess": tess}
+
+
+def flatten(catalogs):
+    """Vectores unitarios, catálogo y periodo de todos los objetos juntos"""
+    vectors = np.concatenate([unit_vectors(c[1], c[2]) for c in catalogs.values()])
+    catalog = np.concatenate([np.full(len(c[0]), i) for i, c in enumerate(catalogs.values())])
+    period = np.concatenate([c[3] for c in catalogs.values()])
+    return vectors, catalog, period
+
+
+def brute_force_pairs(catalogs, radius_arcsec, block=512):
+    """Pares válidos comparando cada objeto con todos (por bloques de filas)"""
+    vectors, catalog, period = flatten(catalogs)
+    limit = chord(radius_arcsec) ** 2
+    found = []
+    for start in range(0, len(vectors), block):
+        d2 = ((vectors[start:start + block, None, :] - vectors[None, :, :]) ** 2).sum(-1)
+        i, j = np.nonzero(d2 <= limit)
+        i += start
+        keep = (i < j) & (catalog[i] != catalog[j]) & periods_compatible(period[i], period[j])
+        found.append(np.column_stack([i[keep], j[keep]]))
+    return np.concatenate(found)
+
+
+def subsample(catalogs, fraction):
+    """Misma fracción de cada catálogo (para que la fuerza bruta termine)"""
+    return {d: tuple(a[:max(1, int(len(a) * fraction))] for a in c) for d, c in catalogs.items()}
+
+
+def run_db(catalogs, tmp):
+    """Carga los catálogos en BENCH_DB_NAME y mide rebuild, lookup y /api/planets con dedupe"""
+    os.environ["FEATURE_STORE_DIR"] = os.path.join(tmp, "features")
+    import pandas as pd
+    import psycopg2
+    from app import crossmatch, db, ingest
+    from app.db import DB_CONFIG
+    from app.planets import KEY_COLS, PERIOD_COLS, build_planets_query, get_column_types
+
+    conn = psycopg2.connect(**DB_CONFIG)
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute("SELECT 1 FROM pg_database WHERE datname = %s", (BENCH_DB_NAME,))
+        if cur.fetchone() is None:
+            cur.execute(f"CREATE DATABASE {BENCH_DB_NAME}")
+    conn.close()
+
+    async def main():
+        try:
+            for dataset, (ids, ra, dec, period) in catalogs.items():
+                path = os.path.join(tmp, f"{dataset}.csv")
+                pd.DataFrame({KEY_COLS[dataset]: ids, "ra": ra, "dec": dec,
+                              PERIOD_COLS[dataset]: period}).to_csv(path, index=False)
+                await db.execute(f"DROP TABLE IF EXISTS {dataset}_raw")
+                await ingest.ingest_csv(path, dataset=dataset)
+
+            result = await crossmatch.rebuild()
+            print(f"rebuild: {result['seconds'] * 1000:.0f} ms (leer {result['load_seconds'] * 1000:.0f} ms, "
+                  f"emparejar {result['match_seconds'] * 1000:.0f} ms), {result['groups']} grupos")
+
+            ids = catalogs["tess"][0][:1000]
+            start = time.perf_counter()
+            found = await crossmatch.lookup(np.full(len(ids), "tess", dtype=object), ids)
+            print(f"lookup de {len(ids)} ids: {(time.perf_counter() - start) * 1000:.1f} ms, "
+                  f"{int(np.not_equal(found['group_id'], None).sum())} con grupo")
+
+            column_types = await get_column_types("tess")
+            for mode in (None, "dedupe"):
+                sql, args = build_planets_query("tess", column_types, 1000, crossmatch=mode)
+                start = time.perf_counter()
+                rows = await db.fetch(sql, *args)
+                print(f"/api/planets/tess limit=1000 crossmatch={mode}: "
+                      f"{(time.perf_counter() - start) * 1000:.1f} ms, {len(rows)} filas")
+        finally:
+            await db.close_pool()
+
+    asyncio.run(main())
+
+
+def main(args):
+    match_groups(sky_catalogs(0.01), args.radius)  # importa scipy fuera de la medida
+    print(f"{'escala':>6} {'objetos':>9} {'grupos':>7} {'kd-tree ms':>11} {'fuerza bruta ms':>16}")
+    for scale in args.scale:
+        catalogs = sky_catalogs(scale)
+        n = sum(len(c[0]) for c in catalogs.values())
+        start = time.perf_counter()
+        groups = match_groups(catalogs, args.radius)
+        tree_ms = (time.perf_counter() - start) * 1000
+
+        # Fuerza bruta sobre una muestra y extrapolada a n² (se marca con ~)
+        fraction = min(1.0, args.brute_max / n)
+        sample = subsample(catalogs, fraction)
+        start = time.perf_counter()
+        pairs = brute_force_pairs(sample, args.radius)
+        brute_ms = (time.perf_counter() - start) * 1000 / fraction ** 2
+        # El KD-tree encuentra exactamente los mismos pares
+        tree_pairs = match_pairs(*flatten(sample), args.radius)
+        assert {tuple(sorted(p)) for p in tree_pairs.tolist()} == {tuple(p) for p in pairs.tolist()}
+
+        print(f"{scale:>6} {n:>9} {int(groups['is_primary'].sum()):>7} {tree_ms:>11.1f} "
+              f"{'~' if fraction < 1 else ' '}{brute_ms:>15.0f}")
+
+    if args.db:
+        with tempfile.TemporaryDirectory() as tmp:
+            run_db(sky_catalogs(args.scale[0]), tmp)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scale", type=float, nargs="+", default=[1, 10, 50],
+                        help="Múltiplo del tamaño de los catálogos reales")
+    parser.add_argument("--radius", type=float, default=3.0, help="Radio del cross-match en segundos de arco")
+    parser.add_argument("--brute-max", type=int, default=5_000,
+                        help="Objetos como mucho en la comparación de todos los pares")
+    parser.add_argument("--db", action="store_true", help="Mide también rebuild/lookup contra PostgreSQL")
+    main(parser.parse_args())
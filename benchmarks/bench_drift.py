@@ -0,0 +1,92 @@
+"""
+Benchmark del monitor de deriva (app.drift).
+
+Con un modelo de Kepler y una referencia sacada de un CSV sintético, mide lo
+que añade DriftMonitor.observe a cada lote clasificado frente al predict del
+kernel, y el coste de /api/drift (report) según las filas vistas: con los
+sketches es constante, mientras que recalcular el KS exacto (scipy ks_2samp)
+sobre todas las filas clasificadas crece con ellas y obliga a guardarlas.
+También compara el KS por bins con el exacto y comprueba que una
+característica desplazada sale como deriva.
+
+Uso:
+    python -m benchmarks.bench_drift --rows 100000 --batches 1 10 50
+"""
+import argparse
+import time
+
+import numpy as np
+
+from app.drift import DriftMonitor, Reference
+from app.missions import MISSION_COL, ModelRouter
+from app.ml import ExoplanetModel
+from benchmarks.synthetic import kepler_frame
+
+
+def best_time(fn, repeat):
+    """Mejor tiempo de 'repeat' ejecuciones"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(args):
+    model = ExoplanetModel()
+    model.load_model(args.model)
+    train = kepler_frame(args.rows, seed=1)[model.feature_names]
+    model.reference = Reference.from_frame(train, model.predict(train)[1][:, 1])
+    router = ModelRouter({model.mission: model}, default=model)
+
+    X = kepler_frame(args.rows, seed=2)[model.feature_names].assign(**{MISSION_COL: model.mission})
+    missions = X[MISSION_COL].to_numpy()
+    _, probabilities = model.predict(X[model.feature_names])
+
+    predict = best_time(lambda: model.predict(X[model.feature_names]), args.repeat)
+    monitor = DriftMonitor()
+    observe = best_time(lambda: monitor.observe(router, X, missions, probabilities), args.repeat)
+    print(f"filas={len(X)} características={len(model.reference.features)}")
+    print(f"predict {predict * 1000:9.1f} ms")
+    print(f"observe {observe * 1000:9.1f} ms ({observe / predict * 100:.0f}% del predict)")
+
+    # /api/drift: sketches frente a KS exacto con todas las filas guardadas
+    from scipy.stats import ks_2samp
+    print(f"\n{'lotes':>6} {'filas vistas':>13} {'report ms':>10} {'ks exacto ms':>13} {'MB guardados':>13}")
+    for batches in args.batches:
+        monitor = DriftMonitor(half_life=0)
+        stored = []
+        for _ in range(batches):
+            monitor.observe(router, X, missions, probabilities)
+            stored.append(X[model.feature_names].to_numpy())
+        report = best_time(monitor.report, args.repeat)
+        seen = np.concatenate(stored)
+        start = time.perf_counter()
+        for i, name in enumerate(model.feature_names):
+            ks_2samp(train[name].to_numpy(), seen[:, i])
+        exact = time.perf_counter() - start
+        print(f"{batches:>6} {len(seen):>13} {report * 1000:>10.2f} {exact * 1000:>13.0f} {seen.nbytes / 1e6:>13.1f}")
+        del stored, seen
+
+    # KS por bins frente al exacto, y una característica desplazada
+    shifted = X.copy()
+    name = model.feature_names[0]
+    shifted[name] = shifted[name] * 1.5
+    monitor = DriftMonitor(half_life=0)
+    monitor.observe(router, shifted, missions, probabilities)
+    features = next(iter(monitor.report().values()))["features"]
+    print(f"\n{'característica':>16} {'psi':>8} {'ks bins':>8} {'ks exacto':>10} estado")
+    for column, drift in features.items():
+        exact = ks_2samp(train[column].to_numpy(), shifted[column].to_numpy()).statistic
+        print(f"{column:>16} {drift['psi']:>8.4f} {drift['ks']:>8.4f} {exact:>10.4f} {drift['status']}"
+              f"{'  (x1.5)' if column == name else ''}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--model", default="models/exoplanet_model.pkl")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--batches", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--repeat", type=int, default=5)
+    main(parser.parse_args())
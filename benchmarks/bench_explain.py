@@ -0,0 +1,87 @@
+"""
+Benchmark de las explicaciones por predicción (explain=true en /api/classify).
+
+Mide, para un CSV sintético de Kepler, el predict del kernel compilado frente
+a la matriz de aportaciones sola y a explain() (aportaciones, probabilidades
+y top-k en una sola pasada), y la función top_k de app.kernel con argsort y
+con argpartition para matrices anchas. También mide la respuesta completa
+(columnas del resultado + JSON en records) con y sin explicaciones, que es
+lo que paga el cliente.
+
+Uso:
+    python -m benchmarks.bench_explain --rows 100000 -k 5
+"""
+import argparse
+import time
+
+import numpy as np
+
+from app import kernel as kernel_module
+from app.ml import ExoplanetModel
+from app.serialization import dumps, explanation_columns, records, result_columns
+from benchmarks.synthetic import kepler_frame
+
+
+def best_time(fn, repeat):
+    """Mejor tiempo de 'repeat' ejecuciones"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(args):
+    model = ExoplanetModel()
+    model.load_model(args.model)
+    X = kepler_frame(args.rows)[model.feature_names]
+    missions = np.full(len(X), model.mission, dtype=object)
+    kernel = model.compiled
+
+    def response(explain):
+        if explain:
+            predictions, probabilities, names, contributions = model.explain(X, args.k)
+            columns = explanation_columns(result_columns(predictions, probabilities, missions),
+                                          names, contributions)
+        else:
+            predictions, probabilities = model.predict(X)
+            columns = result_columns(predictions, probabilities, missions)
+        return dumps(records(columns))
+
+    cases = {
+        "predict": lambda: model.predict(X),
+        "aportaciones": lambda: kernel.contributions(X),
+        f"explain top-{args.k}": lambda: model.explain(X, args.k),
+        "respuesta sin explain": lambda: response(False),
+        "respuesta con explain": lambda: response(True),
+    }
+
+    print(f"filas={len(X)} características={len(kernel.feature_names)} k={args.k}")
+    times = {name: best_time(fn, args.repeat) for name, fn in cases.items()}
+    for name, seconds in times.items():
+        print(f"{name:38s} {seconds * 1000:9.1f} ms")
+    extra = times["respuesta con explain"] - times["respuesta sin explain"]
+    print(f"coste extra de explain en la respuesta: {extra * 1000:.1f} ms "
+          f"({extra / times['respuesta sin explain'] * 100:.0f}%)")
+
+    # top_k sobre matrices de distinto ancho (modelos con más características)
+    print(f"\n{'columnas':>9} {'argsort':>9} {'argpartition':>13}  (ms, {args.rows} filas)")
+    rng = np.random.default_rng(0)
+    for width in args.widths:
+        values = rng.normal(size=(args.rows, width))
+        times = []
+        for threshold in (width + 1, 0):
+            kernel_module.PARTITION_MIN_COLUMNS = threshold
+            times.append(best_time(lambda: kernel_module.top_k(values, args.k), args.repeat))
+        print(f"{width:>9} {times[0] * 1000:>9.1f} {times[1] * 1000:>13.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--model", default="models/exoplanet_model.pkl")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("-k", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--widths", type=int, nargs="+", default=[7, 50, 256, 1000])
+    main(parser.parse_args())
@@ -0,0 +1,120 @@
+"""
+Benchmark de la exportación en streaming de /api/planets/{dataset}/export.
+
+Carga un catálogo sintético de Kepler en kepler_raw de una base aparte
+(BENCH_DB_NAME) y, en un proceso nuevo por caso, compara traer la tabla
+entera con fetch + lista de dicts + un JSON (lo que haría read_planets sin
+límite) con el generador de app.export en CSV, NDJSON y Parquet. Se miden
+MB/s del cuerpo generado y el pico de RSS.
+
+Uso (con PostgreSQL local):
+    python -m benchmarks.bench_export --rows 1000000 --extra-cols 20
+    python -m benchmarks.bench_export --rows 200000 --columns useful --fetch-rows 2000
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+
+from benchmarks.common import measure_in_subprocess
+from benchmarks.synthetic import kepler_frame, write_csv
+
+BENCH_DB_NAME = os.getenv("BENCH_DB_NAME", "exoplanets_bench")
+
+
+def create_database():
+    """Crea BENCH_DB_NAME si no existe"""
+    import psycopg2
+    from app.db import DB_CONFIG
+
+    conn = psycopg2.connect(**DB_CONFIG)
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute("SELECT 1 FROM pg_database WHERE datname = %s", (BENCH_DB_NAME,))
+        if cur.fetchone() is None:
+            cur.execute(f"CREATE DATABASE {BENCH_DB_NAME}")
+    conn.close()
+
+
+def load_table(rows, extra_cols):
+    """kepler_raw con 'rows' filas sintéticas (se recrea cada vez)"""
+    from app import db, ingest
+
+    async def load():
+        try:
+            await db.execute("DROP TABLE IF EXISTS kepler_raw")
+            return await ingest.ingest_csv(csv_path, dataset="kepler")
+        finally:
+            await db.close_pool()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "kepler.csv")
+        write_csv(kepler_frame(rows, extra_cols=extra_cols), csv_path)
+        return asyncio.run(load())
+
+
+SETUP = """
+import asyncio, os
+os.environ["DB_NAME"] = {db_name!r}
+os.environ["FEATURE_STORE_DIR"] = os.path.join({tmp!r}, "features")
+from app import db, export
+from app.planets import build_export_query, get_column_types
+from app.serialization import dumps
+"""
+
+LEGACY = """
+async def run():
+    sql, args = build_export_query("kepler", await get_column_types("kepler"), projection={columns!r})
+    rows = await db.fetch(sql, *args)
+    body = dumps([dict(row) for row in rows])
+    await db.close_pool()
+    return len(rows), len(body)
+rows, size = asyncio.run(run())
+"""
+
+STREAM = """
+async def run():
+    sql, args = build_export_query("kepler", await get_column_types("kepler"), projection={columns!r})
+    size = 0
+    async for chunk in export.stream_query(sql, args, {format!r}, "kepler", fetch_rows={fetch_rows}):
+        size += len(chunk)
+    await db.close_pool()
+    return size
+size = asyncio.run(run())
+"""
+
+
+def main(args):
+    os.environ["DB_NAME"] = BENCH_DB_NAME
+    create_database()
+    loaded = load_table(args.rows, args.extra_cols)
+    print(f"kepler_raw: {loaded['rows_read']} filas, {10 + args.extra_cols} columnas "
+          f"(ingesta {loaded['seconds']:.1f}s)  columns={args.columns} fetch={args.fetch_rows}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        setup = SETUP.format(db_name=BENCH_DB_NAME, tmp=tmp)
+        cases = {"fetch + JSON (todo en memoria)": LEGACY.format(columns=args.columns)}
+        for format in args.formats:
+            cases[f"stream {format}"] = STREAM.format(columns=args.columns, format=format,
+                                                      fetch_rows=args.fetch_rows)
+
+        print(f"{'caso':32s} {'segundos':>9} {'MB':>9} {'MB/s':>8} {'pico RSS MB':>12}")
+        for name, code in cases.items():
+            result = measure_in_subprocess(code, setup=setup, extra="{'bytes': size}")
+            mb = result["bytes"] / 1e6
+            print(f"{name:32s} {result['seconds']:9.2f} {mb:9.1f} {mb / result['seconds']:8.1f} "
+                  f"{result['max_rss_mb']:12.1f}")
+            if args.json:
+                print(json.dumps({"case": name, **result}))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--extra-cols", type=int, default=20)
+    parser.add_argument("--columns", choices=["useful", "all"], default="all")
+    parser.add_argument("--fetch-rows", type=int, default=5000)
+    parser.add_argument("--formats", nargs="+", default=["csv", "ndjson", "parquet"])
+    parser.add_argument("--json", action="store_true", help="Imprime además cada resultado en JSON")
+    main(parser.parse_args())
@@ -0,0 +1,66 @@
+"""
+Benchmark del planificador de inferencia por lotes (app.inference).
+
+Lanza muchas peticiones pequeñas y concurrentes y compara una predicción por
+petición en el threadpool con el InferenceScheduler.
+
+Uso:
+    python -m benchmarks.bench_inference --requests 2000 --rows 5 --concurrency 64
+"""
+import argparse
+import asyncio
+import time
+
+from fastapi.concurrency import run_in_threadpool
+
+from app.inference import InferenceScheduler
+from app.ml import ExoplanetModel
+from benchmarks.synthetic import kepler_frame
+
+
+async def run_load(predict, frames, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(X):
+        async with semaphore:
+            await predict(X)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(X) for X in frames))
+    return len(frames) / (time.perf_counter() - start)
+
+
+async def main(args):
+    model = ExoplanetModel()
+    model.load_model(args.model)
+    data = kepler_frame(args.requests * args.rows)[model.feature_names]
+    frames = [data.iloc[i * args.rows:(i + 1) * args.rows] for i in range(args.requests)]
+
+    async def direct(X):
+        await run_in_threadpool(model.predict, X)
+
+    scheduler = InferenceScheduler(lambda: model, max_latency=args.max_latency_ms / 1000)
+    await scheduler.start()
+    try:
+        before = await run_load(direct, frames, args.concurrency)
+        after = await run_load(scheduler.predict, frames, args.concurrency)
+    finally:
+        await scheduler.stop()
+
+    stats = scheduler.stats()
+    print(f"peticiones={args.requests} filas/petición={args.rows} concurrencia={args.concurrency}")
+    print(f"Una predicción por petición: {before:8.1f} req/s")
+    print(f"InferenceScheduler:          {after:8.1f} req/s  (x{after / before:.1f})")
+    print(f"Lotes: {stats['batch_requests']['count']}  "
+          f"peticiones/lote media: {stats['batch_requests']['sum'] / stats['batch_requests']['count']:.1f}  "
+          f"latencia media: {1000 * stats['latency_seconds']['sum'] / stats['latency_seconds']['count']:.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--model", default="models/exoplanet_model.pkl")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--rows", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--max-latency-ms", type=float, default=5)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,83 @@
+"""
+Benchmark de la ingesta de CSV en PostgreSQL (app.ingest).
+
+Compara la carga fila a fila (un INSERT por fila con psycopg2, como se hacía a mano)
+con app.ingest.ingest_csv (COPY por lotes + upsert) y mide también una
+segunda ingesta del mismo archivo con parte de las filas cambiadas.
+
+Uso (con PostgreSQL local; crea y borra la tabla bench_ingest_raw):
+    python -m benchmarks.bench_ingest --rows 200000 --extra-cols 20
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from app import db
+from app.ingest import ingest_csv
+from benchmarks.synthetic import kepler_frame, write_csv
+
+TABLE = "bench_ingest_raw"
+
+
+def row_inserts(df, table):
+    """Carga antigua: tabla de texto + un INSERT por fila"""
+    cols = df.columns.tolist()
+    rows = [[None if v != v else str(v) for v in row] for row in df.itertuples(index=False)]
+    conn = db.get_connection()
+    cur = conn.cursor()
+    cur.execute(f"DROP TABLE IF EXISTS {table}")
+    cur.execute(f"CREATE TABLE {table} ({', '.join(f'{c} text' for c in cols)})")
+    start = time.perf_counter()
+    cur.executemany(f"INSERT INTO {table} ({', '.join(cols)}) VALUES ({', '.join(['%s'] * len(cols))})", rows)
+    conn.commit()
+    seconds = time.perf_counter() - start
+    cur.execute(f"DROP TABLE {table}")
+    conn.commit()
+    conn.close()
+    return seconds
+
+
+async def main(args):
+    # Los exports de la NASA traen pocos decimales
+    df = kepler_frame(args.rows, extra_cols=args.extra_cols).round(5)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = write_csv(df, os.path.join(tmp, "koi.csv"))
+        size_mb = os.path.getsize(path) / 1e6
+        print(f"filas={args.rows} columnas={df.shape[1]} csv={size_mb:.1f} MB")
+
+        try:
+            legacy_rows = min(args.rows, args.legacy_rows)
+            legacy = row_inserts(df.head(legacy_rows), TABLE)
+
+            first = await ingest_csv(path, dataset="kepler", table=TABLE)
+
+            # Segunda ingesta: 10% de filas cambiadas y 1% nuevas
+            rng = np.random.default_rng(0)
+            changed = rng.random(len(df)) < 0.1
+            df.loc[changed, "koi_disposition"] = "CANDIDATE"
+            new = kepler_frame(args.rows // 100, extra_cols=args.extra_cols, seed=1).round(5)
+            new["kepoi_name"] = [f"N{i:08d}.01" for i in range(len(new))]
+            write_csv(pd.concat([df, new], ignore_index=True), path)
+            second = await ingest_csv(path, dataset="kepler", table=TABLE)
+        finally:
+            await db.execute(f"DROP TABLE IF EXISTS {TABLE}")
+            await db.close_pool()
+
+    print(f"INSERT fila a fila:  {legacy_rows / legacy:12,.0f} filas/s ({legacy_rows} filas)")
+    print(f"COPY (carga nueva):  {first['rows_per_second']:12,.0f} filas/s  (x{first['rows_per_second'] * legacy / legacy_rows:.0f})")
+    print(f"COPY (upsert):       {second['rows_per_second']:12,.0f} filas/s  "
+          f"({second['inserted']} nuevas, {second['updated']} actualizadas, {second['skipped']} sin cambios)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--extra-cols", type=int, default=20)
+    parser.add_argument("--legacy-rows", type=int, default=20000,
+                        help="Filas para la carga fila a fila (es lenta)")
+    asyncio.run(main(parser.parse_args()))
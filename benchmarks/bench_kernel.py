@@ -0,0 +1,51 @@
+"""
+Benchmark del kernel compilado (app.kernel) frente al pipeline de sklearn.
+
+Uso:
+    python -m benchmarks.bench_kernel --rows 100000
+"""
+import argparse
+import time
+
+import numpy as np
+
+from app.ml import ExoplanetModel
+from benchmarks.synthetic import kepler_frame
+
+
+def best_time(fn, repeat):
+    """Mejor tiempo de 'repeat' ejecuciones"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(args):
+    model = ExoplanetModel()
+    model.load_model(args.model)
+    if model.compiled is None:
+        raise SystemExit("El modelo no se pudo compilar")
+
+    data = kepler_frame(args.rows)[model.feature_names]
+    data.iloc[::7, 1] = np.nan  # también hay valores que imputar
+
+    print(f"{'filas':>8s} {'sklearn (ms)':>13s} {'kernel (ms)':>12s} {'speedup':>8s} {'max |dif|':>10s}")
+    for n in (1, 100, args.rows):
+        X = data.iloc[:n]
+        repeat = args.repeat if n < args.rows else max(3, args.repeat // 100)
+        t_sklearn = best_time(lambda: model.model.predict_proba(X), repeat)
+        t_kernel = best_time(lambda: model.compiled.predict_proba(X), repeat)
+        diff = np.abs(model.model.predict_proba(X) - model.compiled.predict_proba(X)).max()
+        print(f"{n:8d} {1000 * t_sklearn:13.3f} {1000 * t_kernel:12.3f} "
+              f"{t_sklearn / t_kernel:7.1f}x {diff:10.2e}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--model", default="models/exoplanet_model.pkl")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=300)
+    main(parser.parse_args())
@@ -0,0 +1,85 @@
+"""
+Benchmark de la búsqueda de planetas parecidos (app.neighbors).
+
+Construye el almacén de características con catálogos sintéticos de las tres
+misiones y mide la búsqueda de los k vecinos confirmados con el KD-tree
+frente a la fuerza bruta vectorizada con NumPy, para lotes de consultas de
+distinto tamaño. También mide la reconstrucción tras reingerir una misión.
+
+Uso:
+    python -m benchmarks.bench_neighbors --catalog-rows 100000 --queries 1 100 1000 5000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+
+def best_time(fn, repeat):
+    """Mejor tiempo de 'repeat' ejecuciones"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def brute_force(index, frame, k):
+    """Los k más cercanos comparando cada consulta con todos los puntos (por bloques)"""
+    from app.neighbors import SPACE_COLUMNS
+
+    snapshot = index.snapshot
+    points = np.concatenate([tree.tree.data for tree in snapshot.trees.values()])
+    queries = (frame[SPACE_COLUMNS].to_numpy(dtype=np.float64) - snapshot.mean) / snapshot.std
+    queries[~np.isfinite(queries)] = 0.0
+    best = []
+    for start in range(0, len(queries), 256):
+        block = queries[start:start + 256]
+        d2 = (block ** 2).sum(1)[:, None] - 2 * block @ points.T + (points ** 2).sum(1)[None, :]
+        best.append(np.sort(np.partition(d2, k, axis=1)[:, :k], axis=1))
+    return np.sqrt(np.maximum(np.concatenate(best), 0))
+
+
+def main(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["FEATURE_STORE_DIR"] = os.path.join(tmp, "features")
+        from app import features
+        from app.neighbors import NeighborIndex
+        from benchmarks.synthetic import MISSION_FRAMES, write_csv
+
+        for mission, make in MISSION_FRAMES.items():
+            path = os.path.join(tmp, f"{mission}.csv")
+            write_csv(make(args.catalog_rows, seed=len(mission)), path)
+            features.update_from_csv(path)
+
+        index = NeighborIndex()
+        build = best_time(lambda: (index.clear(), index.refresh()), 1)
+        print(f"confirmados indexados={sum(len(t) for t in index.trees.values())}  construcción {build * 1000:.1f} ms")
+
+        table = features.open_table("Kepler")
+        print(f"{'consultas':>10} {'kd-tree':>10} {'fuerza bruta':>13}  (ms, k={args.k})")
+        for n in args.queries:
+            frame = table.frame(np.arange(min(n, len(table))))
+            tree_time = best_time(lambda: index.query(frame, args.k), args.repeat)
+            brute_time = best_time(lambda: brute_force(index, frame, args.k), args.repeat)
+            print(f"{len(frame):>10} {tree_time * 1000:>10.2f} {brute_time * 1000:>13.2f}")
+
+        # Reingerir una misión: solo se reconstruye su árbol
+        path = os.path.join(tmp, "K2-update.csv")
+        write_csv(MISSION_FRAMES["K2"](args.catalog_rows, seed=99), path)
+        features.update_from_csv(path)
+        start = time.perf_counter()
+        index.refresh()
+        print(f"reconstrucción tras reingerir K2: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--catalog-rows", type=int, default=100_000, help="Filas por misión")
+    parser.add_argument("--queries", type=int, nargs="+", default=[1, 100, 1000, 5000])
+    parser.add_argument("-k", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=5)
+    main(parser.parse_args())
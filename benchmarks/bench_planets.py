@@ -0,0 +1,73 @@
+"""
+Benchmark de carga del acceso a datos de /api/planets.
+
+Compara la ruta antigua (una conexión psycopg2 nueva por petición, en el
+threadpool como hacía FastAPI con el endpoint síncrono) con el pool de asyncpg.
+
+Uso (con PostgreSQL local y la tabla <dataset>_raw cargada):
+    python -m benchmarks.bench_planets --requests 2000 --concurrency 50
+"""
+import argparse
+import asyncio
+import time
+
+from fastapi.concurrency import run_in_threadpool
+
+from app import db
+
+
+def legacy_read(dataset, limit):
+    """Lo que hacía read_planets antes del pool"""
+    conn = db.get_connection()
+    cur = conn.cursor()
+    cur.execute(f"SELECT * FROM {dataset}_raw LIMIT %s;", (limit,))
+    rows = cur.fetchall()
+    conn.close()
+    return rows
+
+
+async def run_load(make_request, total, concurrency):
+    """Lanza 'total' peticiones con 'concurrency' en vuelo y devuelve req/s"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            await make_request()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    return total / (time.perf_counter() - start)
+
+
+async def main(args):
+    query = f"SELECT * FROM {args.dataset}_raw LIMIT $1;"
+
+    async def legacy():
+        await run_in_threadpool(legacy_read, args.dataset, args.limit)
+
+    async def pooled():
+        await db.fetch(query, args.limit)
+
+    await db.init_pool()
+    try:
+        # Calentamiento para no medir la creación de conexiones del pool
+        await run_load(pooled, db.POOL_MAX_SIZE, db.POOL_MAX_SIZE)
+
+        before = await run_load(legacy, args.requests, args.concurrency)
+        after = await run_load(pooled, args.requests, args.concurrency)
+    finally:
+        await db.close_pool()
+
+    print(f"Dataset: {args.dataset}  limit={args.limit}  "
+          f"peticiones={args.requests}  concurrencia={args.concurrency}")
+    print(f"Conexión por petición: {before:8.1f} req/s")
+    print(f"Pool asyncpg:          {after:8.1f} req/s  (x{after / before:.1f})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--dataset", default="kepler")
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    asyncio.run(main(parser.parse_args()))
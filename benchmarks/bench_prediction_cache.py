@@ -0,0 +1,65 @@
+"""
+Benchmark del cache de predicciones (app.prediction_cache).
+
+Compara predecir con el modelo (kernel compilado y pipeline de sklearn) con
+servir las mismas filas desde el nivel en memoria y desde el SQLite.
+
+Uso:
+    python -m benchmarks.bench_prediction_cache --rows 1 100 5000 100000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from app.ml import ExoplanetModel
+from app.prediction_cache import PredictionCache
+from benchmarks.synthetic import kepler_frame
+
+
+def best_time(fn, repeat):
+    """Mejor tiempo de 'repeat' ejecuciones"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(args):
+    model = ExoplanetModel()
+    model.load_model(args.model)
+    compiled = model.compiled
+    disk_path = os.path.join(tempfile.mkdtemp(), "predictions.sqlite")
+
+    print(f"{'filas':>8} {'modelo':>8} {'predict':>10} {'memoria':>10} {'disco':>10}  (ms)")
+    for rows in args.rows:
+        X = kepler_frame(rows, seed=rows)
+        for label, kernel in [("kernel", compiled), ("sklearn", None)]:
+            model.compiled = kernel
+            memory = PredictionCache(mode="on")
+            memory.predict(model, X)
+            writer = PredictionCache(mode="on", disk_path=disk_path)
+            writer.predict(model, X)
+            writer._writer.shutdown(wait=True)
+            # Otro "worker": memoria vacía, solo el SQLite compartido
+            reader = PredictionCache(mode="on", disk_path=disk_path)
+
+            def disk_hit():
+                reader.memory.clear()
+                reader.predict(model, X)
+
+            predict = best_time(lambda: model.predict(X), args.repeat)
+            memory_hit = best_time(lambda: memory.predict(model, X), args.repeat)
+            disk = best_time(disk_hit, args.repeat)
+            print(f"{rows:>8} {label:>8} {predict * 1000:>10.2f} {memory_hit * 1000:>10.2f} {disk * 1000:>10.2f}")
+    model.compiled = compiled
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--model", default="models/exoplanet_model.pkl")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1, 100, 5000, 100000])
+    parser.add_argument("--repeat", type=int, default=20)
+    main(parser.parse_args())
@@ -0,0 +1,83 @@
+"""
+Benchmark de la construcción y serialización de la respuesta de /api/classify.
+
+Compara el bucle por fila de antes (un dict por fila con max(prob) y la
+media de confianzas con una lista, serializado con el json de JSONResponse)
+con app.serialization (columnas con NumPy y orjson) en
+formato records y columnar.
+
+Uso:
+    python -m benchmarks.bench_serialization --rows 100000
+"""
+import argparse
+import time
+
+import numpy as np
+from fastapi.responses import JSONResponse
+
+from app import serialization
+from app.serialization import columnar, dumps, records, result_columns
+
+
+def best_time(fn, repeat):
+    """Mejor tiempo de 'repeat' ejecuciones"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def legacy(predictions, probabilities, missions):
+    """Lo que hacía classify_exoplanet tras el predict"""
+    results = [
+        {
+            "id": i + 1,
+            "mission": mission,
+            "prediction": int(pred),
+            "prediction_label": "EXOPLANET" if pred == 1 else "FALSE POSITIVE",
+            "confidence": float(max(prob)),
+            "probability_exoplanet": float(prob[1]),
+            "probability_false_positive": float(prob[0])
+        }
+        for i, (pred, prob, mission) in enumerate(zip(predictions, probabilities, missions))
+    ]
+    stats = {"confidence_avg": float(np.mean([max(prob) for prob in probabilities]))}
+    return JSONResponse({"predictions": results, "statistics": stats}).body
+
+
+def vectorized(predictions, probabilities, missions, format):
+    columns = result_columns(predictions, probabilities, missions)
+    stats = {"confidence_avg": float(columns["confidence"].mean())}
+    body = records(columns) if format == "records" else columnar(columns)
+    return dumps({"predictions": body, "statistics": stats})
+
+
+def main(args):
+    rng = np.random.default_rng(0)
+    p1 = rng.random(args.rows)
+    probabilities = np.column_stack([1 - p1, p1])
+    predictions = (p1 > 0.5).astype(np.int64)
+    missions = np.full(args.rows, "Kepler", dtype=object)
+
+    before = best_time(lambda: legacy(predictions, probabilities, missions), args.repeat)
+    size = len(legacy(predictions, probabilities, missions))
+    print(f"filas={args.rows}  orjson={'sí' if serialization.orjson is not None else 'no'}")
+    print(f"bucle por fila + JSONResponse: {before * 1000:8.1f} ms  ({size / 1e6:.1f} MB)")
+
+    encoders = [("orjson", serialization.orjson), ("json", None)] if serialization.orjson is not None else [("json", None)]
+    for name, module in encoders:
+        serialization.orjson = module
+        for format in ("records", "columnar"):
+            seconds = best_time(lambda: vectorized(predictions, probabilities, missions, format), args.repeat)
+            size = len(vectorized(predictions, probabilities, missions, format))
+            print(f"NumPy + {name:6s} ({format:8s}):   {seconds * 1000:8.1f} ms  "
+                  f"({size / 1e6:.1f} MB, x{before / seconds:.1f})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=5)
+    main(parser.parse_args())
@@ -0,0 +1,51 @@
+"""
+Benchmark de arranque de un worker: tiempo de import y RSS por worker.
+
+Compara la carga antigua (sklearn + pipeline desde el .pkl) con la carga
+para servir (kernel compilado con memoria mapeada, sin importar sklearn).
+
+Uso:
+    python -m benchmarks.bench_startup --repeat 5
+"""
+import argparse
+import statistics
+
+from benchmarks.common import measure_in_subprocess
+
+
+CASES = {
+    "import main": "import main",
+    "pipeline (.pkl + sklearn)": (
+        "from app.ml import ExoplanetModel\n"
+        "ExoplanetModel().load_model({model!r})"
+    ),
+    "kernel (mmap, sin sklearn)": (
+        "from app.ml import ExoplanetModel\n"
+        "ExoplanetModel().load_model({model!r}, serving=True)"
+    ),
+    "worker completo (import + arranque)": (
+        "import main\n"
+        "from app import routes\n"
+        "routes.watcher.refresh()"
+    ),
+}
+
+
+def main(args):
+    # Asegura que el kernel exista antes de medir
+    measure_in_subprocess(CASES["kernel (mmap, sin sklearn)"].format(model=args.model))
+
+    print(f"{'caso':38s} {'tiempo (s)':>10s} {'RSS (MB)':>9s}  sklearn")
+    for name, code in CASES.items():
+        code = code.format(model=args.model)
+        runs = [measure_in_subprocess(code, extra="{'sklearn': 'sklearn' in sys.modules}")
+                for _ in range(args.repeat)]
+        seconds = statistics.median(r["seconds"] for r in runs)
+        rss = statistics.median(r["max_rss_mb"] for r in runs)
+        print(f"{name:38s} {seconds:10.3f} {rss:9.1f}  {'sí' if runs[0]['sklearn'] else 'no'}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--model", default="models/exoplanet_model.pkl")
+    parser.add_argument("--repeat", type=int, default=5)
+    main(parser.parse_args())
@@ -0,0 +1,70 @@
+"""
+Benchmark del entrenamiento por bloques (app.streaming) frente a train_model.
+
+Cada entrenamiento corre en su propio proceso para medir el pico de RSS.
+train_model carga el catálogo completo (cache columnar incluido, que se
+construye la primera vez); train_streaming solo tiene un bloque en memoria.
+Se comparan también exactitud y AUC en su partición de prueba.
+
+Uso:
+    python -m benchmarks.bench_streaming_train --rows 500000 --extra-cols 100
+    python -m benchmarks.bench_streaming_train --rows 200000 --chunk-rows 50000 --epochs 3
+"""
+import argparse
+import json
+import os
+import tempfile
+
+import numpy as np
+
+from benchmarks.common import measure_in_subprocess
+from benchmarks.synthetic import kepler_frame, write_csv
+
+
+def noisy_csv(path, n_rows, extra_cols, seed=42):
+    """Catálogo sintético con etiquetas ruidosas (si no, ambos aciertan el 100%)"""
+    df = kepler_frame(n_rows, extra_cols=extra_cols, seed=seed)
+    rng = np.random.default_rng(seed)
+    for col in ["koi_period", "koi_prad", "koi_teq"]:
+        df[col] = df[col] * rng.lognormal(0, 0.6, n_rows)
+    flip = rng.random(n_rows) < 0.1
+    df.loc[flip, "koi_disposition"] = np.where(
+        df.loc[flip, "koi_disposition"] == "FALSE POSITIVE", "CONFIRMED", "FALSE POSITIVE"
+    )
+    write_csv(df, path)
+
+
+def main(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "catalog.csv")
+        noisy_csv(csv_path, args.rows, args.extra_cols)
+        size_mb = os.path.getsize(csv_path) / 1e6
+        print(f"filas={args.rows} columnas={10 + args.extra_cols} csv={size_mb:.0f} MB")
+
+        setup = (
+            f"import os; os.environ['CATALOG_CACHE_DIR'] = {os.path.join(tmp, 'cache')!r}\n"
+            "from app.ml import ExoplanetModel\nmodel = ExoplanetModel()"
+        )
+        runs = {
+            "train_model (en memoria)": f"results = model.train_model({csv_path!r})",
+            "train_streaming": (
+                f"results = model.train_streaming({csv_path!r}, chunk_rows={args.chunk_rows}, epochs={args.epochs})"
+            )
+        }
+        extra = "{'accuracy': float(results['accuracy']), 'roc_auc': float(results['roc_auc'])}"
+        for name, code in runs.items():
+            result = measure_in_subprocess(code, setup=setup, extra=extra)
+            print(f"{name:26s} {result['seconds']:8.2f} s  pico RSS {result['max_rss_mb']:8.1f} MB  "
+                  f"exactitud {result['accuracy']:.4f}  AUC {result['roc_auc']:.4f}")
+            if args.json:
+                print(json.dumps({"case": name, **result}))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--extra-cols", type=int, default=100)
+    parser.add_argument("--chunk-rows", type=int, default=50_000)
+    parser.add_argument("--epochs", type=int, default=3)
+    parser.add_argument("--json", action="store_true", help="Imprime además cada resultado en JSON")
+    main(parser.parse_args())
@@ -0,0 +1,59 @@
+"""
+Benchmark del parseo de subidas anchas con el esquema del modelo (app.schema).
+
+Compara pd.read_csv del archivo completo (todas las columnas, tipos
+inferidos), como hacía /api/classify, con la lectura del plan: solo las
+columnas del modelo (usecols) y las numéricas directamente como float64.
+
+Uso:
+    python -m benchmarks.bench_upload_schema --rows 100000 --extra-cols 130
+"""
+import argparse
+import time
+import tracemalloc
+from io import BytesIO
+
+import pandas as pd
+
+from app.ml import ExoplanetModel
+from app.missions import ModelRouter
+from app.schema import plan_upload
+from benchmarks.synthetic import kepler_frame
+
+
+def measure(fn):
+    """(segundos, pico de memoria en MB, resultado)"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] / 1e6
+    tracemalloc.stop()
+    return seconds, peak, result
+
+
+def main(args):
+    model = ExoplanetModel()
+    model.load_model(args.model, serving=True)
+    router = ModelRouter({model.mission: model}, model)
+
+    df = kepler_frame(args.rows, extra_cols=args.extra_cols)
+    data = df.to_csv(index=False).encode()
+    print(f"filas={args.rows} columnas={df.shape[1]} csv={len(data) / 1e6:.1f} MB "
+          f"columnas del modelo={len(model.feature_names)}")
+
+    full_s, full_mb, full = measure(lambda: pd.read_csv(BytesIO(data)))
+    plan = plan_upload(router, df.columns)
+    plan_s, plan_mb, projected = measure(lambda: pd.read_csv(BytesIO(data), **plan.read_options()))
+
+    print(f"read_csv completo:  {full_s:6.2f} s  pico {full_mb:8.1f} MB  DataFrame {full.memory_usage(deep=True).sum() / 1e6:7.1f} MB")
+    print(f"read_csv del plan:  {plan_s:6.2f} s  pico {plan_mb:8.1f} MB  DataFrame {projected.memory_usage(deep=True).sum() / 1e6:7.1f} MB"
+          f"  (x{full_s / plan_s:.1f})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--extra-cols", type=int, default=130)
+    parser.add_argument("--model", default="models/exoplanet_model.pkl")
+    main(parser.parse_args())
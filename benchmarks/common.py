@@ -0,0 +1,55 @@
+"""
+Utilidades compartidas por los benchmarks
+"""
+import json
+import os
+import resource
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def peak_rss_mb():
+    """
+    Pico de RSS del proceso en MB. Se lee de VmHWM: ru_maxrss se hereda del
+    padre a través de fork + exec, así que un padre grande (p. ej. el que
+    generó los datos) lo inflaría
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+# Se ejecuta en un proceso aparte (desde la raíz del repo) para medir tiempo y memoria sin ruido
+_CHILD_TEMPLATE = """
+import json, sys, time
+from benchmarks.common import peak_rss_mb as _peak_rss_mb
+{setup}
+_start = time.perf_counter()
+{code}
+_elapsed = time.perf_counter() - _start
+print(json.dumps(dict({{
+    "seconds": _elapsed,
+    "max_rss_mb": _peak_rss_mb()
+}}, **({extra}))))
+"""
+
+
+def measure_in_subprocess(code, setup="", extra="{}"):
+    """
+    Ejecuta 'code' en un intérprete nuevo (desde la raíz del repo) y devuelve
+    {"seconds": ..., "max_rss_mb": ...}. 'setup' no cuenta en el tiempo pero sí en el RSS.
+    'extra' es una expresión (dict) que se evalúa al final y se añade al resultado.
+    """
+    script = _CHILD_TEMPLATE.format(setup=setup, code=code, extra=extra)
+    output = subprocess.run(
+        [sys.executable, "-c", script], cwd=ROOT, check=True,
+        capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
@@ -0,0 +1,389 @@
+"""
+Suite de benchmarks reproducible del pipeline de ML y de la API.
+
+Genera catálogos sintéticos de Kepler, K2 y TESS (benchmarks.synthetic) con
+cada tamaño y mide, cada caso en un proceso aparte para que los picos de
+memoria no se mezclen:
+  - train:    ExoplanetModel.train_model por misión
+  - predict:  latencia y filas/s de predict por tamaño de lote (sklearn y kernel)
+  - classify: /api/classify de punta a punta con el TestClient de FastAPI
+  - planets:  ingesta y /api/planets contra un PostgreSQL local (base de datos
+              aparte, BENCH_DB_NAME; se omite si no hay servidor)
+
+Los resultados se escriben en JSON (con el commit y las versiones) para
+comparar entre commits.
+
+Uso:
+    python -m benchmarks.suite --sizes 1000 100000 1000000
+    python -m benchmarks.suite --sizes 1000 --cases train predict --out /tmp/nuevo.json
+    python -m benchmarks.suite --compare benchmarks/results/abc1234.json /tmp/nuevo.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.common import ROOT, peak_rss_mb
+from benchmarks.synthetic import MISSION_FRAMES, write_csv
+
+SIZES = [1000, 100_000, 1_000_000]
+CASES = ["train", "predict", "classify", "planets"]
+BATCH_SIZES = [1, 100, 10_000, 100_000, 1_000_000]
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+BENCH_DB_NAME = os.getenv("BENCH_DB_NAME", "exoplanets_bench")
+DATASETS = {"Kepler": "kepler", "K2": "k2planets", "TESS": "tess"}
+
+# Tiempo mínimo de medida por caso (se repite hasta llegar) y máximo de repeticiones
+MIN_SECONDS = 1.0
+MAX_REPEAT = 50
+# /api/classify con un objeto por fila solo hasta este tamaño (la respuesta crece mucho)
+RECORDS_MAX_ROWS = 100_000
+# Cuánto más lento tiene que ser un caso para marcarlo como regresión
+REGRESSION_THRESHOLD = 0.10
+
+
+# =========================
+# Medidas (en el proceso hijo)
+# =========================
+
+def timings(fn, min_seconds=MIN_SECONDS, max_repeat=MAX_REPEAT):
+    """Tiempos de fn() repitiendo hasta min_seconds (al menos una vez)"""
+    runs = []
+    start = time.perf_counter()
+    while len(runs) < max_repeat and (not runs or time.perf_counter() - start < min_seconds):
+        t = time.perf_counter()
+        fn()
+        runs.append(time.perf_counter() - t)
+    return runs
+
+
+def peak_alloc_mb(fn):
+    """Pico de memoria reservada (Python y NumPy) durante una llamada"""
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1] / 1e6
+    finally:
+        tracemalloc.stop()
+
+
+def latency_stats(runs, rows):
+    ordered = sorted(runs)
+    p95 = ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))]
+    return {
+        "repeat": len(runs),
+        "seconds": min(runs),
+        "p50_ms": statistics.median(runs) * 1000,
+        "p95_ms": p95 * 1000,
+        "rows_per_second": rows / min(runs)
+    }
+
+
+def run_train(params):
+    from app.ml import ExoplanetModel
+
+    before = peak_rss_mb()
+    start = time.perf_counter()
+    results = ExoplanetModel().train_model(params["csv"])
+    seconds = time.perf_counter() - start
+    return [{
+        "seconds": seconds,
+        "rows_per_second": params["rows"] / seconds,
+        "peak_rss_mb": peak_rss_mb(),
+        "rss_growth_mb": peak_rss_mb() - before,
+        "roc_auc": float(results["roc_auc"])
+    }]
+
+
+def run_predict(params):
+    import pandas as pd
+
+    from app.ml import ExoplanetModel
+
+    models = {}
+    sklearn_model = ExoplanetModel()
+    sklearn_model.load_model(params["model"])
+    sklearn_model.compiled = None
+    models["sklearn"] = sklearn_model
+    kernel_model = ExoplanetModel()
+    kernel_model.load_model(params["model"], serving=True)
+    models["kernel"] = kernel_model
+
+    data = pd.read_csv(params["csv"], comment="#")[sklearn_model.feature_names]
+    results = []
+    for batch in BATCH_SIZES:
+        if batch > len(data):
+            continue
+        X = data.iloc[:batch]
+        for engine, model in models.items():
+            runs = timings(lambda: model.predict(X))
+            results.append({
+                "engine": engine,
+                "batch": batch,
+                **latency_stats(runs, batch),
+                "peak_alloc_mb": peak_alloc_mb(lambda: model.predict(X))
+            })
+    return results
+
+
+def run_classify(params):
+    from fastapi.testclient import TestClient
+
+    import main
+
+    with open(params["csv"], "rb") as f:
+        body = f.read()
+    formats = ["records", "columnar"] if params["rows"] <= RECORDS_MAX_ROWS else ["columnar"]
+    results = []
+    with TestClient(main.app) as client:
+        def post(format):
+            response = client.post(f"/api/classify?format={format}",
+                                   files={"file": ("bench.csv", body, "text/csv")})
+            response.raise_for_status()
+            return response
+
+        for format in formats:
+            post(format)
+            runs = timings(lambda: post(format))
+            results.append({
+                "format": format,
+                **latency_stats(runs, params["rows"]),
+                "response_mb": len(post(format).content) / 1e6,
+                "peak_rss_mb": peak_rss_mb()
+            })
+    return results
+
+
+def run_planets(params):
+    import asyncio
+
+    from fastapi.testclient import TestClient
+
+    from app import db, ingest
+    import main
+
+    results = []
+    dataset = DATASETS[params["mission"]]
+
+    async def load():
+        await db.execute(f"DROP TABLE IF EXISTS {dataset}_raw")
+        try:
+            return await ingest.ingest_csv(params["csv"], dataset=dataset)
+        finally:
+            await db.close_pool()
+
+    loaded = asyncio.run(load())
+    results.append({
+        "step": "ingest",
+        "seconds": loaded["seconds"],
+        "rows_per_second": loaded["rows_per_second"]
+    })
+
+    queries = {
+        "page_50": {"limit": 50},
+        "page_1000": {"limit": 1000},
+        "disposition": {"limit": 50, "disposition": "CONFIRMED"},
+        "period_range": {"limit": 50, "period_min": 100, "period_max": 200},
+        "summary": None
+    }
+    with TestClient(main.app) as client:
+        for name, query in queries.items():
+            if query is None:
+                def request():
+                    client.get(f"/api/planets/{dataset}/summary").raise_for_status()
+            else:
+                def request(query=query):
+                    client.get(f"/api/planets/{dataset}", params=query).raise_for_status()
+            request()
+            runs = timings(request)
+            stats = latency_stats(runs, 1)
+            stats["requests_per_second"] = stats.pop("rows_per_second")
+            results.append({"step": name, **stats})
+    return results
+
+
+RUNNERS = {"train": run_train, "predict": run_predict, "classify": run_classify, "planets": run_planets}
+
+
+# =========================
+# Orquestación (proceso padre)
+# =========================
+
+def metadata():
+    """Commit, versiones y máquina para poder comparar resultados"""
+    import numpy
+    import pandas
+    import sklearn
+
+    def git(*args):
+        try:
+            return subprocess.run(["git", *args], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+        except OSError:
+            return ""
+
+    return {
+        "commit": git("rev-parse", "--short", "HEAD"),
+        "dirty": bool(git("status", "--porcelain", "--untracked-files=no")),
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": numpy.__version__,
+        "pandas": pandas.__version__,
+        "sklearn": sklearn.__version__,
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count()
+    }
+
+
+def bench_database_ready():
+    """Crea BENCH_DB_NAME si no existe; False si no hay PostgreSQL"""
+    from app.db import DB_CONFIG
+    import psycopg2
+
+    try:
+        conn = psycopg2.connect(**DB_CONFIG)
+    except psycopg2.Error as e:
+        print(f"⚠️ Sin PostgreSQL, se omite 'planets': {e}".strip())
+        return False
+    try:
+        conn.autocommit = True
+        cur = conn.cursor()
+        cur.execute("SELECT 1 FROM pg_database WHERE datname = %s", (BENCH_DB_NAME,))
+        if cur.fetchone() is None:
+            cur.execute(f"CREATE DATABASE {BENCH_DB_NAME}")
+        return True
+    except psycopg2.Error as e:
+        print(f"⚠️ No se pudo crear la base {BENCH_DB_NAME}, se omite 'planets': {e}".strip())
+        return False
+    finally:
+        conn.close()
+
+
+def run_child(case, params, env, timeout):
+    """Ejecuta un caso en un intérprete nuevo y devuelve sus resultados"""
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.suite", "--child", case, json.dumps(params)],
+        cwd=ROOT, env=env, capture_output=True, text=True, timeout=timeout
+    )
+    if output.returncode != 0:
+        raise RuntimeError(output.stderr.strip().splitlines()[-1] if output.stderr.strip() else "error")
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def run_suite(args):
+    meta = metadata()
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        # Los catálogos, modelos y trabajos del benchmark no tocan los del repo;
+        # la caché de predicciones se desactiva para medir la inferencia
+        env = dict(os.environ, CATALOG_CACHE_DIR=os.path.join(tmp, "cache"),
+                   MODEL_REGISTRY_DIR=os.path.join(tmp, "registry"), JOBS_DIR=os.path.join(tmp, "jobs"))
+        env.setdefault("PREDICTION_CACHE", "off")
+        planets_env = dict(env, DB_NAME=BENCH_DB_NAME)
+        use_db = "planets" in args.cases and bench_database_ready()
+
+        for rows in args.sizes:
+            for mission in args.missions:
+                csv_path = write_csv(MISSION_FRAMES[mission](rows, extra_cols=args.extra_cols),
+                                     os.path.join(tmp, f"{mission}_{rows}.csv"))
+                plan = []
+                if "train" in args.cases:
+                    plan.append(("train", env))
+                if mission == "Kepler" and "predict" in args.cases:
+                    plan.append(("predict", env))
+                if mission == "Kepler" and "classify" in args.cases:
+                    plan.append(("classify", env))
+                if "planets" in args.cases and use_db:
+                    plan.append(("planets", planets_env))
+
+                for case, case_env in plan:
+                    params = {"mission": mission, "rows": rows, "csv": csv_path, "model": args.model}
+                    label = f"{case:9s} {mission:6s} {rows:>9,d} filas"
+                    try:
+                        measured = run_child(case, params, case_env, args.timeout)
+                    except (RuntimeError, subprocess.TimeoutExpired) as e:
+                        print(f"❌ {label}: {e}")
+                        results.append({"case": case, "mission": mission, "rows": rows, "error": str(e)})
+                        continue
+                    for result in measured:
+                        results.append({"case": case, "mission": mission, "rows": rows, **result})
+                        print(f"✅ {label}  {describe(result)}")
+                os.remove(csv_path)
+
+    out = args.out or os.path.join(RESULTS_DIR, f"{meta['commit'] or 'local'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump({"meta": meta, "results": results}, f, indent=2)
+    print(f"💾 Resultados en {out}")
+
+
+def describe(result):
+    parts = [f"{k}={result[k]}" for k in ("engine", "batch", "format", "step") if k in result]
+    parts.append(f"{result['seconds'] * 1000:.2f} ms")
+    if "rows_per_second" in result:
+        parts.append(f"{result['rows_per_second']:,.0f} filas/s")
+    if "requests_per_second" in result:
+        parts.append(f"{result['requests_per_second']:,.0f} req/s")
+    for key in ("peak_alloc_mb", "rss_growth_mb", "peak_rss_mb"):
+        if key in result:
+            parts.append(f"{key}={result[key]:.1f}")
+            break
+    return "  ".join(parts)
+
+
+# Campos que identifican un resultado al comparar dos ejecuciones
+KEY_FIELDS = ("case", "mission", "rows", "engine", "batch", "format", "step")
+
+
+def compare(base_path, new_path, threshold=REGRESSION_THRESHOLD):
+    """Tabla de tiempos entre dos ejecuciones; devuelve el número de regresiones"""
+    with open(base_path) as f:
+        base = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+
+    def index(run):
+        return {tuple(r.get(k) for k in KEY_FIELDS): r for r in run["results"] if "seconds" in r}
+
+    old_results = index(base)
+    regressions = 0
+    print(f"{base['meta']['commit']} -> {new['meta']['commit']}")
+    for key, result in index(new).items():
+        if key not in old_results:
+            continue
+        ratio = result["seconds"] / old_results[key]["seconds"]
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "  ⚠️ regresión"
+            regressions += 1
+        name = " ".join(str(v) for v in key if v is not None)
+        print(f"{name:50s} {old_results[key]['seconds'] * 1000:10.2f} ms -> "
+              f"{result['seconds'] * 1000:10.2f} ms  x{ratio:.2f}{flag}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--cases", nargs="+", choices=CASES, default=CASES)
+    parser.add_argument("--missions", nargs="+", choices=list(MISSION_FRAMES), default=list(MISSION_FRAMES))
+    parser.add_argument("--extra-cols", type=int, default=0)
+    parser.add_argument("--model", default="models/exoplanet_model.pkl")
+    parser.add_argument("--timeout", type=float, default=3600, help="Segundos por caso")
+    parser.add_argument("--out", help="Archivo JSON (por defecto benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "NUEVO"))
+    parser.add_argument("--child", nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        case, params = args.child
+        print(json.dumps(RUNNERS[case](json.loads(params))))
+    elif args.compare:
+        sys.exit(1 if compare(*args.compare) else 0)
+    else:
+        run_suite(args)
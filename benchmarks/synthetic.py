@@ -0,0 +1,104 @@
+"""
+Generador de catálogos sintéticos con la forma de los CSV de la NASA
+(mismo espíritu que entrenar_local.py)
+"""
+import numpy as np
+import pandas as pd
+
+
+def kepler_frame(n_rows, extra_cols=0, seed=42):
+    """
+    DataFrame tipo KOI: identificadores, disposición, las columnas del modelo
+    y 'extra_cols' columnas numéricas de relleno (el KOI real tiene ~140)
+    """
+    rng = np.random.default_rng(seed)
+    real = rng.random(n_rows) < 0.5
+    disposition = np.where(real, rng.choice(["CONFIRMED", "CANDIDATE"], n_rows), "FALSE POSITIVE")
+
+    df = pd.DataFrame({
+        "kepid": rng.integers(10_000_000, 13_000_000, n_rows),
+        "kepoi_name": [f"K{i:08d}.01" for i in range(n_rows)],
+        "koi_disposition": disposition,
+        "koi_period": np.where(real, rng.uniform(50, 400, n_rows), rng.uniform(1, 50, n_rows)),
+        "koi_prad": np.where(real, rng.uniform(0.5, 4, n_rows), rng.uniform(4, 20, n_rows)),
+        "koi_teq": np.where(real, rng.uniform(300, 800, n_rows), rng.uniform(800, 2000, n_rows)),
+        "koi_steff": rng.uniform(4000, 6500, n_rows),
+        "koi_slogg": rng.uniform(4.0, 4.8, n_rows),
+        "koi_srad": rng.uniform(0.7, 1.5, n_rows),
+        "koi_smass": rng.uniform(0.7, 1.3, n_rows)
+    })
+
+    extra = {}
+    for i in range(extra_cols):
+        values = rng.normal(size=n_rows)
+        values[rng.random(n_rows) < 0.1] = np.nan
+        extra[f"koi_extra_{i:03d}"] = values
+    return pd.concat([df, pd.DataFrame(extra)], axis=1) if extra else df
+
+
+def _planet_columns(rng, n_rows):
+    """Disposición y parámetros físicos con la misma separación que kepler_frame"""
+    real = rng.random(n_rows) < 0.5
+    disposition = np.where(real, rng.choice(["CONFIRMED", "CANDIDATE"], n_rows), "FALSE POSITIVE")
+    physical = {
+        "pl_orbper": np.where(real, rng.uniform(50, 400, n_rows), rng.uniform(1, 50, n_rows)),
+        "pl_rade": np.where(real, rng.uniform(0.5, 4, n_rows), rng.uniform(4, 20, n_rows)),
+        "pl_eqt": np.where(real, rng.uniform(300, 800, n_rows), rng.uniform(800, 2000, n_rows)),
+        "st_teff": rng.uniform(4000, 6500, n_rows),
+        "st_logg": rng.uniform(4.0, 4.8, n_rows),
+        "st_rad": rng.uniform(0.7, 1.5, n_rows)
+    }
+    return disposition, physical
+
+
+def _extra_columns(rng, n_rows, extra_cols, prefix):
+    extra = {}
+    for i in range(extra_cols):
+        values = rng.normal(size=n_rows)
+        values[rng.random(n_rows) < 0.1] = np.nan
+        extra[f"{prefix}extra_{i:03d}"] = values
+    return pd.DataFrame(extra)
+
+
+def k2_frame(n_rows, extra_cols=0, seed=42):
+    """DataFrame con las columnas del catálogo K2 (k2pandc)"""
+    rng = np.random.default_rng(seed)
+    disposition, physical = _planet_columns(rng, n_rows)
+    df = pd.DataFrame({
+        "pl_name": [f"K2-{i} b" for i in range(n_rows)],
+        "hostname": [f"K2-{i}" for i in range(n_rows)],
+        "disposition": disposition,
+        **physical,
+        "st_mass": rng.uniform(0.7, 1.3, n_rows),
+        "sy_dist": rng.uniform(10, 1000, n_rows),
+        "disc_year": rng.integers(2014, 2025, n_rows)
+    })
+    return pd.concat([df, _extra_columns(rng, n_rows, extra_cols, "pl_")], axis=1) if extra_cols else df
+
+
+def tess_frame(n_rows, extra_cols=0, seed=42):
+    """DataFrame con las columnas del catálogo TOI de TESS"""
+    rng = np.random.default_rng(seed)
+    disposition, physical = _planet_columns(rng, n_rows)
+    created = pd.Timestamp("2018-07-01") + pd.to_timedelta(rng.integers(0, 2500, n_rows), unit="D")
+    df = pd.DataFrame({
+        "toi": [f"{100 + i}.01" for i in range(n_rows)],
+        "tid": rng.integers(1_000_000, 500_000_000, n_rows),
+        "tfopwg_disp": disposition,
+        **physical,
+        "toi_created": created.strftime("%Y-%m-%d")
+    })
+    return pd.concat([df, _extra_columns(rng, n_rows, extra_cols, "pl_")], axis=1) if extra_cols else df
+
+
+# Generador de cada misión (mismos nombres que detecta app.missions)
+MISSION_FRAMES = {"Kepler": kepler_frame, "K2": k2_frame, "TESS": tess_frame}
+
+
+def write_csv(df, path, comment_lines=3):
+    """Escribe el CSV con cabecera de comentarios '#' como los exports de la NASA"""
+    with open(path, "w") as f:
+        for i in range(comment_lines):
+            f.write(f"# Synthetic NASA export, line {i}\n")
+        df.to_csv(f, index=False)
+    return path
@@ -1,11 +1,16 @@
-from fastapi import FastAPI, Request, HTTPException
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi import FastAPI, Request, HTTPException, Query
+from fastapi.responses import HTMLResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-import asyncpg
+from app import db
+from app.metrics import ProfileMiddleware, RequestMetricsMiddleware
 import os
 app = FastAPI()
 
+# Peticiones por ruta en /api/metrics y perfil opcional (PROFILE_ENABLED=1 y X-Profile: 1)
+app.add_middleware(ProfileMiddleware)
+app.add_middleware(RequestMetricsMiddleware)
+
 # Monta los archivos estáticos
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
@@ -13,9 +18,37 @@ app.mount("/static", StaticFiles(directory="static"), name="static")
 templates = Jinja2Templates(directory="templates")
 
 # Importa e incluye las rutas - CORREGIDO
-from app.routes import router
+from app import batch, jobs
+from app.routes import router, read_planets, scheduler, watcher
 app.include_router(router, prefix="/api")
 
+# Pool de PostgreSQL: se abre al arrancar y se cierra al apagar
+@app.on_event("startup")
+async def open_db_pool():
+    try:
+        await db.init_pool()
+        print("✅ Pool de PostgreSQL listo")
+    except Exception as e:
+        print(f"❌ Error creando pool de PostgreSQL: {e}")
+        # Se reintenta en la primera consulta
+
+@app.on_event("shutdown")
+async def close_db_pool():
+    await db.close_pool()
+
+# Modelo (con recarga desde el registro) y planificador de inferencia por lotes
+@app.on_event("startup")
+async def start_scheduler():
+    await watcher.start()
+    await scheduler.start()
+
+@app.on_event("shutdown")
+async def stop_scheduler():
+    await scheduler.stop()
+    await watcher.stop()
+    jobs.shutdown()
+    batch.shutdown()
+
 # Endpoint para el dashboard
 @app.get("/", response_class=HTMLResponse)
 async def read_index(request: Request):
@@ -34,37 +67,21 @@ if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
 @app.get("/planets/{dataset}")
-async def get_planets(dataset: str, limit: int = 50):
+async def get_planets(dataset: str, limit: int = Query(50, ge=1, le=1000)):
     """
     Endpoint para la página de database - conecta con PostgreSQL
     """
+    if dataset not in ['kepler', 'k2planets', 'tess']:
+        raise HTTPException(status_code=404, detail="Dataset no encontrado")
+
     try:
-        # Aquí va tu lógica para conectar con PostgreSQL
-        # Por ahora devuelve datos de ejemplo
-        
-        if dataset not in ['kepler', 'k2planets', 'tess']:
-            raise HTTPException(status_code=404, detail="Dataset no encontrado")
-        
-        # Datos de ejemplo - reemplaza con tu conexión real a PostgreSQL
-        sample_data = [
-            {
-                "kepler_name": f"KEPLER-{i}",
-                "kepoi_name": f"K{i}",
-                "kepid": f"KIC{1000000 + i}",
-                "koi_disposition": "CONFIRMED",
-                "koi_period": 100 + i,
-                "koi_prad": 2.5,
-                "koi_teq": 500,
-                "koi_steff": 6000
-            } for i in range(min(limit, 10))
-        ]
-        
-        return JSONResponse({
-            "data": sample_data,
-            "total": len(sample_data),
-            "dataset": dataset
-        })
-        
+        # read_planets es una ruta de FastAPI: llamada directamente, los
+        # parámetros opcionales valdrían su Query(...) y no None
+        return await read_planets(dataset, limit, after=None, disposition=None,
+                                  period_min=None, period_max=None,
+                                  radius_min=None, radius_max=None, crossmatch=None)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
 
@@ -1,22 +1,115 @@
 const API_BASE = 'http://127.0.0.1:8000';  // FastAPI usa el mismo puerto
 
+// Estado de la paginación por cursor
+let currentDataset = null;
+let nextAfter = null;
+let loadedPlanets = [];
+
 async function loadPlanets() {
     const datasetSelect = document.getElementById('datasetSelect');
-    const limitInput = document.getElementById('limitInput');
     const selectedDataset = datasetSelect.value;
-    const limit = parseInt(limitInput.value) || 50;
     
     if (!selectedDataset) {
         showError('Por favor selecciona un dataset');
         return;
     }
 
+    // Nueva consulta: empezar desde la primera página
+    currentDataset = selectedDataset;
+    nextAfter = null;
+    loadedPlanets = [];
     showLoading();
+    await Promise.all([fetchPage(), loadSummary(selectedDataset)]);
+}
+
+// Resumen precalculado del dataset (el navegador revalida con ETag)
+const HISTOGRAM_TITLES = {
+    period: 'Periodo orbital (días)',
+    radius: 'Radio (R⊕)',
+    teq: 'Temperatura de equilibrio (K)',
+    teff: 'Temperatura estelar (K)'
+};
+
+async function loadSummary(dataset) {
+    const container = document.getElementById('summaryContainer');
+    try {
+        const response = await fetch(`${API_BASE}/api/planets/${dataset}/summary`);
+        if (!response.ok) {
+            throw new Error(`Error ${response.status}`);
+        }
+        const summary = await response.json();
+        // Si mientras tanto se eligió otro dataset no se pinta
+        if (dataset !== currentDataset) {
+            return;
+        }
+        displaySummary(summary);
+    } catch (error) {
+        container.classList.add('hidden');
+        console.error('Error cargando el resumen:', error);
+    }
+}
+
+function displaySummary(summary) {
+    const container = document.getElementById('summaryContainer');
+    const dispositions = Object.entries(summary.dispositions)
+        .sort((a, b) => b[1] - a[1])
+        .map(([label, count]) => `<p><strong>${label}:</strong> ${count}</p>`)
+        .join('');
+
+    const histograms = Object.entries(summary.histograms)
+        .map(([name, hist]) => renderHistogram(HISTOGRAM_TITLES[name] || name, hist.counts))
+        .join('');
+
+    const years = Object.keys(summary.discovery_years).sort();
+    const yearChart = years.length
+        ? renderHistogram('Descubrimientos por año', years.map(year => summary.discovery_years[year]), years)
+        : '';
+
+    container.innerHTML = `
+        <div class="summary-card">
+            <h3>${summary.rows} filas</h3>
+            ${dispositions}
+        </div>
+        ${histograms}
+        ${yearChart}
+    `;
+    container.classList.remove('hidden');
+}
+
+function renderHistogram(title, counts, labels = null) {
+    const max = Math.max(1, ...counts);
+    const bars = counts.map((count, i) => `
+        <div class="summary-bar" style="height: ${(100 * count / max).toFixed(1)}%"
+             title="${labels ? labels[i] + ': ' : ''}${count}"></div>
+    `).join('');
+    return `
+        <div class="summary-card">
+            <h3>${title}</h3>
+            <div class="summary-histogram">${bars}</div>
+        </div>
+    `;
+}
+
+async function loadMorePlanets() {
+    if (!currentDataset || !nextAfter) {
+        return;
+    }
+    await fetchPage();
+}
+
+async function fetchPage() {
+    const limitInput = document.getElementById('limitInput');
+    const limit = parseInt(limitInput.value) || 50;
+
     hideError();
 
     try {
-        // Asumiendo que tu endpoint API es /planets/{dataset}
-        const response = await fetch(`${API_BASE}/planets/${selectedDataset}?limit=${limit}`);
+        const params = new URLSearchParams({ limit: limit });
+        if (nextAfter !== null) {
+            params.set('after', nextAfter);
+        }
+
+        const response = await fetch(`${API_BASE}/api/planets/${currentDataset}?${params}`);
         
         if (!response.ok) {
             throw new Error(`Error ${response.status}: ${response.statusText}`);
@@ -28,13 +121,16 @@ async function loadPlanets() {
             throw new Error(result.error);
         }
 
-        displayPlanets(result.data, selectedDataset, result.total);
+        loadedPlanets = loadedPlanets.concat(result.data);
+        nextAfter = result.next_after;
+        displayPlanets(loadedPlanets, currentDataset, loadedPlanets.length);
         
     } catch (error) {
         showError('Error cargando datos: ' + error.message);
         console.error('Error:', error);
     } finally {
         hideLoading();
+        document.getElementById('loadMoreBtn').classList.toggle('hidden', !nextAfter);
     }
 }
 
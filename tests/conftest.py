@@ -0,0 +1,65 @@
+"""
+Fixtures compartidas. Las pruebas no necesitan PostgreSQL: app.db lee
+DB_NAME al importarse y aquí se apunta a una base propia por si algún
+módulo llega a conectarse, para no tocar nunca la de desarrollo.
+"""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("DB_NAME", "exoplanets_test")
+sys.path.insert(0, ROOT)
+
+import pytest  # noqa: E402
+
+from app import columnar, features, jobs, registry  # noqa: E402
+
+# Directorios que la app escribe (caches, registro y trabajos)
+ARTIFACT_DIRS = [
+    (columnar, "CACHE_DIR"), (features, "STORE_DIR"), (jobs, "JOBS_DIR"), (registry, "REGISTRY_DIR")
+]
+
+
+@pytest.fixture(scope="session", autouse=True)
+def artifact_dirs(tmp_path_factory):
+    """Todo lo que la app guarda en disco va a un directorio temporal, no al repo"""
+    base = tmp_path_factory.mktemp("artifacts")
+    with pytest.MonkeyPatch.context() as patch:
+        for module, name in ARTIFACT_DIRS:
+            patch.setattr(module, name, str(base / name.lower()))
+        yield base
+
+
+@pytest.fixture
+def client(monkeypatch):
+    """TestClient de main.app sin startup (no abre el pool ni el watcher)"""
+    from fastapi.testclient import TestClient
+
+    monkeypatch.chdir(ROOT)
+    import main
+    return TestClient(main.app)
+
+
+TRAIN_ROWS = 2_000
+
+
+def train_kepler(csv_path, seed):
+    """Modelo de Kepler entrenado con un CSV sintético"""
+    from app.ml import ExoplanetModel
+    from benchmarks.synthetic import kepler_frame
+
+    kepler_frame(TRAIN_ROWS, seed=seed).to_csv(csv_path, index=False)
+    model = ExoplanetModel()
+    metrics = model.train_model(str(csv_path))
+    return model, metrics
+
+
+@pytest.fixture(scope="session")
+def kepler_model(tmp_path_factory, artifact_dirs):
+    return train_kepler(tmp_path_factory.mktemp("train") / "kepler.csv", seed=1)
+
+
+@pytest.fixture
+def train_model():
+    """train_kepler para las pruebas que necesitan otro modelo"""
+    return train_kepler
@@ -0,0 +1,103 @@
+import numpy as np
+
+from app.crossmatch import (chord, match_groups, match_pairs, periods_compatible, separation_arcsec,
+                            unit_vectors)
+from app.planets import build_planets_query
+
+ARCSEC_DEG = 1 / 3600
+TESS_TYPES = {"toi": "double precision", "tid": "bigint", "tfopwg_disp": "text", "pl_orbper": "text"}
+
+
+def catalogs():
+    """Un objeto en las tres misiones, uno en Kepler y TESS, y objetos sin pareja"""
+    return {
+        "kepler": (np.array(["K1", "K2", "K3", "K4"], dtype=object),
+                   np.array([10.0, 50.0, 80.0, 120.0]), np.array([20.0, -5.0, 45.0, 0.0]),
+                   np.array([3.5, 12.0, 7.0, 1.0])),
+        "k2planets": (np.array(["E1", "E2"], dtype=object),
+                      np.array([10.0 + ARCSEC_DEG, 200.0]), np.array([20.0, 10.0]), np.array([3.51, 4.0])),
+        "tess": (np.array(["T1", "T2", "T3", "T4"], dtype=object),
+                 np.array([10.0, 50.0, 80.0, np.nan]), np.array([20.0 + ARCSEC_DEG, -5.0 + 2 * ARCSEC_DEG, 45.0, 0.0]),
+                 # T3 en la posición de K3 pero con otro periodo (otro planeta)
+                 np.array([3.49, 12.05, 2.0, 1.0]))
+    }
+
+
+def test_groups_across_missions():
+    groups = match_groups(catalogs())
+    rows = {(d, o): i for i, (d, o) in enumerate(zip(groups["dataset"], groups["object_id"]))}
+    assert set(rows) == {("kepler", "K1"), ("k2planets", "E1"), ("tess", "T1"),
+                         ("kepler", "K2"), ("tess", "T2")}
+
+    first = rows[("k2planets", "E1")]
+    assert groups["group_id"][first] == "Kepler:K1"
+    assert groups["group_size"][first] == 3
+    assert groups["group_missions"][first] == "Kepler+K2+TESS"
+    assert groups["is_primary"][rows[("kepler", "K1")]]
+    assert not groups["is_primary"][first]
+    assert abs(groups["separation_arcsec"][first] - np.cos(np.radians(20))) < 1e-3
+
+    second = rows[("tess", "T2")]
+    assert groups["group_id"][second] == "Kepler:K2"
+    assert groups["group_missions"][second] == "Kepler+TESS"
+    assert abs(groups["separation_arcsec"][second] - 2) < 1e-3
+
+
+def test_primary_prefers_kepler_then_k2():
+    data = catalogs()
+    del data["kepler"]
+    groups = match_groups(data)
+    assert set(groups["group_id"]) == {"K2:E1"}
+    assert groups["is_primary"][groups["dataset"] == "k2planets"].all()
+
+
+def test_same_catalog_is_never_paired():
+    ra = np.array([10.0, 10.0, 10.0])
+    dec = np.array([20.0, 20.0, 20.0 + 10 * ARCSEC_DEG])
+    pairs = match_pairs(unit_vectors(ra, dec), np.array([0, 0, 1]), np.array([3.0, 3.0, 3.0]), radius_arcsec=3)
+    assert len(pairs) == 0
+    pairs = match_pairs(unit_vectors(ra, dec), np.array([0, 1, 1]), np.array([3.0, 3.0, 3.0]), radius_arcsec=3)
+    assert sorted(map(tuple, pairs.tolist())) == [(0, 1)]
+
+
+def test_kd_tree_matches_brute_force():
+    rng = np.random.default_rng(0)
+    n = 600
+    ra = rng.uniform(0, 1, n)
+    dec = rng.uniform(-0.5, 0.5, n)
+    # Un tercio de los objetos repetidos en otro catálogo a menos de 2"
+    copies = rng.choice(n, n // 3, replace=False)
+    ra = np.r_[ra, ra[copies] + rng.uniform(-1, 1, len(copies)) * ARCSEC_DEG]
+    dec = np.r_[dec, dec[copies] + rng.uniform(-1, 1, len(copies)) * ARCSEC_DEG]
+    catalog = np.r_[rng.integers(0, 2, n), np.full(len(copies), 2)]
+    period = np.r_[rng.uniform(1, 100, n), np.zeros(len(copies))]
+    period[n:] = period[copies] * rng.choice([1.0, 1.5], len(copies))
+
+    vectors = unit_vectors(ra, dec)
+    pairs = {tuple(sorted(p)) for p in match_pairs(vectors, catalog, period, radius_arcsec=3).tolist()}
+
+    i, j = np.triu_indices(len(ra), k=1)
+    close = separation_arcsec(vectors[i], vectors[j]) < 3
+    keep = close & (catalog[i] != catalog[j]) & periods_compatible(period[i], period[j])
+    assert pairs == set(zip(i[keep].tolist(), j[keep].tolist()))
+    assert len(pairs) > 0
+
+
+def test_chord_and_periods():
+    a, b = unit_vectors(np.array([0.0]), np.array([0.0])), unit_vectors(np.array([0.0]), np.array([ARCSEC_DEG]))
+    assert abs(np.linalg.norm(a - b) - chord(1)) < 1e-15
+    assert periods_compatible(np.array([100.0]), np.array([100.9]))[0]
+    assert not periods_compatible(np.array([100.0]), np.array([101.5]))[0]
+    assert not periods_compatible(np.array([np.nan]), np.array([1.0]))[0]
+
+
+def test_crossmatch_join_and_dedupe():
+    sql, args = build_planets_query("tess", TESS_TYPES, 10, crossmatch="join")
+    assert "LEFT JOIN crossmatch x ON x.dataset = $1 AND x.object_id = tess_raw.toi::text" in sql
+    assert "x.group_id AS match_group" in sql
+    assert "is_primary IS NOT FALSE" not in sql
+    assert args == ["tess", 10]
+
+    sql, args = build_planets_query("tess", TESS_TYPES, 10, after=5, crossmatch="dedupe")
+    assert " WHERE toi > $1 AND x.is_primary IS NOT FALSE ORDER BY toi, tess_raw.ctid LIMIT $3;" in sql
+    assert args == [5.0, "tess", 10]
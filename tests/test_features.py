@@ -0,0 +1,55 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app import features
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(features, "STORE_DIR", str(tmp_path))
+    monkeypatch.setattr(features, "_tables", {})
+    return tmp_path
+
+
+def frame(ids):
+    data = {"object_id": ids}
+    for name in features.STORED_COLUMNS:
+        data[name] = np.zeros(len(ids), dtype=np.int8 if name in features.INT_COLUMNS else np.float64)
+    return pd.DataFrame(data)
+
+
+def publish(ids, when, monkeypatch):
+    """write_table con el reloj en 'when' (el nombre de la versión empieza por el segundo)"""
+    monkeypatch.setattr(features.time, "time", lambda: float(when))
+    return features.write_table("Kepler", frame(ids), ["kepler.csv"])
+
+
+def test_write_table_keeps_replaced_version_and_staging(store, monkeypatch):
+    mission_dir = store / "Kepler"
+    publish(["b", "a"], 100, monkeypatch)
+    first = features.current_version("Kepler")
+    # Otro proceso escribiendo su versión
+    staging = mission_dir / ".staging-150-other"
+    staging.mkdir()
+
+    publish(["c"], 200, monkeypatch)
+    second = features.current_version("Kepler")
+    # La anterior se conserva: un lector puede haber leído ya el puntero
+    assert (mission_dir / first).is_dir()
+    assert features.open_table("Kepler").ids.tolist() == ["c"]
+
+    publish(["d"], 300, monkeypatch)
+    names = set(os.listdir(mission_dir))
+    assert first not in names
+    assert {second, features.current_version("Kepler"), staging.name, "CURRENT"} <= names
+    assert features.open_table("Kepler").ids.tolist() == ["d"]
+
+
+def test_table_is_sorted_by_id(store, monkeypatch):
+    publish(["b", "c", "a"], 100, monkeypatch)
+    table = features.open_table("Kepler")
+    assert table.ids.tolist() == ["a", "b", "c"]
+    assert table.positions(["c", "z"]).tolist() == [2, -1]
@@ -0,0 +1,148 @@
+import asyncio
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.inference import InferenceScheduler
+
+
+class FakeModel:
+    """Probabilidad = valor de su columna ('a'); un valor negativo hace fallar el predict"""
+    feature_names = ["a"]
+    classes = np.array(["FALSE POSITIVE", "EXOPLANET"])
+
+    def __init__(self):
+        self.batches = []
+
+    def select(self, X):
+        return X[self.feature_names]
+
+    def predict(self, X):
+        self.batches.append(len(X))
+        values = X[self.feature_names[0]].to_numpy(dtype=np.float64)
+        if (values < 0).any():
+            raise ValueError("valor negativo")
+        probabilities = np.column_stack([1 - values, values])
+        return self.classes[np.argmax(probabilities, axis=1)], probabilities
+
+
+def run(model, frames, max_latency=0.05):
+    """Manda las peticiones a la vez; devuelve resultados o excepciones en orden"""
+    async def main():
+        scheduler = InferenceScheduler(lambda: model, max_latency=max_latency, workers=1)
+        await scheduler.start()
+        try:
+            return await asyncio.gather(*(scheduler.predict(X) for X in frames), return_exceptions=True)
+        finally:
+            await scheduler.stop()
+            scheduler.executor.shutdown()
+    return asyncio.run(main())
+
+
+def test_concurrent_requests_share_a_batch():
+    model = FakeModel()
+    frames = [pd.DataFrame({"a": [0.1 * i, 0.05]}) for i in range(5)]
+    results = run(model, frames)
+    assert model.batches == [10]
+    for X, (predictions, probabilities) in zip(frames, results):
+        np.testing.assert_allclose(probabilities[:, 1], X["a"])
+        assert len(predictions) == len(X)
+
+
+def test_missing_columns_only_fail_that_request():
+    model = FakeModel()
+    frames = [pd.DataFrame({"a": [0.9]}), pd.DataFrame({"b": [0.9]}), pd.DataFrame({"a": [0.2]})]
+    results = run(model, frames)
+    assert isinstance(results[1], KeyError)
+    assert results[0][0].tolist() == ["EXOPLANET"]
+    assert results[2][0].tolist() == ["FALSE POSITIVE"]
+    assert model.batches == [2]
+
+
+def test_invalid_value_is_rescored_per_request():
+    model = FakeModel()
+    frames = [pd.DataFrame({"a": [0.9]}), pd.DataFrame({"a": [-1.0]}), pd.DataFrame({"a": [0.3, 0.7]})]
+    results = run(model, frames)
+    assert isinstance(results[1], ValueError)
+    np.testing.assert_allclose(results[0][1][:, 1], [0.9])
+    np.testing.assert_allclose(results[2][1][:, 1], [0.3, 0.7])
+    # Lote entero que falla y luego una predicción por petición
+    assert model.batches == [4, 1, 1, 2]
+
+
+def test_large_request_skips_the_queue():
+    model = FakeModel()
+
+    async def main():
+        scheduler = InferenceScheduler(lambda: model, max_batch_rows=3, workers=1)
+        await scheduler.start()
+        try:
+            return await scheduler.predict(pd.DataFrame({"a": [0.1, 0.2, 0.3]}))
+        finally:
+            await scheduler.stop()
+            scheduler.executor.shutdown()
+
+    _, probabilities = asyncio.run(main())
+    assert probabilities.shape == (3, 2)
+    assert model.batches == [3]
+
+
+def test_without_collector_predicts_directly():
+    model = FakeModel()
+
+    async def main():
+        scheduler = InferenceScheduler(lambda: model, workers=1)
+        try:
+            with pytest.raises(ValueError):
+                await scheduler.predict(pd.DataFrame({"a": [-1.0]}))
+            return await scheduler.predict(pd.DataFrame({"a": [0.6]}))
+        finally:
+            scheduler.executor.shutdown()
+
+    predictions, _ = asyncio.run(main())
+    assert predictions.tolist() == ["EXOPLANET"]
+
+
+def test_each_request_keeps_its_model():
+    # Tras un cambio de versión, las peticiones ya planificadas con el
+    # modelo anterior se predicen con él, en su propio lote
+    old, new = FakeModel(), FakeModel()
+    new.feature_names = ["b"]
+
+    async def main():
+        scheduler = InferenceScheduler(lambda: new, max_latency=0.05, workers=1)
+        await scheduler.start()
+        try:
+            return await asyncio.gather(
+                scheduler.predict(pd.DataFrame({"a": [0.9]}), old),
+                scheduler.predict(pd.DataFrame({"b": [0.2]})),
+                scheduler.predict(pd.DataFrame({"a": [0.1, 0.8]}), old)
+            )
+        finally:
+            await scheduler.stop()
+            scheduler.executor.shutdown()
+
+    results = asyncio.run(main())
+    assert old.batches == [3]
+    assert new.batches == [1]
+    np.testing.assert_allclose(results[2][1][:, 1], [0.1, 0.8])
+
+
+def test_stop_scores_queued_requests():
+    model = FakeModel()
+
+    async def main():
+        scheduler = InferenceScheduler(lambda: model, max_latency=60, workers=1)
+        await scheduler.start()
+        requests = [asyncio.create_task(scheduler.predict(pd.DataFrame({"a": [0.1 * i]}))) for i in range(4)]
+        await asyncio.sleep(0.01)
+        await scheduler.stop()
+        try:
+            return await asyncio.wait_for(asyncio.gather(*requests), 5)
+        finally:
+            scheduler.executor.shutdown()
+
+    results = asyncio.run(main())
+    assert [float(p[0, 1]) for _, p in results] == pytest.approx([0.0, 0.1, 0.2, 0.3])
+    assert sum(model.batches) == 4
@@ -0,0 +1,42 @@
+import numpy as np
+
+from app.kernel import CompiledModel, top_k
+from benchmarks.synthetic import kepler_frame
+
+
+def test_probabilities_match_sklearn(kepler_model):
+    model, _ = kepler_model
+    X = kepler_frame(500, seed=7)[model.feature_names]
+    X.iloc[::9, 0] = np.nan  # los vacíos se rellenan como el imputer
+    expected = model.model.predict_proba(X)
+    np.testing.assert_allclose(model.compiled.predict_proba(X), expected, rtol=1e-9, atol=1e-12)
+
+
+def test_round_trip_keeps_predictions(kepler_model):
+    model, _ = kepler_model
+    X = kepler_frame(200, seed=8)[model.feature_names]
+    restored = CompiledModel.from_dict(model.compiled.to_dict())
+    np.testing.assert_array_equal(restored.predict_proba(X), model.compiled.predict_proba(X))
+    assert restored.feature_names == model.compiled.feature_names
+
+
+def test_contributions_add_up_to_logit(kepler_model):
+    model, _ = kepler_model
+    X = kepler_frame(200, seed=9)[model.feature_names]
+    contributions, base = model.compiled.contributions(X)
+    np.testing.assert_allclose(base + contributions.sum(axis=1), model.compiled.decision_function(X))
+
+    probabilities, top, values = model.compiled.explain(X, 3)
+    np.testing.assert_allclose(probabilities, model.compiled.predict_proba(X))
+    np.testing.assert_array_equal(values, np.take_along_axis(contributions, top, axis=1))
+
+
+def test_top_k_orders_by_magnitude():
+    rng = np.random.default_rng(0)
+    # Pocas columnas (argsort) y muchas (argpartition)
+    for columns in (8, 400):
+        values = rng.normal(size=(50, columns))
+        top = top_k(values, 5)
+        expected = np.argsort(-np.abs(values), axis=1)[:, :5]
+        np.testing.assert_array_equal(top, expected)
+    assert top_k(np.ones((2, 3)), 10).shape == (2, 3)
@@ -0,0 +1,19 @@
+from app.metrics import Counter, Gauge, Histogram, Registry
+
+
+def test_render_names_counter_family_with_total():
+    registry = Registry()
+    registry.register("counter", "exoplanets_rows", "Filas", Counter(), mission="Kepler").inc(3)
+    registry.register("gauge", "exoplanets_pool", "Pool", Gauge(lambda: 2))
+    registry.register("histogram", "exoplanets_span_seconds", "Spans", Histogram([1]), span="a").observe(0.5)
+    lines = registry.render().splitlines()
+
+    assert "# HELP exoplanets_rows_total Filas" in lines
+    assert "# TYPE exoplanets_rows_total counter" in lines
+    assert 'exoplanets_rows_total{mission="Kepler"} 3' in lines
+    assert not any(line.startswith("# TYPE exoplanets_rows ") for line in lines)
+    # Gauges e histogramas conservan su nombre
+    assert "# TYPE exoplanets_pool gauge" in lines
+    assert "exoplanets_pool 2" in lines
+    assert "# TYPE exoplanets_span_seconds histogram" in lines
+    assert 'exoplanets_span_seconds_count{span="a"} 1' in lines
@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app import features
+from app.neighbors import SPACE_COLUMNS, NeighborIndex
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(features, "STORE_DIR", str(tmp_path))
+    monkeypatch.setattr(features, "_tables", {})
+    return tmp_path
+
+
+def confirmed(ids, star_logg):
+    """Planetas confirmados con las mismas coordenadas salvo log g"""
+    data = {"object_id": ids}
+    for name in features.STORED_COLUMNS:
+        data[name] = np.ones(len(ids), dtype=np.int8 if name in features.INT_COLUMNS else np.float64)
+    data["star_logg"] = np.asarray(star_logg, dtype=np.float64)
+    return pd.DataFrame(data)
+
+
+def query_frame(n):
+    return pd.DataFrame({c: np.ones(n) for c in SPACE_COLUMNS})
+
+
+def test_no_complete_confirmed_rows_gives_no_neighbors(store):
+    # Solo una misión ingerida y a sus confirmados les falta log g
+    features.write_table("Kepler", confirmed(["a", "b"], [np.nan, np.nan]), ["kepler.csv"])
+    distances, missions, rows, trees = NeighborIndex().query(query_frame(3), k=2)
+    assert distances.shape == (3, 2)
+    assert np.isinf(distances).all()
+    assert (rows == -1).all()
+    assert missions.tolist() == [[None, None]] * 3
+    assert len(trees["Kepler"]) == 0
+
+
+def test_neighbors_come_from_complete_rows(store):
+    features.write_table("Kepler", confirmed(["a", "b", "c"], [1.0, np.nan, 1.5]), ["kepler.csv"])
+    distances, missions, rows, _ = NeighborIndex().query(query_frame(1), k=3)
+    assert np.isfinite(distances[0, :2]).all() and np.isinf(distances[0, 2])
+    assert missions[0].tolist() == ["Kepler", "Kepler", None]
+    assert rows[0].tolist() == [0, 2, -1]
@@ -0,0 +1,136 @@
+import pytest
+
+from app import db, routes
+from app.planets import (CURSOR_COLUMN, KEY_COLS, FilterError, build_export_query, build_planets_query,
+                         make_cursor, parse_cursor)
+
+KEPLER_TYPES = {
+    "kepid": "bigint", "kepoi_name": "text", "kepler_name": "text", "koi_disposition": "text",
+    "koi_period": "double precision", "koi_prad": "text"
+}
+TESS_TYPES = {"toi": "double precision", "tid": "bigint", "tfopwg_disp": "text", "pl_orbper": "text"}
+
+
+def test_first_page_is_ordered_by_key():
+    sql, args = build_planets_query("kepler", KEPLER_TYPES, 50)
+    assert sql.endswith(" FROM kepler_raw WHERE kepoi_name IS NOT NULL ORDER BY kepoi_name, kepler_raw.ctid LIMIT $1;")
+    assert f"kepler_raw.ctid::text AS {CURSOR_COLUMN}" in sql
+    assert args == [50]
+    # Solo las columnas útiles que tiene la tabla
+    assert "koi_teq" not in sql
+    assert "koi_period::double precision AS koi_period" in sql
+
+
+def test_cursor_continues_after_the_key_and_ctid():
+    sql, args = build_planets_query("kepler", KEPLER_TYPES, 10, after=make_cursor("K00001.01", "(3,7)"))
+    assert (" WHERE kepoi_name >= $1 AND (kepoi_name > $1 OR kepler_raw.ctid > $2::text::tid)"
+            " ORDER BY kepoi_name, kepler_raw.ctid LIMIT $3;") in sql
+    assert args == ["K00001.01", "(3,7)", 10]
+
+    # Un cursor con solo la clave sigue valiendo
+    sql, args = build_planets_query("kepler", KEPLER_TYPES, 10, after="K00001.01")
+    assert " WHERE kepoi_name > $1 ORDER BY" in sql
+    assert args == ["K00001.01", 10]
+
+
+def test_parse_cursor():
+    assert parse_cursor("K2-18 b@(0,12)") == ("K2-18 b", "(0,12)")
+    assert parse_cursor("a@b@(1,2)") == ("a@b", "(1,2)")
+    assert parse_cursor("K2-18 b") == ("K2-18 b", None)
+
+
+def test_numeric_key_cursor_is_a_number():
+    _, args = build_planets_query("tess", TESS_TYPES, 10, after="101.01@(0,1)")
+    assert args == [101.01, "(0,1)", 10]
+    with pytest.raises(ValueError):
+        build_planets_query("tess", TESS_TYPES, 10, after="TOI-101@(0,1)")
+
+
+def test_filters_share_the_parameter_list():
+    sql, args = build_planets_query("kepler", KEPLER_TYPES, 20, after="K1", disposition="confirmed",
+                                    period_min=1, radius_max="4.5")
+    assert "kepoi_name > $1" in sql
+    assert "koi_disposition = $2" in sql
+    assert "koi_period::double precision >= $3" in sql
+    # Columna de texto: se valida que sea un número antes de convertirla
+    assert "THEN koi_prad::text::double precision END) <= $4" in sql
+    assert args == ["K1", "CONFIRMED", 1.0, 4.5, 20]
+
+
+def test_filter_on_missing_column_is_rejected():
+    with pytest.raises(FilterError, match="koi_prad"):
+        build_planets_query("kepler", {"kepoi_name": "text"}, 10, radius_min=1)
+    with pytest.raises(FilterError):
+        build_export_query("tess", TESS_TYPES, radius_max=2)
+
+
+# Rutas con la base de datos sustituida por una tabla en memoria. Las claves
+# se repiten (como pl_name en K2) y hay una fila sin clave
+ROUTE_TYPES = {"kepoi_name": "text", "koi_disposition": "text", "koi_period": "double precision"}
+KEPLER_ROWS = [
+    {"kepoi_name": f"K{i // 2:05d}.01" if i != 4 else None, "koi_disposition": "CONFIRMED",
+     "koi_period": float(i), CURSOR_COLUMN: f"(0,{i + 1})"}
+    for i in range(9)
+]
+
+
+def ctid(row):
+    return tuple(int(n) for n in row[CURSOR_COLUMN].strip("()").split(","))
+
+
+@pytest.fixture
+def queries(monkeypatch):
+    """Sustituye la base de datos por KEPLER_ROWS; devuelve las consultas hechas"""
+    queries = []
+
+    async def column_types(dataset):
+        return ROUTE_TYPES if dataset == "kepler" else {}
+
+    async def fetch(sql, *args):
+        # Página de la tabla: cursor (clave, ctid) y LIMIT como último argumento
+        queries.append((sql, args))
+        key = KEY_COLS["kepler"]
+        rows = sorted((r for r in KEPLER_ROWS if r[key] is not None), key=lambda r: (r[key], ctid(r)))
+        if "ctid > $2" in sql:
+            after = (args[0], ctid({CURSOR_COLUMN: args[1]}))
+            rows = [r for r in rows if (r[key], ctid(r)) > after]
+        return [dict(r) for r in rows[:args[-1]]]
+
+    monkeypatch.setattr(routes, "get_column_types", column_types)
+    monkeypatch.setattr(db, "fetch", fetch)
+    return queries
+
+
+def test_cursor_pagination_walks_the_table(client, queries):
+    seen = []
+    after = None
+    while True:
+        params = {"limit": 3, **({"after": after} if after is not None else {})}
+        page = client.get("/api/planets/kepler", params=params).json()
+        seen += [row["kepoi_name"] for row in page["data"]]
+        after = page["next_after"]
+        if after is None:
+            break
+        assert all(CURSOR_COLUMN not in row for row in page["data"])
+    # Las filas con la misma clave no se saltan entre páginas
+    assert seen == [row["kepoi_name"] for row in KEPLER_ROWS if row["kepoi_name"] is not None]
+
+
+def test_dashboard_route_uses_defaults(client, queries):
+    response = client.get("/planets/kepler", params={"limit": 2})
+    assert response.status_code == 200
+    assert response.json()["next_after"] == "K00000.01@(0,2)"
+    sql, args = queries[-1]
+    assert " WHERE kepoi_name IS NOT NULL ORDER BY" in sql
+    assert args == (2,)
+
+
+def test_errors_keep_their_status(client, queries):
+    assert client.get("/planets/kepler", params={"limit": 5000}).status_code == 422
+    assert client.get("/planets/tess").status_code == 404
+    assert client.get("/planets/mars").status_code == 404
+    response = client.get("/api/planets/kepler", params={"radius_min": 1})
+    assert response.status_code == 400
+    assert "koi_prad" in response.json()["detail"]
+    assert queries == []
+
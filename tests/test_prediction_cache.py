@@ -0,0 +1,126 @@
+import numpy as np
+import pandas as pd
+
+from app.prediction_cache import PredictionCache, _MemoryTier, row_hashes
+
+
+def keys(*values):
+    return np.array(values, dtype=np.uint64)
+
+
+def probs(values):
+    values = np.asarray(values, dtype=np.float64)
+    return np.column_stack([1 - values, values])
+
+
+def test_hits_and_misses():
+    tier = _MemoryTier(max_entries=100, ttl=60)
+    tier.put(keys(1, 2, 3), probs([0.1, 0.2, 0.3]), now=0)
+    hit, found = tier.get(keys(3, 4, 1), now=1)
+    assert hit.tolist() == [True, False, True]
+    np.testing.assert_allclose(found[:, 1], [0.3, 0.1])
+    assert len(tier) == 3
+
+
+def test_entries_expire_after_ttl():
+    tier = _MemoryTier(max_entries=100, ttl=10)
+    tier.put(keys(1), probs([0.5]), now=0)
+    assert tier.get(keys(1), now=9)[0].tolist() == [True]
+    assert tier.get(keys(1), now=10)[0].tolist() == [False]
+    # Volver a guardarla renueva el TTL
+    tier.put(keys(1), probs([0.6]), now=10)
+    hit, found = tier.get(keys(1), now=15)
+    assert hit.tolist() == [True]
+    np.testing.assert_allclose(found[:, 1], [0.6])
+
+
+def test_last_write_wins():
+    tier = _MemoryTier(max_entries=100, ttl=60)
+    tier.put(keys(7, 7, 8), probs([0.1, 0.9, 0.4]), now=0)
+    tier.put(keys(8), probs([0.5]), now=0)
+    _, found = tier.get(keys(7, 8), now=1)
+    np.testing.assert_allclose(found[:, 1], [0.9, 0.5])
+    assert len(tier) == 2
+
+
+def test_evicts_least_recently_used():
+    tier = _MemoryTier(max_entries=8, ttl=60)
+    tier.put(np.arange(8, dtype=np.uint64), probs([0.5] * 8), now=0)
+    # Las claves 0 y 1 se usan después: deben sobrevivir al desalojo
+    tier.get(keys(0, 1), now=1)
+    tier.put(keys(100, 101), probs([0.1, 0.2]), now=2)
+    assert len(tier) <= 8
+    hit, _ = tier.get(np.arange(8, dtype=np.uint64), now=3)
+    assert hit[:2].all()
+    assert not hit[2:4].all()
+    assert tier.get(keys(100, 101), now=3)[0].all()
+
+
+def test_many_keys_match_a_dict():
+    rng = np.random.default_rng(0)
+    tier = _MemoryTier(max_entries=50_000, ttl=1e9)
+    reference = {}
+    for step in range(20):
+        batch = rng.integers(0, 2**63, 2_000, dtype=np.uint64)
+        if reference:
+            # Una parte del lote ya está en la tabla
+            batch[:500] = rng.choice(np.fromiter(reference, dtype=np.uint64), 500)
+        values = rng.random(len(batch))
+        tier.put(batch, probs(values), now=step)
+        reference.update(zip(batch.tolist(), values.tolist()))
+    queried = np.fromiter(reference, dtype=np.uint64)
+    hit, found = tier.get(queried, now=100)
+    assert hit.all()
+    np.testing.assert_allclose(found[:, 1], [reference[k] for k in queried.tolist()])
+    assert len(tier) == len(reference)
+
+
+def test_clear_empties_the_table():
+    tier = _MemoryTier(max_entries=100, ttl=60)
+    tier.put(keys(1, 2), probs([0.1, 0.2]), now=0)
+    tier.clear()
+    assert len(tier) == 0
+    assert not tier.get(keys(1, 2), now=1)[0].any()
+
+
+def test_row_hashes_normalize_numbers():
+    ints = pd.DataFrame({"a": [5200, 3], "b": ["x", "y"]})
+    floats = pd.DataFrame({"a": [5200.0, 3.0], "b": ["x", "y"]})
+    np.testing.assert_array_equal(row_hashes(ints, "ab12"), row_hashes(floats, "ab12"))
+    assert (row_hashes(ints, "ab12") != row_hashes(ints, "cd34")).all()
+
+
+class CountingModel:
+    feature_names = ["a"]
+    classes = np.array([0, 1])
+    compiled = None
+
+    def __init__(self, version):
+        self.version = version
+        self.rows = 0
+
+    def select(self, X):
+        return X[self.feature_names]
+
+    def predict(self, X):
+        self.rows += len(X)
+        values = X["a"].to_numpy(dtype=np.float64)
+        probabilities = np.column_stack([1 - values, values])
+        return self.classes[np.argmax(probabilities, axis=1)], probabilities
+
+
+def test_cache_only_predicts_unseen_rows():
+    cache = PredictionCache(mode="on", max_entries=1_000, ttl=60, disk_path="")
+    model = CountingModel("aa")
+    first = pd.DataFrame({"a": [0.1, 0.2, 0.3]})
+    cache.predict(model, first)
+    predictions, probabilities = cache.predict(model, pd.DataFrame({"a": [0.3, 0.9, 0.1]}))
+    assert model.rows == 4
+    np.testing.assert_allclose(probabilities[:, 1], [0.3, 0.9, 0.1])
+    assert predictions.tolist() == [0, 1, 0]
+
+    # Otra versión del modelo no reutiliza los resultados
+    other = CountingModel("bb")
+    cache.predict(other, first)
+    assert other.rows == 3
+    assert cache.stats()["misses"] == 7
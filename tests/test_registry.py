@@ -0,0 +1,46 @@
+import pytest
+
+from app import registry
+
+
+@pytest.fixture
+def registry_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(registry, "REGISTRY_DIR", str(tmp_path / "registry"))
+    return tmp_path
+
+
+def test_watcher_swaps_to_new_versions(registry_dir, kepler_model, train_model):
+    first, metrics = kepler_model
+    watcher = registry.ModelWatcher(str(registry_dir / "missing.pkl"))
+    assert watcher.refresh()
+    assert not watcher.model.is_loaded()
+
+    registry.publish(first, metrics)
+    assert registry.active_ref() == f"Kepler/{first.version}"
+    assert watcher.refresh()
+    assert watcher.model.version == first.version
+    assert not watcher.refresh()
+
+    # Una versión nueva sustituye al router; el anterior sigue entero para
+    # las peticiones que ya lo tenían
+    old_router = watcher.model
+    second, metrics = train_model(registry_dir / "kepler.csv", seed=2)
+    registry.publish(second, metrics)
+    assert watcher.refresh()
+    assert watcher.model is not old_router
+    assert watcher.model.version == second.version
+    assert old_router.version == first.version
+
+    # El activo y el de su misión son el mismo objeto
+    assert watcher.model.model_for("Kepler") is watcher.model.default
+
+    # Volver atrás
+    registry.activate("Kepler", first.version)
+    assert watcher.refresh()
+    assert watcher.model.version == first.version
+    assert watcher.model.versions() == {"Kepler": first.version}
+
+
+def test_activate_unknown_version(registry_dir):
+    with pytest.raises(FileNotFoundError):
+        registry.activate("Kepler", "0000")
@@ -0,0 +1,74 @@
+import copy
+from datetime import datetime, timezone
+
+import pytest
+
+from app import routes, summaries
+from app.summaries import SUMMARY_FORMAT, histogram_edges, merge
+
+
+def summary(rows, dispositions, counts, nulls=0, years=None):
+    return {
+        "format": SUMMARY_FORMAT,
+        "rows": rows,
+        "dispositions": dict(dispositions),
+        "discovery_years": dict(years or {}),
+        "histograms": {"period": {"edges": [0.0, 1.0, 2.0], "counts": list(counts), "nulls": nulls}}
+    }
+
+
+def test_merge_adds_and_subtracts():
+    total = summary(10, {"CONFIRMED": 6, "CANDIDATE": 4}, [3, 7], nulls=1, years={"2016": 2})
+    original = copy.deepcopy(total)
+    delta = summary(2, {"CONFIRMED": 1, "FALSE POSITIVE": 1}, [1, 1], years={"2016": 1})
+
+    merge(total, delta)
+    assert total["rows"] == 12
+    assert total["dispositions"] == {"CONFIRMED": 7, "CANDIDATE": 4, "FALSE POSITIVE": 1}
+    assert total["histograms"]["period"]["counts"] == [4, 8]
+
+    # Restar lo sumado deja el resumen como estaba (sin etiquetas a cero)
+    merge(total, delta, sign=-1)
+    assert total == original
+
+
+def test_merge_rejects_different_bins():
+    total = summary(1, {}, [1, 0])
+    other = summary(1, {}, [0, 1])
+    other["histograms"]["period"]["edges"] = [0.0, 2.0, 4.0]
+    with pytest.raises(ValueError):
+        merge(total, other)
+
+    other = summary(1, {}, [0, 1])
+    other["format"] = SUMMARY_FORMAT + 1
+    with pytest.raises(ValueError):
+        merge(total, other)
+
+
+def test_log_edges_are_fixed():
+    edges = histogram_edges(0.1, 1000.0, 4, True)
+    assert edges == pytest.approx([0.1, 1.0, 10.0, 100.0, 1000.0])
+    assert histogram_edges(0.0, 10.0, 2, False) == pytest.approx([0.0, 5.0, 10.0])
+
+
+def test_summary_etag(client, monkeypatch):
+    monkeypatch.setattr(summaries, "_cache", {})
+    entry = summaries._remember("kepler", 3, {"format": SUMMARY_FORMAT, "rows": 7},
+                                datetime(2024, 1, 1, tzinfo=timezone.utc))
+
+    async def column_types(dataset):
+        return {"kepoi_name": "text"}
+
+    async def get_summary(dataset):
+        return entry
+
+    monkeypatch.setattr(routes, "get_column_types", column_types)
+    monkeypatch.setattr(summaries, "get_summary", get_summary)
+    response = client.get("/api/planets/kepler/summary")
+    assert response.status_code == 200
+    assert response.headers["etag"] == '"kepler-v3"'
+    assert response.json()["rows"] == 7
+
+    assert client.get("/api/planets/kepler/summary", headers={"If-None-Match": '"kepler-v3"'}).status_code == 304
+    assert client.get("/api/planets/kepler/summary", headers={"If-None-Match": 'W/"kepler-v3"'}).status_code == 304
+    assert client.get("/api/planets/kepler/summary", headers={"If-None-Match": '"kepler-v2"'}).status_code == 200